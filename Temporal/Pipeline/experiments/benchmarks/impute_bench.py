@@ -0,0 +1,118 @@
+# Jakob Balkovec
+# impute_bench.py
+
+# Accuracy and latency of the imputers in utils/impute_models.py (run_linear, run_rolling,
+# run_xgboost) vs gap size. For every column and gap length, hundreds of synthetic gaps
+# are sampled (windows holding observations, with observations on both sides), masked a
+# batch at a time, filled by each model, and scored on the masked observations. Fits run
+# in a process pool; per-window records and a per (feature, model, gap) summary of
+# RMSE / MAE and fit / predict time are written as JSON.
+#
+# usage (from Temporal/Pipeline):
+#   python -m experiments.benchmarks.impute_bench [csv] [--gaps 1 3 7 16 30] [--n 200]
+#          [--per-fit 10] [--workers N] [--models linear rolling xgboost] [--out path]
+
+import os
+import json
+import time
+import argparse
+import logging
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.impute_models import IMPUTERS, sample_bridges, batch_bridges, bridge_batch
+
+SATELLITE_DIR = Path(__file__).resolve().parent.parent / "missing_values" / "satellite"
+DEFAULT_CSV = SATELLITE_DIR / "satellite_data_darrington_2022_2024.csv"
+DEFAULT_OUT = SATELLITE_DIR / "impute_bench.json"
+COLUMNS = ["LST", "NDVI", "Rain_sat"]
+
+
+def load_daily(csv_path):
+    # post: one row per calendar day between the first and last date (NaN = missing)
+    df = pd.read_csv(csv_path, parse_dates=["date"]).drop_duplicates(subset="date").set_index("date")
+    days = pd.date_range(df.index.min(), df.index.max(), freq="D")
+    return df.reindex(days).rename_axis("date").reset_index()
+
+
+def summarize(records):
+    # post: [{feature, model, gap, windows, points, RMSE, MAE, fit_s, predict_s}] pooled over
+    #       the masked observations; times are medians per fit
+    cases = pd.DataFrame(records)
+    cases = cases[cases["points"] > 0]
+    cases["sq"] = cases["RMSE"] ** 2 * cases["points"]
+    cases["abs"] = cases["MAE"] * cases["points"]
+    fits = cases.drop_duplicates(subset=["feature", "model", "gap", "fit_id"])
+
+    summary = cases.groupby(["feature", "model", "gap"]).agg(
+        windows=("points", "size"), points=("points", "sum"), sq=("sq", "sum"), abs=("abs", "sum"),
+    )
+    summary["RMSE"] = np.sqrt(summary.pop("sq") / summary["points"])
+    summary["MAE"] = summary.pop("abs") / summary["points"]
+    timing = fits.groupby(["feature", "model", "gap"])[["fit_s", "predict_s"]].median()
+    return summary.join(timing).reset_index().to_dict(orient="records")
+
+
+def run(csv_path, gaps, n_gaps, per_fit, workers, models, seed=42):
+    df = load_daily(csv_path)
+    rng = np.random.default_rng(seed)
+
+    tasks = []
+    for col in [c for c in COLUMNS if c in df.columns]:
+        frame = df[["date", col]]
+        for gap in gaps:
+            starts = sample_bridges(frame[col].to_numpy(dtype="float64"), gap, n_gaps, rng)
+            for batch in batch_bridges(starts, gap, per_fit):
+                tasks.extend((frame, col, model, batch, gap) for model in models)
+
+    records = []
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(bridge_batch, *task) for task in tasks]
+        for fit_id, future in enumerate(futures):
+            for record in future.result():
+                records.append({**record, "fit_id": fit_id})
+    elapsed = time.perf_counter() - t0
+
+    return {
+        "source": str(csv_path),
+        "seed": seed,
+        "gaps": list(gaps),
+        "n_gaps": n_gaps,
+        "per_fit": per_fit,
+        "workers": workers,
+        "fits": len(tasks),
+        "elapsed_s": round(elapsed, 3),
+        "summary": summarize(records),
+        "cases": records,
+    }
+
+
+if __name__ == "__main__":
+    logging.disable(logging.CRITICAL)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("csv", nargs="?", default=str(DEFAULT_CSV))
+    parser.add_argument("--gaps", type=int, nargs="+", default=[1, 3, 7, 16, 30])
+    parser.add_argument("--n", type=int, default=200, help="sampled gaps per column and gap length")
+    parser.add_argument("--per-fit", type=int, default=10, help="gaps masked together per model fit")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--models", nargs="+", default=list(IMPUTERS), choices=list(IMPUTERS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=str(DEFAULT_OUT))
+    args = parser.parse_args()
+
+    result = run(args.csv, args.gaps, args.n, args.per_fit, args.workers, args.models, args.seed)
+    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(result, f, indent=2)
+
+    print(f"{result['fits']} fits in {result['elapsed_s']:.1f}s on {args.workers} workers -> {args.out}")
+    print(f"{'feature':8s} {'model':8s} {'gap':>4s} {'windows':>7s} {'RMSE':>10s} {'MAE':>10s} {'fit ms':>8s} {'pred ms':>8s}")
+    for row in result["summary"]:
+        print(
+            f"{row['feature']:8s} {row['model']:8s} {row['gap']:4d} {row['windows']:7d} "
+            f"{row['RMSE']:10.4f} {row['MAE']:10.4f} {1000 * row['fit_s']:8.1f} {1000 * row['predict_s']:8.1f}"
+        )
@@ -0,0 +1,87 @@
+# Jakob Balkovec
+# memory_bench.py
+
+# Peak RSS of parse -> clean -> merge -> feature per station for the default
+# (all columns, float64/str) path vs compact dtypes vs projection + compact dtypes
+# (utils/columns.py). Each run is a fresh spawned process so ru_maxrss is per mode.
+#
+# usage (from Temporal/Pipeline):  python -m experiments.benchmarks.memory_bench [replicate]
+#   replicate: stack the corpus N times (shifted station_id) to emulate longer/sub-daily histories
+
+import sys
+import resource
+import multiprocessing as mp
+from pathlib import Path
+
+RAW_DIR = Path(__file__).resolve().parent.parent.parent / "data" / "raw"
+
+# representative modelling set; projection adds the satellite/feature inputs on top
+KEEP_COLUMNS = ["station_id", "date", "air_temp_mean", "precipitation", "soil_moisture_5cm", "soil_temp_5cm"]
+
+MODES = {
+    "default": {},
+    "compact": {"compact_dtypes": True},
+    "projected": {"compact_dtypes": True, "project_columns": True},
+}
+
+
+def peak_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def run_mode(in_dir, mode, replicate, queue):
+    import pandas as pd
+    from pipes.parse_pipe import ParsePipe
+    from pipes.clean_pipe import CleanPipe
+    from pipes.merge_pipe import MergePipe
+    from pipes.feature_pipe import FeaturePipe
+    from utils.columns import required_columns
+
+    station_cfg = {"clean": {"keep_columns": KEEP_COLUMNS}, "merge": {"on_columns": ["station_id", "date"]}}
+    parse_cfg = {"in_dir": str(in_dir), "out_dir": "/tmp/memory_bench", "station": in_dir.name, **MODES[mode]}
+    clean_cfg = {"keep_columns": []}
+    if parse_cfg.get("project_columns"):
+        columns = required_columns(station_cfg)
+        parse_cfg["columns"], clean_cfg["keep_columns"] = columns, columns
+
+    baseline = peak_mb()
+    df = ParsePipe(config=parse_cfg).run()
+    if replicate > 1:
+        copies = []
+        for i in range(replicate):
+            part = df.copy()
+            part["station_id"] = part["station_id"].astype("int64") + i
+            copies.append(part)
+        df = pd.concat(copies, ignore_index=True)
+        if parse_cfg.get("compact_dtypes"):
+            df["station_id"] = df["station_id"].astype("category")
+    df = CleanPipe(config=clean_cfg).run(df)
+    df = MergePipe(config={"on_columns": ["station_id", "date"]}).run(df)
+    df = FeaturePipe(config={}).run(df)
+
+    queue.put((peak_mb() - baseline, df.memory_usage(deep=True).sum() / 1e6, df.shape))
+
+
+if __name__ == "__main__":
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    replicate = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    ctx = mp.get_context("spawn")
+
+    print(f"replicate={replicate}  (peak = RSS growth over the post-import baseline)")
+    for in_dir in sorted(p for p in RAW_DIR.iterdir() if p.is_dir()):
+        results = {}
+        for mode in MODES:
+            queue = ctx.Queue()
+            proc = ctx.Process(target=run_mode, args=(in_dir, mode, replicate, queue))
+            proc.start()
+            results[mode] = queue.get()
+            proc.join()
+
+        base_peak = results["default"][0]
+        for mode, (peak, frame_mb, shape) in results.items():
+            print(
+                f"{in_dir.name:12s} {mode:10s} peak {peak:8.1f} MB  frame {frame_mb:8.1f} MB  "
+                f"shape {shape}  ({peak / base_peak:5.2f}x of default)"
+            )
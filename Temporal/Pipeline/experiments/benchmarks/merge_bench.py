@@ -0,0 +1,90 @@
+# Jakob Balkovec
+# merge_bench.py
+
+# Wall time of the MergePipe key-indexed join (pipes/merge_pipe.py) vs the original
+# concat + drop_duplicates on synthetic multi-station sources: a ground source and a
+# second source overlapping half of its (station_id, date) keys with extra columns.
+#
+# usage (from Temporal/Pipeline):  python -m experiments.benchmarks.merge_bench [rows_per_source]
+
+import sys
+import time
+import logging
+
+import numpy as np
+import pandas as pd
+
+from pipes.merge_pipe import MergePipe
+
+KEYS = ["station_id", "date"]
+DAYS = 10_000  # ~27 years per station
+
+
+def make_source(n_rows, offset_days, n_values, seed, prefix):
+    rng = np.random.default_rng(seed)
+    stations = n_rows // DAYS
+    df = pd.DataFrame({
+        "station_id": np.repeat(np.arange(stations), DAYS),
+        "date": np.tile(pd.date_range("1990-01-01", periods=DAYS, freq="D") + pd.Timedelta(days=offset_days), stations),
+    })
+    for i in range(n_values):
+        df[f"{prefix}{i}"] = rng.random(len(df))
+    df["sm"] = rng.random(len(df))  # shared column -> conflict resolution
+    # shuffled, as sources arrive in file/station order rather than key order
+    return df.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+
+
+def legacy(sources):
+    return pd.concat(sources, ignore_index=True).drop_duplicates(subset=KEYS)
+
+
+def legacy_sorted(sources):
+    return legacy(sources).sort_values(KEYS, ignore_index=True)
+
+
+def pandas_merge(ground, other):
+    # same semantics as the join engine: outer merge on keys, ground wins on shared columns
+    out = pd.merge(ground, other, on=KEYS, how="outer", suffixes=("", "_other"))
+    out["sm"] = out["sm"].combine_first(out.pop("sm_other"))
+    return out
+
+
+def timed(fn, repeats=3):
+    best, out = float("inf"), None
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+if __name__ == "__main__":
+    logging.disable(logging.CRITICAL)
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+
+    for order in ("shuffled", "sorted"):
+        ground = make_source(n_rows, 0, 10, seed=1, prefix="g")
+        other = make_source(n_rows, DAYS // 2, 4, seed=2, prefix="s")
+        if order == "sorted":
+            ground, other = ground.sort_values(KEYS, ignore_index=True), other.sort_values(KEYS, ignore_index=True)
+        sources = {"ground": ground, "other": other}
+
+        print(f"--- {order} inputs: 2 x {len(ground):,} rows")
+        t_legacy, out = timed(lambda: legacy([ground, other]))
+        print(f"concat+dedupe        : {t_legacy:6.2f}s  -> {len(out):,} rows (unsorted, no coalescing)")
+        t_sorted, out = timed(lambda: legacy_sorted([ground, other]))
+        print(f"concat+dedupe+sort   : {t_sorted:6.2f}s  -> {len(out):,} rows (no coalescing)")
+        t_merge, out = timed(lambda: pandas_merge(ground, other))
+        print(f"pd.merge+combine     : {t_merge:6.2f}s  -> {len(out):,} rows")
+
+        for how in ("outer", "inner", "left"):
+            pipe = MergePipe({"on_columns": KEYS, "how": how})
+            t, out = timed(lambda: pipe.run(sources))
+            print(
+                f"MergePipe {how:5s}      : {t:6.2f}s  -> {len(out):,} rows  "
+                f"({t_sorted / t:4.1f}x vs concat+dedupe+sort, {t_merge / t:4.1f}x vs pd.merge)"
+            )
+
+        pipe = MergePipe({"on_columns": KEYS, "how": "left", "asof_tolerance": "3D"})
+        t, out = timed(lambda: pipe.run(sources), repeats=1)
+        print(f"MergePipe asof (3D)  : {t:6.2f}s  -> {len(out):,} rows")
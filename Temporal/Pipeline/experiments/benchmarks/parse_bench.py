@@ -0,0 +1,61 @@
+# Jakob Balkovec
+# parse_bench.py
+
+# Files/sec of the typed CRND0103 reader (utils/uscrn_reader.py) vs the original
+# ParsePipe path (python-engine read_csv + per-column replace(-9999, pd.NA)) on the
+# checked-in data/raw corpus.
+#
+# usage (from Temporal/Pipeline):  python -m experiments.benchmarks.parse_bench [repeats]
+
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from utils.uscrn_products import default_col_indices
+from utils.uscrn_reader import read_uscrn
+
+RAW_DIR = Path(__file__).resolve().parent.parent.parent / "data" / "raw"
+COL_INDICES = default_col_indices("daily01")
+
+
+def legacy_read(file_path):
+    # verbatim per-file body of the original ParsePipe._parse_uscrn
+    df = pd.read_csv(file_path, sep=r"\s+", comment="#", header=None, engine="python")
+    rename_map = {idx: name for name, idx in COL_INDICES.items() if idx in df.columns}
+    df = df.rename(columns=rename_map)
+    df.columns = [c if isinstance(c, str) else rename_map.get(c, f"col_{c}") for c in df.columns]
+    if "date" in df.columns:
+        df["date"] = pd.to_datetime(df["date"], format="%Y%m%d", errors="coerce")
+    for col in df.columns:
+        if pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = df[col].replace(-9999.0, pd.NA)
+    return df
+
+
+def typed_read(file_path):
+    return read_uscrn(file_path, product="daily01", col_indices=COL_INDICES)
+
+
+def bench(fn, files, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for f in files:
+            fn(f)
+        best = min(best, time.perf_counter() - t0)
+    return len(files) / best
+
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    files = sorted(RAW_DIR.rglob("uscrn_*.txt"))
+
+    legacy = bench(legacy_read, files, repeats)
+    typed = bench(typed_read, files, repeats)
+
+    print(f"corpus : {len(files)} files under {RAW_DIR}")
+    print(f"legacy : {legacy:8.1f} files/s")
+    print(f"typed  : {typed:8.1f} files/s")
+    print(f"speedup: {typed / legacy:5.1f}x")
@@ -0,0 +1,43 @@
+# Jakob Balkovec
+# request_bench.py
+
+# Serial vs concurrent RequestPipe refresh of all three USCRN stations against the
+# local NOAA stand-in with injected per-request latency.
+#
+# usage (from Temporal/Pipeline):  python -m experiments.benchmarks.request_bench [latency_s] [workers]
+
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+from utils.config import load_config
+from pipes.request_pipe import RequestPipe
+from tests.fakes.noaa_server import FakeNOAAServer
+
+
+def refresh_all(base_url, out_root, workers):
+    stations = load_config()["stations"]
+    t0 = time.perf_counter()
+    n_files = 0
+    for name, cfg in stations.items():
+        req_cfg = dict(cfg["request"])
+        if not req_cfg.get("base_url"):
+            continue
+        req_cfg.update(base_url=base_url, workers=workers, out_dir=str(Path(out_root) / name))
+        n_files += len(RequestPipe(req_cfg).run())
+    return time.perf_counter() - t0, n_files
+
+
+if __name__ == "__main__":
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.15
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    with FakeNOAAServer(latency=latency) as server, tempfile.TemporaryDirectory() as tmp:
+        serial_s, n_serial = refresh_all(server.base_url, Path(tmp) / "serial", workers=1)
+        conc_s, n_conc = refresh_all(server.base_url, Path(tmp) / "concurrent", workers=workers)
+
+    print(f"latency={latency:.3f}s/request")
+    print(f"serial     : {serial_s:6.2f}s  ({n_serial} files)")
+    print(f"concurrent : {conc_s:6.2f}s  ({n_conc} files, {workers} workers)")
+    print(f"speedup    : {serial_s / conc_s:5.1f}x")
@@ -7,12 +7,16 @@
 # MUTE THE ANNOYING INSECURE REQUESTS WARNING
 import warnings
 from requests import packages
+from pathlib import Path
+import os
+from concurrent.futures import ThreadPoolExecutor
 
 warnings.filterwarnings("ignore", category=UserWarning, module="requests")
 # MUTE THE ANNOYING INSECURE REQUESTS WARNING
 
 from utils.config import load_config
 from utils.logger import get_logger
+from utils.columns import required_columns
 
 from pipes.request_pipe import RequestPipe
 from pipes.parse_pipe import ParsePipe
@@ -23,34 +27,99 @@ from pipes.satellite_pipe import SatellitePipe
 from pipes.feature_pipe import FeaturePipe
 from pipes.save_pipe import SavePipe
 
-def run_pipeline_for_station(station_name, station_cfg, global_cfg):
-    logger = get_logger().getChild(f"main.{station_name}")
-    logger.info(f"=== Starting pipeline for {station_name} ===")
+def prepare_station(station_name, station_cfg, logger):
+    # post: merged ground frame for the station (request -> parse -> clean -> merge),
+    #       or None when the saved output is still current
 
-    # Skip RequestPipe for SNOTEL stations (they use local .stm files, not HTTP downloads)
-    if station_cfg.get("parse", {}).get("snotel_mode", False):
-        logger.warning(f"[{station_name}] SNOTEL mode detected — skipping entire station (SNOTELPipe not available).")
-        return
+    # SNOTEL stations use local .stm files, not HTTP downloads
+    snotel = station_cfg.get("parse", {}).get("snotel_mode", False)
 
-    # USCRN pipeline
-    try:
+    if snotel:
+        logger.info(f"[{station_name}] SNOTEL mode — skipping RequestPipe, parsing local .stm files.")
+    else:
         request_pipe = RequestPipe(config=station_cfg["request"])
         request_pipe.run()
 
-        parsed = ParsePipe(config=station_cfg["parse"]).run()
-        cleaned = CleanPipe(config=station_cfg["clean"]).run(parsed)
-        merged = MergePipe(config=station_cfg["merge"]).run(cleaned)
-        with_sat = SatellitePipe(config=global_cfg, station_name=station_name).run(merged)
-        filled = TemporalFillPipe(config=global_cfg["temporal_fill"]).run(with_sat)
-        featured = FeaturePipe(config=station_cfg.get("feature", {})).run(filled)
-        SavePipe(config=station_cfg["save"]).run(featured)
+        # nothing new upstream -> the previous output is still current
+        save_path = Path(station_cfg["save"]["out_path"])
+        if station_cfg["request"].get("skip_if_unchanged", False) and not request_pipe.changed and save_path.exists():
+            logger.info(f"[{station_name}] Raw files unchanged — keeping {save_path}, skipping downstream pipes.")
+            return None
+
+    # projection: parse only clean.keep_columns + what the downstream pipes read
+    parse_cfg, clean_cfg = station_cfg["parse"], station_cfg["clean"]
+    columns = required_columns(station_cfg) if parse_cfg.get("project_columns", False) else None
+    if columns:
+        parse_cfg = {**parse_cfg, "columns": columns}
+        clean_cfg = {**clean_cfg, "keep_columns": columns}
+
+    parsed = ParsePipe(config=parse_cfg).run()
+    cleaned = CleanPipe(config=clean_cfg).run(parsed)
+    return MergePipe(config=station_cfg["merge"]).run(cleaned)
+
+
+def finish_station(station_name, station_cfg, global_cfg, merged, fill_cfg=None):
+    # post: satellite -> temporal fill -> features -> save for a merged ground frame
+    with_sat = SatellitePipe(config=global_cfg, station_name=station_name).run(merged)
+    filled = TemporalFillPipe(config=fill_cfg or global_cfg["temporal_fill"], station_name=station_name).run(with_sat)
+    featured = FeaturePipe(config=station_cfg.get("feature", {})).run(filled)
+    SavePipe(config=station_cfg["save"]).run(featured)
+
+
+def run_pipeline_for_station(station_name, station_cfg, global_cfg):
+    logger = get_logger().getChild(f"main.{station_name}")
+    logger.info(f"=== Starting pipeline for {station_name} ===")
 
+    try:
+        merged = prepare_station(station_name, station_cfg, logger)
+        if merged is None:
+            return
+        finish_station(station_name, station_cfg, global_cfg, merged)
         logger.info(f"=== Pipeline complete for {station_name} ===\n")
 
     except Exception as e:
         logger.error(f"[{station_name}] Pipeline failed: {e}")
 
 
+def run_multi_station(stations_cfg, global_cfg):
+    # desc: ground data for every station first, then one multi-station satellite
+    #       prefetch (reduceRegions over all station points), then the per-station tail;
+    #       each station's SatellitePipe is served from the cache the prefetch filled.
+    merged = {}
+    for station_name, station_cfg in stations_cfg.items():
+        logger = get_logger().getChild(f"main.{station_name}")
+        logger.info(f"=== Preparing {station_name} ===")
+        try:
+            frame = prepare_station(station_name, station_cfg, logger)
+            if frame is not None:
+                merged[station_name] = frame
+        except Exception as e:
+            logger.error(f"[{station_name}] Pipeline failed: {e}")
+
+    if merged:
+        try:
+            SatellitePipe(config=global_cfg).prefetch_stations(merged)
+        except Exception as e:
+            get_logger().error(f"Multi-station satellite prefetch failed ({e}); falling back to per-station retrieval.")
+
+    # stations finish concurrently, each imputing within its share of the CPU budget
+    fill_cfg = global_cfg["temporal_fill"]
+    workers = max(1, min(int(fill_cfg.get("station_workers", 1) or 1), len(merged) or 1))
+    budget = int(fill_cfg.get("cpu_budget") or os.cpu_count() or 1)
+    fill_cfg = {**fill_cfg, "cpu_budget": max(1, budget // workers)}
+
+    def finish(station_name):
+        logger = get_logger().getChild(f"main.{station_name}")
+        try:
+            finish_station(station_name, stations_cfg[station_name], global_cfg, merged[station_name], fill_cfg)
+            logger.info(f"=== Pipeline complete for {station_name} ===\n")
+        except Exception as e:
+            logger.error(f"[{station_name}] Pipeline failed: {e}")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(finish, merged))
+
+
 if __name__ == "__main__":
     config = load_config()
     logger = get_logger()
@@ -60,13 +129,10 @@ if __name__ == "__main__":
         logger.error("No stations found. Check the 'config' file!")
         exit(1)
 
-    for station_name, station_cfg in stations_cfg.items():
-
-        # Explicit skip for SNOTEL mode stations
-        if station_cfg.get("parse", {}).get("snotel_mode", False):
-            logger.warning(f"[{station_name}] Skipping SNOTEL station — awaiting SNOTELPipe integration.")
-            continue
-
-        run_pipeline_for_station(station_name, station_cfg, config)
+    if config.get("satellite", {}).get("multi_station", False):
+        run_multi_station(stations_cfg, config)
+    else:
+        for station_name, station_cfg in stations_cfg.items():
+            run_pipeline_for_station(station_name, station_cfg, config)
 
     logger.info("All station pipelines completed successfully.")
@@ -8,6 +8,7 @@ import pandas as pd
 import numpy as np
 from utils.logger import get_logger
 from utils.config import load_config
+from utils.qc import QCEngine
 
 class CleanPipe:
     # Multiple sentinel values used by USCRN
@@ -25,6 +26,10 @@ class CleanPipe:
         self.drop_missing = clean_cfg.get("drop_missing", False)
         self.fillna_value = clean_cfg.get("fillna_value", None)
         self.keep_columns = clean_cfg.get("keep_columns", [])
+
+        # rule-driven QC -> per-row uint32 qc_mask (null = disabled), see utils/qc.py
+        qc_rules = clean_cfg.get("qc_rules")
+        self.qc = QCEngine.from_yaml(qc_rules) if qc_rules else None
         self.logger = get_logger().getChild("clean")
 
     def run(self, df):
@@ -56,6 +61,10 @@ class CleanPipe:
         else:
             self.logger.warning("No longitude/latitude columns found — skipping coordinate validation.")
 
+        # QC flags: evaluated in (station_id, date) order, written back row-aligned
+        if self.qc is not None:
+            df = self._apply_qc(df)
+
         # Count NaNs but don't drop them (preserve data)
         nan_count = df.isna().sum().sum()
         nan_pct = (nan_count / (len(df) * len(df.columns))) * 100 if len(df) > 0 else 0
@@ -63,13 +72,18 @@ class CleanPipe:
 
         # Optional: Keep only specified columns
         if self.keep_columns:
-            available_cols = [col for col in self.keep_columns if col in df.columns]
-            missing_cols = [col for col in self.keep_columns if col not in df.columns]
+            keep = list(self.keep_columns)
+            if self.qc is not None and QCEngine.MASK_COLUMN not in keep:
+                keep.append(QCEngine.MASK_COLUMN)
+            available_cols = [col for col in keep if col in df.columns]
+            missing_cols = [col for col in keep if col not in df.columns]
 
             if missing_cols:
                 self.logger.warning(f"Requested columns not found: {missing_cols}")
 
+            attrs = df.attrs
             df = df[available_cols]
+            df.attrs = attrs
             self.logger.info(f"Kept {len(available_cols)} specified columns.")
 
         # Ensure date column is datetime
@@ -83,3 +97,21 @@ class CleanPipe:
         self.logger.info(f"CleanPipe complete — {final_rows} rows after cleaning ({initial_rows - final_rows} removed).")
 
         return df
+
+    def _apply_qc(self, df):
+        # pre:  self.qc is set
+        # post: df with qc_mask added, rows and order unchanged; per-rule counts logged
+        keys = [c for c in ("station_id", "date") if c in df.columns]
+        order = np.lexsort([df[c].to_numpy() for c in reversed(keys)]) if keys else np.arange(len(df))
+        mask, counts = self.qc.evaluate(df.iloc[order])
+
+        df = df.copy()
+        out = np.empty(len(df), dtype=np.uint32)
+        out[order] = mask
+        df[QCEngine.MASK_COLUMN] = out
+        df.attrs["qc_bits"] = dict(self.qc.bits)
+
+        flagged = int((out != 0).sum())
+        summary = ", ".join(f"{name}={n}" for name, n in counts.items() if n)
+        self.logger.info(f"QC flagged {flagged} rows ({flagged / max(len(df), 1):.1%}) — {summary or 'no failures'}.")
+        return df
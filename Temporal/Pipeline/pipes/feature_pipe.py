@@ -27,6 +27,9 @@ class FeaturePipe:
 
         df = df.sort_values("date").reset_index(drop=True)
 
+        # hourly/subhourly products keep a time component -> use calendar windows, not row counts
+        sub_daily = "date" in df.columns and (df["date"] != df["date"].dt.normalize()).any()
+
         # Day of Year (DOY)
         if "date" in df.columns:
             df["DOY"] = df["date"].dt.dayofyear
@@ -35,16 +38,21 @@ class FeaturePipe:
 
         # Rolling 3-day precipitation sum
         if "precipitation" in df.columns:
-            df["Rain_3d"] = (
-                pd.to_numeric(df["precipitation"], errors="coerce")
-                .fillna(0)
-                .rolling(window=3, min_periods=1)
-                .sum()
-            )
+            rain = pd.to_numeric(df["precipitation"], errors="coerce").fillna(0)
+            if sub_daily:
+                rain_3d = rain.set_axis(df["date"]).rolling("3D", min_periods=1).sum().to_numpy()
+            else:
+                rain_3d = rain.rolling(window=3, min_periods=1).sum()
+            df["Rain_3d"] = pd.Series(rain_3d, index=df.index).astype(rain.dtype)  # keep float32 if compacted
 
         # Previous-day soil moisture (lagged feature)
         if "soil_moisture_5cm" in df.columns:
-            df["SM_prev"] = df["soil_moisture_5cm"].shift(1)
+            if sub_daily and df["date"].is_unique:
+                # same time of day, one day earlier
+                sm = df["soil_moisture_5cm"].set_axis(df["date"])
+                df["SM_prev"] = sm.shift(freq="1D").reindex(df["date"]).to_numpy()
+            else:
+                df["SM_prev"] = df["soil_moisture_5cm"].shift(1)
 
         # Placeholder for classification label (if needed later)
         df["SM_label"] = pd.NA
@@ -3,12 +3,22 @@
 
 # This module defines the MergePipe class, which is responsible for merging
 # multiple DataFrames or datasets into a unified DataFrame.
+#
+# Sources are de-duplicated and sorted once on the merge keys (station_id, date) and
+# joined on that sorted index: outer / inner / left select the output keys, and value
+# columns shared by several sources are coalesced in priority order (`prefer`), so the
+# preferred source wins wherever it has a value. With `asof_tolerance` set, secondary
+# sources are matched to the primary source's dates by nearest date within tolerance.
 
+import numpy as np
 import pandas as pd
 from utils.logger import get_logger
 from utils.config import load_config
 
 class MergePipe:
+    JOIN_TYPES = {"outer", "inner", "left"}
+    ASOF_DIRECTIONS = {"backward", "forward", "nearest"}
+
     def __init__(self, config=None):
         # pre:  config is a dictionary loaded from config.yaml or None
         # post: initializes MergePipe with merging strategy parameters
@@ -19,30 +29,195 @@ class MergePipe:
 
         self.on_columns = merge_cfg.get("on_columns", [])
         self.how = merge_cfg.get("how", "outer")
+        if self.how not in self.JOIN_TYPES:
+            raise ValueError(f"Unsupported merge type: {self.how} (expected one of {sorted(self.JOIN_TYPES)})")
+
+        # conflict resolution: source names in priority order (default = input order)
+        self.prefer = merge_cfg.get("prefer") or []
+
+        # as-of join of secondary sources onto the primary's dates (null = exact keys)
+        self.asof_tolerance = merge_cfg.get("asof_tolerance")
+        self.asof_direction = merge_cfg.get("asof_direction", "nearest")
+        if self.asof_direction not in self.ASOF_DIRECTIONS:
+            raise ValueError(f"Unsupported as-of direction: {self.asof_direction}")
+
         self.logger = get_logger().getChild("merge")
 
     def run(self, data):
-        # pre:  receives list of DataFrames to merge (or one DataFrame)
-        # post: returns unified DataFrame based on merge config
+        # pre:  receives DataFrames to merge: a list, a {source name: DataFrame} dict,
+        #       or one DataFrame
+        # post: returns unified DataFrame based on merge config, sorted on on_columns
         # desc: Merges multiple data sources according to configured join strategy.
 
-        if isinstance(data, list) and len(data) > 1:
-            self.logger.info(f"Merging {len(data)} DataFrames using '{self.how}' join.")
-            merged = pd.concat(data, ignore_index=True)
-        elif isinstance(data, list):
-            self.logger.info("Received a single DataFrame in list — no merge needed.")
-            merged = data[0]
-        else:
-            self.logger.info("Received single DataFrame — returning unchanged.")
-            merged = data
+        sources = self._sources(data)
+        if not sources:
+            self.logger.warning("MergePipe received no data.")
+            return pd.DataFrame()
 
-        # Drop duplicates based on merge keys
-        if self.on_columns:
-            before = len(merged)
-            merged = merged.drop_duplicates(subset=self.on_columns)
-            after = len(merged)
-            removed = before - after
-            self.logger.debug(f"Deduplicated on {self.on_columns} ({removed} rows removed).")
+        if len(sources) == 1 or not self.on_columns:
+            if len(sources) > 1:
+                # no keys to join on -> stack rows
+                self.logger.info(f"Merging {len(sources)} DataFrames by concatenation (no on_columns).")
+                merged = pd.concat(list(sources.values()), ignore_index=True)
+            else:
+                self.logger.info("Received single DataFrame — deduplicating only.")
+                merged = next(iter(sources.values()))
+            merged = self._dedupe(merged)
+        else:
+            merged = self._join(sources)
 
         self.logger.info(f"MergePipe complete — {len(merged)} rows total.")
         return merged
+
+    def _sources(self, data):
+        # post: {name: DataFrame} in priority order (prefer first, then input order)
+        if data is None:
+            return {}
+        if isinstance(data, pd.DataFrame):
+            sources = {"source_0": data}
+        elif isinstance(data, dict):
+            sources = dict(data)
+        else:
+            sources = {f"source_{i}": df for i, df in enumerate(data)}
+
+        sources = {name: df for name, df in sources.items() if df is not None and not df.empty}
+        unknown = [name for name in self.prefer if name not in sources]
+        if unknown:
+            self.logger.debug(f"prefer lists sources not present: {unknown}")
+        ranked = [name for name in self.prefer if name in sources]
+        ranked += [name for name in sources if name not in ranked]
+        return {name: sources[name] for name in ranked}
+
+    def _dedupe(self, df):
+        # keep the first row per key (same semantics as before)
+        if not self.on_columns:
+            return df
+        before = len(df)
+        df = df.drop_duplicates(subset=self.on_columns)
+        self.logger.debug(f"Deduplicated on {self.on_columns} ({before - len(df)} rows removed).")
+        return df
+
+    def _encode(self, sources):
+        # post: (one int64 key per row of every source, decoder) where keys sort like the
+        #       on_columns tuples; each key column is factorized jointly across sources
+        #       (sorted codes) and the codes are combined mixed-radix
+        frames = list(sources.values())
+        bounds = np.cumsum([len(f) for f in frames])[:-1]
+        combined = np.zeros(sum(len(f) for f in frames), dtype=np.int64)
+        decoder = []
+        for col in self.on_columns:
+            joined = pd.concat([f[col] for f in frames], ignore_index=True)
+            codes, uniques = pd.factorize(joined, sort=True, use_na_sentinel=False)
+            combined = combined * len(uniques) + codes
+            decoder.append((col, uniques))
+        return dict(zip(sources, np.split(combined, bounds))), decoder
+
+    @staticmethod
+    def _decode(keys, decoder):
+        # post: DataFrame of the on_columns for int64 keys
+        out = {}
+        for col, uniques in reversed(decoder):
+            keys, codes = np.divmod(keys, len(uniques))
+            out[col] = uniques.take(codes)
+        return pd.DataFrame({col: out[col] for col, _ in decoder})
+
+    @staticmethod
+    def _sorted_unique(keys):
+        # post: (sorted unique keys, row of the first occurrence of each) - sort once per source
+        if len(keys) < 2 or (keys[1:] >= keys[:-1]).all():
+            order = np.arange(len(keys))  # already in key order (typical for parsed files)
+        else:
+            order = np.argsort(keys, kind="stable")
+        sk = keys[order]
+        first = np.ones(len(sk), dtype=bool)
+        first[1:] = sk[1:] != sk[:-1]
+        return sk[first], order[first]
+
+    def _join(self, sources):
+        # pre:  >= 2 sources, on_columns set
+        # post: one row per output key, sorted on on_columns; shared columns coalesced in
+        #       priority order
+        names = list(sources)
+        self.logger.info(
+            f"Merging {len(names)} DataFrames using '{self.how}' join on {self.on_columns} "
+            f"(priority: {', '.join(names)})"
+            + (f", as-of tolerance {self.asof_tolerance}." if self.asof_tolerance else ".")
+        )
+
+        encoded, decoder = self._encode(sources)
+        keyed = {name: self._sorted_unique(keys) for name, keys in encoded.items()}
+
+        out_keys = self._output_keys(keyed, names)
+        key_frame = self._decode(out_keys, decoder)
+
+        # row of each source backing each output key (-1 = none)
+        aligned = {}
+        for name in names:
+            sk, rows = keyed[name]
+            if self.asof_tolerance and name != names[0]:
+                aligned[name] = dict(self._asof(key_frame, sources[name].iloc[np.sort(rows)]).items())
+                continue
+
+            df = sources[name]
+            pos = np.clip(np.searchsorted(sk, out_keys), 0, max(len(sk) - 1, 0))
+            found = sk[pos] == out_keys
+            indexer = np.where(found, rows[pos], -1)
+            aligned[name] = {
+                col: pd.Series(pd.api.extensions.take(df[col].array, indexer, allow_fill=True), copy=False)
+                for col in df.columns if col not in self.on_columns
+            }
+
+        # value columns in order of first appearance; earlier (preferred) sources win
+        columns = list(dict.fromkeys(col for frame in aligned.values() for col in frame))
+        out = dict(key_frame.items())
+        for col in columns:
+            holders = [aligned[name][col] for name in names if col in aligned[name]]
+            values = holders[0]
+            for other in holders[1:]:
+                missing = values.isna()
+                if not missing.any():
+                    break
+                values = values.where(~missing, other)
+            out[col] = values
+
+        return pd.DataFrame(out)
+
+    def _output_keys(self, keyed, names):
+        # outer = union, inner = intersection, left = primary keys (all sorted unique);
+        # as-of joins always keep the primary's keys
+        keys = keyed[names[0]][0]
+        if self.how == "left" or self.asof_tolerance:
+            return keys
+        for name in names[1:]:
+            other = keyed[name][0]
+            if self.how == "outer":
+                # both sides sorted unique: merge the two runs instead of hashing
+                keys = np.concatenate([keys, other])
+                keys.sort(kind="stable")
+                keep = np.ones(len(keys), dtype=bool)
+                keep[1:] = keys[1:] != keys[:-1]
+                keys = keys[keep]
+            else:
+                pos = np.clip(np.searchsorted(other, keys), 0, max(len(other) - 1, 0))
+                keys = keys[other[pos] == keys] if len(other) else keys[:0]
+        return keys
+
+    def _asof(self, key_frame, frame):
+        # pre:  on_columns ends with the date column; leading columns are exact "by" keys
+        # post: frame's value columns matched to key_frame rows by nearest date within
+        #       tolerance (row-aligned with key_frame)
+        *by, on = self.on_columns
+        left = key_frame.copy()
+        left["_row"] = np.arange(len(left))
+
+        # merge_asof needs both sides sorted on the date column alone
+        left = left.sort_values(on, kind="stable")
+        right = frame.sort_values(on, kind="stable")
+        matched = pd.merge_asof(
+            left, right,
+            on=on, by=by or None,
+            tolerance=pd.Timedelta(self.asof_tolerance),
+            direction=self.asof_direction,
+        )
+        matched = matched.sort_values("_row").drop(columns=["_row", *self.on_columns])
+        return matched.reset_index(drop=True)
@@ -4,26 +4,88 @@
 # This module defines the ParsePipe class, which parses the data retrieved by the
 # RequestPipe into a structured format for further processing.
 
+import re
+import numpy as np
 import pandas as pd
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from utils.logger import get_logger
 from utils.config import load_config
+from utils.uscrn_products import get_product, default_col_indices, ChunkAggregator
+from utils.uscrn_reader import read_uscrn
+from utils.parse_cache import ParseCache
+from utils.columns import compact_dtypes
 
-# Try to import SNOTELPipe - handle both absolute and relative imports
-try:
-    from pipes.snotel_pipe import SNOTELPipe
-except ImportError:
+from pipes.snotel_pipe import SNOTELPipe
+
+def _parse_file(file_path, product, col_indices, chunk_rows, aggregate, usecols=None):
+    # pre:  file_path is a whitespace-delimited USCRN product file
+    # post: returns {frame | aggregator, rows, cols, error}; never raises
+    # desc: parses one file chunk by chunk with the typed reader (utils/uscrn_reader.py):
+    #       explicit dtypes, sentinels -> NaN at read time, vectorized dates. Chunking keeps
+    #       memory bounded for subhourly files (~288x the daily row count). Module-level so
+    #       it can run inside a ProcessPoolExecutor worker.
+
+    result = {"frame": None, "aggregator": None, "rows": 0, "cols": 0, "error": None}
     try:
-        from snotel_pipe import SNOTELPipe
-    except ImportError:
-        # If SNOTELPipe not available, create a placeholder
-        SNOTELPipe = None
+        file_chunks = []
+        file_agg = ChunkAggregator(product, aggregate) if aggregate else None
+
+        for chunk in read_uscrn(file_path, product=product, col_indices=col_indices,
+                                usecols=usecols, chunksize=chunk_rows):
+            result["rows"] += len(chunk)
+            result["cols"] = len(chunk.columns) + (0 if file_agg else 1)  # + source_file
+            if file_agg is not None:
+                file_agg.add(chunk)
+            else:
+                file_chunks.append(chunk)
+
+        if file_agg is not None:
+            result["aggregator"] = file_agg
+        elif file_chunks:
+            result["frame"] = file_chunks[0] if len(file_chunks) == 1 else pd.concat(file_chunks, ignore_index=True)
+        else:
+            result["frame"] = pd.DataFrame()
+
+    except Exception as e:
+        result["error"] = str(e)
+
+    return result
+
+
+def _parse_file_columnar(job):
+    # pre:  job is the (file_path, product, col_indices, chunk_rows, aggregate, usecols) tuple
+    # post: same as _parse_file, with the frame packed as {column: array}
+    # desc: process-pool entry point. Plain arrays (strings as categorical codes) pickle far
+    #       smaller than a DataFrame with object columns.
+
+    result = _parse_file(*job)
+    frame = result["frame"]
+    if frame is not None:
+        result["frame"] = {
+            col: (pd.Categorical(frame[col]), str(frame[col].dtype))
+            if pd.api.types.is_string_dtype(frame[col].dtype) or frame[col].dtype == object
+            else (frame[col].array, None)
+            for col in frame.columns
+        }
+    return result
+
+
+def _from_columnar(frame):
+    # post: DataFrame rebuilt from _parse_file_columnar output (DataFrames pass through)
+    if isinstance(frame, pd.DataFrame):
+        return frame
+    return pd.DataFrame({
+        col: pd.Series(values).astype(dtype) if dtype is not None else values
+        for col, (values, dtype) in frame.items()
+    })
+
 
 class ParsePipe:
     FILE_GLOB = "uscrn_*.txt"
-    NA_VALUE = -9999.0
-    DATE_FORMAT = "%Y%m%d"
-    DELIM = r"\s+"
+    FILE_YEAR = re.compile(r"_(\d{4})\.txt$")
+    CHUNK_ROWS = 100_000
 
     def __init__(self, config=None):
         # pre:  config is a dictionary loaded from config.yaml or None
@@ -37,13 +99,33 @@ class ParsePipe:
         self.out_dir = Path(parse_cfg.get("out_dir", "data/processed"))
         self.out_dir.mkdir(parents=True, exist_ok=True)
 
-        self.col_indices = parse_cfg.get("col_indices", {
-            "station_id": 0,
-            "date": 1,
-            "longitude": 2,
-            "latitude": 3,
-            "soil_moisture_5cm": 17,
-        })
+        # product: daily01 (CRND0103) | hourly02 (CRNH0203) | subhourly01 (CRNS0101-05)
+        self.product = parse_cfg.get("product", "daily01")
+        product = get_product(self.product)
+        self.file_glob = f"{product['output_prefix']}*.txt"
+
+        # sub-daily products: optional on-the-fly aggregation to "daily" | "hourly"
+        self.aggregate = parse_cfg.get("aggregate")
+        self.chunk_rows = int(parse_cfg.get("chunk_rows", self.CHUNK_ROWS))
+
+        # opt-in process pool for multi-file parsing (1 = serial, in-process)
+        self.workers = max(1, int(parse_cfg.get("workers", 1)))
+
+        # only the requested years are parsed/loaded (None = everything in in_dir)
+        self.start_year = parse_cfg.get("start_year")
+        self.end_year = parse_cfg.get("end_year")
+
+        # content-addressed per-file cache of parsed output (null = disabled)
+        cache_dir = parse_cfg.get("cache_dir")
+        self.cache = ParseCache(cache_dir) if cache_dir else None
+
+        self.col_indices = parse_cfg.get("col_indices") or default_col_indices(self.product)
+
+        # projection: only these output columns are read (None = all); main.py fills it from
+        # clean.keep_columns + what the downstream pipes consume (utils/columns.py)
+        self.columns = parse_cfg.get("columns")
+        # float32 measurements + categorical labels (utils/columns.py)
+        self.compact = parse_cfg.get("compact_dtypes", False)
 
         self.drop_duplicates = parse_cfg.get("drop_duplicates", True)
         # Get station name from either request config or parse config (for SNOTEL)
@@ -54,10 +136,10 @@ class ParsePipe:
         self.logger = get_logger().getChild(f"parse.{self.station_name}")
 
     def run(self, _=None):
-        # pre:  raw yearly files exist in in_dir and follow CRND0103 format OR
-        #       master.csv exists for SNOTEL stations
+        # pre:  raw yearly files exist in in_dir and follow the configured USCRN product OR
+        #       ISMN .stm files exist for SNOTEL stations
         # post: returns unified DataFrame of all parsed files
-        # desc: Reads all downloaded USCRN files OR pre-generated SNOTEL master.csv,
+        # desc: Reads all downloaded USCRN files OR SNOTEL .stm histories,
         #       maps columns, replaces missing values, and returns clean DataFrame.
 
         # Check if this is a SNOTEL station (has snotel_mode flag)
@@ -67,82 +149,171 @@ class ParsePipe:
             return self._parse_uscrn()
 
     def _parse_snotel(self):
-        # pre:  .stm files exist in in_dir OR master.csv exists
-        # post: returns DataFrame with standardized column names
-        # desc: Delegates to SNOTELPipe for complete SNOTEL data processing
-
-        if SNOTELPipe is None:
-            self.logger.error(
-                f"[{self.station_name}] SNOTELPipe not available. "
-                f"Please ensure snotel_pipe.py is in the pipes/ directory."
-            )
-            return pd.DataFrame()
+        # pre:  ISMN .stm files exist in in_dir
+        # post: returns DataFrame with the same columns as the USCRN daily path
+        # desc: Delegates to SNOTELPipe (pipes/snotel_pipe.py), then applies the same
+        #       projection / compact dtypes as USCRN output.
 
         self.logger.info(f"[{self.station_name}] Using SNOTEL pipe for data processing")
 
-        # Use SNOTELPipe to handle all SNOTEL parsing
-        snotel_pipe = SNOTELPipe(config=self.config)
-        return snotel_pipe.run()
+        df = SNOTELPipe(config=self.config).run()
+        if df.empty:
+            return df
+        if self.columns:
+            wanted = set(self.columns) | {"station_id", "date", "Rain_3d"}
+            df = df[[c for c in df.columns if c in wanted]]
+        return compact_dtypes(df) if self.compact else df
+
+    def _select_files(self):
+        # post: sorted raw files for this product, limited to start_year..end_year when set
+        files = sorted(self.in_dir.glob(self.file_glob))
+        if self.start_year is None and self.end_year is None:
+            return files
+
+        selected = []
+        for f in files:
+            m = self.FILE_YEAR.search(f.name)
+            year = int(m.group(1)) if m else None
+            if year is None or (
+                (self.start_year is None or year >= self.start_year)
+                and (self.end_year is None or year <= self.end_year)
+            ):
+                selected.append(f)
+        return selected
+
+    def _cache_params(self):
+        # every setting that changes what a raw file parses into
+        return {"product": self.product, "col_indices": self.col_indices, "aggregate": self.aggregate,
+                "usecols": self._usecols()}
+
+    def _usecols(self):
+        # post: documented field names backing self.columns (None = read every field)
+        if not self.columns:
+            return None
+
+        wanted = set(self.columns) | {"station_id", "date"}
+        spec = get_product(self.product)
+        if self.aggregate:
+            rules = spec["aggregations"][self.aggregate]
+            wanted |= {src for name, (src, _) in rules.items() if name in wanted}
+        documented = spec["columns"]
+        return sorted(documented[idx] for name, idx in self.col_indices.items() if name in wanted)
+
+    def _to_cache(self, result):
+        # post: flat DataFrame stored for one parsed file
+        if result["aggregator"] is not None:
+            return result["aggregator"].partial_frame()
+        return result["frame"]
+
+    def _from_cache(self, frame):
+        # post: result dict equivalent to _parse_file output for a cached entry
+        result = {"frame": None, "aggregator": None, "rows": len(frame), "cols": len(frame.columns),
+                  "error": None, "cached": True}
+        if self.aggregate:
+            result["aggregator"] = ChunkAggregator(self.product, self.aggregate)
+            result["aggregator"].add_partial_frame(frame)
+        else:
+            result["frame"] = frame
+            result["cols"] += 1  # + source_file
+        return result
 
     def _parse_uscrn(self):
-        # pre:  raw yearly files exist in in_dir and follow CRND0103 format
+        # pre:  raw yearly files exist in in_dir and follow the configured product format
         # post: returns unified DataFrame of all parsed USCRN files
-        # desc: Reads all downloaded USCRN files, maps columns, replaces missing values,
-        #       and concatenates them into a clean unified DataFrame.
+        # desc: Reads all downloaded USCRN files chunk by chunk, maps columns, replaces missing
+        #       values, optionally aggregates sub-daily records, and concatenates the result.
+        #       With workers > 1 files are parsed in a process pool; results are consumed in
+        #       file order so concatenation (and drop_duplicates) is identical to serial.
+        #       Files whose content hash + settings hit the parse cache are not re-parsed.
 
         parsed_dfs = []
-        files = sorted(self.in_dir.glob(self.FILE_GLOB))
+        n_parsed = 0
+        aggregator = ChunkAggregator(self.product, self.aggregate) if self.aggregate else None
+        files = self._select_files()
 
         if not files:
             self.logger.warning(f"No USCRN files found in {self.in_dir}")
             return pd.DataFrame()
 
-        self.logger.info(f"[{self.station_name}] Found {len(files)} USCRN files — parsing all years.")
-
-        for file_path in files:
-            try:
-                df = pd.read_csv(
-                    file_path,
-                    sep=self.DELIM,
-                    comment="#",
-                    header=None,
-                    engine="python",
-                )
-
-                # rename known indices for clarity
-                rename_map = {idx: name for name, idx in self.col_indices.items() if idx in df.columns}
-                df = df.rename(columns=rename_map)
-
-                # ensure all expected columns are present
-                df.columns = [
-                    c if isinstance(c, str) else rename_map.get(c, f"col_{c}")
-                    for c in df.columns
-                ]
-
-                # safely convert date
-                if "date" in df.columns:
-                    df["date"] = pd.to_datetime(df["date"], format=self.DATE_FORMAT, errors="coerce")
-
-                # replace -9999 placeholders with NaN for all numeric columns
-                for col in df.columns:
-                    if pd.api.types.is_numeric_dtype(df[col]):
-                        df[col] = df[col].replace(self.NA_VALUE, pd.NA)
-
-                # tag file source
-                df["source_file"] = file_path.name
+        self.logger.info(
+            f"[{self.station_name}] Found {len(files)} USCRN files — parsing all years."
+            + (f" (product={self.product}, aggregate={self.aggregate})" if self.product != "daily01" else "")
+        )
+
+        # unchanged files come straight from the parse cache
+        keys, results = {}, {}
+        if self.cache is not None:
+            for file_path in files:
+                keys[file_path] = self.cache.key(file_path, **self._cache_params())
+                cached = self.cache.load(file_path, keys[file_path])
+                if cached is not None:
+                    results[file_path] = self._from_cache(cached)
+            self.logger.info(f"[{self.station_name}] Parse cache: {len(results)}/{len(files)} files reused.")
+
+        misses = [f for f in files if f not in results]
+        usecols = self._usecols()
+        jobs = [(str(f), self.product, self.col_indices, self.chunk_rows, self.aggregate, usecols) for f in misses]
+        workers = min(self.workers, len(misses))
+
+        with ProcessPoolExecutor(max_workers=workers) if workers > 1 else nullcontext() as executor:
+            if executor is not None:
+                parsed = executor.map(_parse_file_columnar, jobs)
+            else:
+                parsed = (_parse_file(*job) for job in jobs)
+
+            for file_path, result in zip(misses, parsed):
+                if result["frame"] is not None:
+                    result["frame"] = _from_columnar(result["frame"])
+                if result["error"] is None and self.cache is not None:
+                    self.cache.store(file_path, keys[file_path], self._to_cache(result))
+                results[file_path] = result
+
+        names = [f.name for f in files]
+        for i, file_path in enumerate(files):
+            result = results[file_path]
+            if result["error"] is not None:
+                self.logger.error(f"[{self.station_name}] Failed to parse {file_path.name}: {result['error']}")
+                continue
+
+            if aggregator is not None:
+                aggregator.merge(result["aggregator"])
+            else:
+                df = result["frame"]
+                if self.compact:
+                    # shared categories keep source_file categorical through concat
+                    df["source_file"] = pd.Categorical.from_codes(np.full(len(df), i), categories=names)
+                    df = compact_dtypes(df)
+                else:
+                    df["source_file"] = file_path.name
                 parsed_dfs.append(df)
+            n_parsed += 1
 
-                self.logger.debug(f"[{self.station_name}] Parsed {file_path.name}: {len(df)} rows, {len(df.columns)} cols")
+            self.logger.debug(
+                f"[{self.station_name}] Parsed {file_path.name}: {result['rows']} rows, {result['cols']} cols"
+                + (" (cached)" if result.get("cached") else "")
+            )
 
-            except Exception as e:
-                self.logger.error(f"[{self.station_name}] Failed to parse {file_path.name}: {e}")
+        if aggregator is not None:
+            combined_df = aggregator.result()
+        elif parsed_dfs:
+            combined_df = pd.concat(parsed_dfs, ignore_index=True)
+        else:
+            combined_df = pd.DataFrame()
 
-        if not parsed_dfs:
+        if combined_df.empty:
             self.logger.warning(f"[{self.station_name}] No valid data parsed from any files.")
             return pd.DataFrame()
 
-        combined_df = pd.concat(parsed_dfs, ignore_index=True)
-        self.logger.info(f"[{self.station_name}] Combined {len(parsed_dfs)} files into {len(combined_df)} total rows.")
+        self.logger.info(f"[{self.station_name}] Combined {n_parsed} files into {len(combined_df)} total rows.")
+
+        if self.columns:
+            wanted = set(self.columns) | {"station_id", "date", "source_file"}
+            combined_df = combined_df[[c for c in combined_df.columns if c in wanted]]
+        if self.compact:
+            combined_df = compact_dtypes(combined_df)
+            self.logger.info(
+                f"[{self.station_name}] Compact dtypes — {combined_df.memory_usage(deep=True).sum() / 1e6:.1f} MB in memory."
+            )
 
         # [optional] deduplication
         if self.drop_duplicates and {"station_id", "date"} <= set(combined_df.columns):
@@ -151,4 +322,4 @@ class ParsePipe:
             removed = before - len(combined_df)
             self.logger.info(f"[{self.station_name}] Removed {removed} duplicate rows.")
 
-        return combined_df
\ No newline at end of file
+        return combined_df
@@ -4,16 +4,24 @@
 # This module defines the RequestPipe class, which handles
 # HTTP requests to fetch data from the NOAA USCRN dataset.
 
+import os
+import hashlib
+import tempfile
 import requests
+from datetime import date
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from utils.logger import get_logger
 from utils.config import load_config
+from utils.manifest import DownloadManifest, sha256_file
+from utils.uscrn_index import USCRNIndex
+from utils.uscrn_products import get_product
 
 
 class RequestPipe:
-    FILE_PREFIX = "CRND0103"
     FILE_SUFFIX = ".txt"
-    OUTPUT_PREFIX = "uscrn_"
+    CHUNK_SIZE = 1 << 16  # 64 KiB streaming chunks
 
     def __init__(self, config=None):
         # pre: config is a dictionary loaded from config.yaml or None
@@ -29,43 +37,235 @@ class RequestPipe:
         self.end_year = req_cfg["end_year"]
         self.timeout = req_cfg.get("timeout", 20)
         self.min_bytes = req_cfg.get("min_bytes", 500)
+        self.workers = max(1, int(req_cfg.get("workers", 1)))
+        self.chunk_size = int(req_cfg.get("chunk_bytes", self.CHUNK_SIZE))
+
+        # product: daily01 (CRND0103) | hourly02 (CRNH0203) | subhourly01 (CRNS0101-05);
+        # base_url must point at the matching products/<product> directory
+        self.product = req_cfg.get("product", "daily01")
+        product = get_product(self.product)
+        self.file_prefix = product["file_prefix"]
+        self.output_prefix = product["output_prefix"]
 
         self.out_dir = Path(req_cfg.get("out_dir", f"data/{self.station}/raw"))
         self.out_dir.mkdir(parents=True, exist_ok=True)
 
+        # incremental refresh: per-station manifest + optional frozen-years policy
+        self.manifest = DownloadManifest(
+            req_cfg.get("manifest_path") or self.out_dir / "manifest.json", station=self.station
+        )
+        self.frozen_years = req_cfg.get("frozen_years") or []
+        self.changed = False
+
+        # optional discovery: only request station-years present in the NCEI listings
+        self.discover = req_cfg.get("discover", False)
+        self.index_cache_dir = req_cfg.get("index_cache_dir")
+        self.index_ttl_hours = req_cfg.get("index_ttl_hours", 24)
+
         self.logger = get_logger().getChild(f"request.{self.station}")
 
+    def _session(self):
+        # pre:  None
+        # post: returns a requests.Session with a connection pool sized to self.workers
+        # desc: one keep-alive pool shared by every yearly request, so each year reuses
+        #       an open TCP/TLS connection instead of paying a fresh handshake.
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _out_file(self, year):
+        return self.out_dir / f"{self.output_prefix}{self.station}_{year}{self.FILE_SUFFIX}"
+
+    def _is_frozen(self, year):
+        # pre:  year within start_year..end_year
+        # post: True if the frozen-years policy says not to request this year at all
+        # desc: "completed" freezes every past year already recorded in the manifest;
+        #       a list freezes exactly those years. A missing local copy is never frozen.
+
+        if not self._out_file(year).exists():
+            return False
+        if self.frozen_years == "completed":
+            return year < date.today().year and self.manifest.get(year) is not None
+        return year in self.frozen_years
+
+    def _fetch_year(self, session, year, known=None):
+        # pre:  session is an open requests.Session, year is within start_year..end_year,
+        #       known is this year's manifest entry (or None)
+        # post: returns a result dict {year, status, http, size, path, error, ...};
+        #       file written only when its content actually changed
+        # desc: conditional download of one yearly file. Outcome logging is left to _report
+        #       so that concurrent runs log in the same (year) order as the serial loop.
+
+        file_name = f"{self.file_prefix}-{year}-{self.station}{self.FILE_SUFFIX}"
+        url = f"{self.base_url}/{year}/{file_name}"
+        out_file = self._out_file(year)
+        result = {"year": year, "status": "skipped", "http": None, "size": 0, "path": None, "error": None}
+
+        headers = {}
+        if known and out_file.exists():
+            if known.get("etag"):
+                headers["If-None-Match"] = known["etag"]
+            if known.get("last_modified"):
+                headers["If-Modified-Since"] = known["last_modified"]
+
+        self.logger.debug(f"[{self.station}] GET {url}" + (" (conditional)" if headers else ""))
+
+        try:
+            with session.get(url, timeout=self.timeout, headers=headers, stream=True) as response:
+                result["http"] = response.status_code
+                result["etag"] = response.headers.get("ETag")
+                result["last_modified"] = response.headers.get("Last-Modified")
+
+                if response.status_code == 304:
+                    result["status"] = "not_modified"
+                    result["size"] = (known or {}).get("size", 0)
+                elif response.status_code == 200:
+                    self._stream_to_file(response, out_file, known, result)
+                else:
+                    result["size"] = len(response.content)
+
+        except Exception as e:
+            result["status"] = "failed"
+            result["error"] = e
+
+        return result
+
+    def _stream_to_file(self, response, out_file, known, result):
+        # pre:  response is a streamed 200 response for out_file's year
+        # post: out_file atomically replaced if the content is new and larger than min_bytes;
+        #       result updated with size/sha256/status
+        # desc: writes byte chunks to a temp file next to out_file while hashing them,
+        #       then renames over the target. A crash mid-download leaves only a
+        #       .part file (ignored by ParsePipe), never a truncated uscrn_*.txt.
+
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_name = tempfile.mkstemp(dir=self.out_dir, prefix=f".{out_file.name}.", suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    tmp.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+
+            result["size"] = size
+            if size <= self.min_bytes:
+                return
+
+            result["sha256"] = digest.hexdigest()
+
+            # content identical to what we already have -> no write, no reparse
+            previous = (known or {}).get("sha256")
+            if previous is None and out_file.exists():
+                previous = sha256_file(out_file)
+            if previous == result["sha256"] and out_file.exists():
+                result["status"] = "unchanged"
+                return
+
+            os.replace(tmp_name, out_file)
+            result["status"] = "saved"
+            result["path"] = out_file
+        finally:
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+
+    def _report(self, result):
+        # pre:  result produced by _fetch_year (or a frozen placeholder)
+        # post: logs the outcome of one yearly download and records it in the manifest
+        # desc: mirrors the messages of the original serial loop.
+
+        year, status = result["year"], result["status"]
+        if status == "failed":
+            self.logger.error(f"[{self.station}] Failed {year}: {result['error']}")
+        elif status == "saved":
+            self.logger.info(f"[{self.station}] Saved {result['path']}")
+        elif status == "not_modified":
+            self.logger.info(f"[{self.station}] Unchanged {year}: HTTP 304")
+        elif status == "unchanged":
+            self.logger.info(f"[{self.station}] Unchanged {year}: content hash match")
+        elif status == "frozen":
+            self.logger.debug(f"[{self.station}] Frozen {year}: not requested")
+        else:
+            self.logger.warning(
+                f"[{self.station}] Skipped {year}: HTTP {result['http']} "
+                f"({result['size']} bytes)"
+            )
+
+        if status in ("saved", "unchanged", "not_modified"):
+            self.manifest.update(
+                year,
+                etag=result.get("etag"),
+                last_modified=result.get("last_modified"),
+                size=result["size"],
+                sha256=result.get("sha256"),
+            )
+
+    def _discover(self, session, years):
+        # pre:  session is an open requests.Session
+        # post: returns the years whose NCEI directory listing contains this station
+        # desc: listings are cached under index_cache_dir and shared by every station.
+
+        index = USCRNIndex(
+            self.base_url,
+            file_prefix=self.file_prefix,
+            cache_dir=self.index_cache_dir,
+            ttl_hours=self.index_ttl_hours,
+            timeout=self.timeout,
+            session=session,
+        )
+        listed = index.available_years(self.station, years, workers=self.workers)
+        if len(listed) < len(years):
+            self.logger.info(
+                f"[{self.station}] Discovery: {len(listed)}/{len(years)} years listed — "
+                f"skipping {len(years) - len(listed)} unlisted."
+            )
+        return listed
+
     def run(self, _=None):
         # pre:  configuration loaded and output directory exists
-        # post: all valid yearly files downloaded and saved to out_dir
+        # post: new or changed yearly files saved to out_dir; returns only those files
         # desc: executes HTTP requests for each configured year and station, logging results and errors.
+        #       With workers > 1 the years are fetched concurrently over a shared session.
+        #       Requests are conditional on the manifest, and frozen years are not requested.
 
         saved_files = []
+        counts = {}
+        years = list(range(self.start_year, self.end_year + 1))
         self.logger.info(
             f"[{self.station}] Starting RequestPipe for {self.start_year}-{self.end_year}"
+            + (f" ({self.workers} workers)" if self.workers > 1 else "")
         )
 
-        for year in range(self.start_year, self.end_year + 1):
-            file_name = f"{self.FILE_PREFIX}-{year}-{self.station}{self.FILE_SUFFIX}"
-            url = f"{self.base_url}/{year}/{file_name}"
-            self.logger.debug(f"[{self.station}] GET {url}")
+        def fetch(session, year):
+            if self._is_frozen(year):
+                return {"year": year, "status": "frozen", "path": None}
+            return self._fetch_year(session, year, self.manifest.get(year))
 
-            try:
-                response = requests.get(url, timeout=self.timeout)
+        with self._session() as session, ThreadPoolExecutor(max_workers=self.workers) as executor:
+            if self.discover:
+                years = self._discover(session, years)
 
-                if response.status_code == 200 and len(response.content) > self.min_bytes:
-                    out_file = self.out_dir / f"{self.OUTPUT_PREFIX}{self.station}_{year}{self.FILE_SUFFIX}"
-                    out_file.write_text(response.text, encoding="utf-8")
-                    self.logger.info(f"[{self.station}] Saved {out_file}")
-                    saved_files.append(out_file)
-                else:
-                    self.logger.warning(
-                        f"[{self.station}] Skipped {year}: HTTP {response.status_code} "
-                        f"({len(response.content)} bytes)"
-                    )
+            if self.workers > 1:
+                # map() yields in submission order -> logs/results ordered by year
+                results = executor.map(lambda y: fetch(session, y), years)
+            else:
+                results = (fetch(session, year) for year in years)
+
+            for result in results:
+                self._report(result)
+                counts[result["status"]] = counts.get(result["status"], 0) + 1
+                if result["path"] is not None:
+                    saved_files.append(result["path"])
 
-            except Exception as e:
-                self.logger.error(f"[{self.station}] Failed {year}: {e}")
+        self.manifest.save()
+        self.changed = bool(saved_files)
 
-        self.logger.info(f"[{self.station}] RequestPipe complete — {len(saved_files)} files saved.")
+        unchanged = counts.get("unchanged", 0) + counts.get("not_modified", 0)
+        self.logger.info(
+            f"[{self.station}] RequestPipe complete — {len(saved_files)} files saved, "
+            f"{unchanged} unchanged, {counts.get('frozen', 0)} frozen."
+        )
         return saved_files
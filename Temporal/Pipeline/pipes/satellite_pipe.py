@@ -4,175 +4,566 @@
 # This module defines the SatellitePipe class, which retrieves satellite-derived
 # features (LST, NDVI, Rain) from Google Earth Engine in batched requests
 # and merges them into the input dataframe.
-
-import ee
+#
+# Values are cached on a canonical calendar grid (utils/satellite_cache.py): one row
+# per product, station coordinates and native period (day for MOD11A1 / IMERG, 16-day
+# composite for MOD13Q1), plus the day ranges already fetched. Weekly values are
+# derived locally as the mean over each week's padded window, so any date range -
+# shifted week edges, overlapping or extended runs - maps onto existing entries and
+# only uncovered days are requested.
+#
+# Retrieval modes (satellite.mode) decide how uncovered days are requested:
+#   weekly  one series getInfo per product per calendar week (per 16-day composite
+#           for MOD13Q1)
+#   series  one series getInfo per product per calendar year: the region reducer is
+#           mapped over every image server-side and the whole (date, value) series
+#           comes back in a single call
+# Every product is requested at its native cadence: MOD13Q1 once per composite,
+# MOD11A1 once per day, and half-hourly IMERG is averaged to daily images server-side
+# so one value per day crosses the wire.
+#
+# Output cadence (satellite.cadence):
+#   weekly  one mean per week over [start - 3d, end + 3d)
+#   native  one value per native period: a day for LST / Rain_sat, the composite for NDVI
+# Either way the values are windows ([start, end) per week / day / composite) that are
+# joined onto the ground days by satellite.join (utils/interval_join.py): window-constant,
+# nearest window within join_tolerance_days, or linear between window midpoints. The
+# legacy "midpoint" join puts each week on its midpoint date only (weekly cadence).
+#
+# Multi-station mode (prefetch_stations, satellite.multi_station) sends every station's
+# point as one FeatureCollection through reduceRegions, so traffic scales with time
+# windows instead of stations x windows; results are split per station location.
+#
+# The store is SQLite in WAL mode and every fetch is committed as it completes; legacy
+# per-station JSON caches are imported once and served on exact week matches.
+#
+# Earth Engine is imported and initialized lazily, on the first cache miss that needs a
+# fetch, so fully cached runs never touch the network. With satellite.offline: true it is
+# never touched at all: values come from the store only, and uncovered ranges are
+# reported (logged and kept in SatellitePipe.missing_windows) and left NaN.
+#
+# Fetches run on utils/fetch_scheduler.py (satellite.scheduler): concurrency adapts to
+# latency and throttling, transient errors are retried with jittered backoff, and a
+# range that still fails is left uncovered so the next run requests it again.
+
+import sys
+import threading
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from tqdm import tqdm
-import json
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from utils.impute_models import run_xgboost
+from utils.fetch_scheduler import FetchScheduler
+from utils.interval_join import interval_join, JOIN_POLICIES
+from utils.satellite_cache import SatelliteCache, location_key, split_ranges, subtract_ranges, covered_mask
 from utils.logger import get_logger
 from utils.config import load_config
 
+ee = None  # earthengine-api module, imported on first use (see _earth_engine)
+_EE_LOCK = threading.Lock()
+_EE_READY = None  # the ee module object Initialize() last succeeded for
+
+
+def _earth_engine():
+    # post: the imported ee module (ImportError when earthengine-api is not installed)
+    global ee
+    if ee is None:
+        import ee as earthengine
+        ee = earthengine
+    return ee
+
 
 class SatellitePipe:
     MODIS_LST = "MODIS/061/MOD11A1"
     MODIS_NDVI = "MODIS/061/MOD13Q1"
     GPM_RAIN = "NASA/GPM_L3/IMERG_V07"
 
+    # output column -> collection, band, reduction scale (m) and value scale factor
+    # period_days: native compositing period (None = daily); daily_mean: sub-daily
+    # images are averaged to one image per day server-side
+    PRODUCTS = {
+        "LST": {"collection": MODIS_LST, "band": "LST_Day_1km", "scale": 1000, "factor": 0.02,
+                "period_days": None, "daily_mean": False},
+        "NDVI": {"collection": MODIS_NDVI, "band": "NDVI", "scale": 250, "factor": 0.0001,
+                 "period_days": 16, "daily_mean": False},
+        "Rain_sat": {"collection": GPM_RAIN, "band": "precipitation", "scale": 10000, "factor": 1.0,
+                     "period_days": None, "daily_mean": True},
+    }
+    MODES = {"weekly", "series"}
+    MODE_SPLIT = {"weekly": "W-MON", "series": "YS"}  # uncovered days are fetched in these chunks
+    CADENCES = {"weekly", "native"}
+    JOINS = {"midpoint"} | JOIN_POLICIES
+    PAD_DAYS = 3  # each week is averaged over [start - 3d, end + 3d)
+    BUFFER_M = 1000  # 1 km buffer around the station point
+
     def __init__(self, config=None, station_name=None):
         # pre:  config is the global config (not per-station)
         # post: initializes SatellitePipe with GEE connection and caching settings
-        # desc: Initializes Earth Engine and sets up cache path per station
+        # desc: Initializes Earth Engine and opens the canonical satellite store
 
         self.config = config or load_config()
+        sat_cfg = self.config["satellite"]
         self.station_name = station_name or "global"
         self.logger = get_logger().getChild(f"satellite.{self.station_name}")
 
+        # legacy per-station JSON cache (imported into the store once)
+        self.cache_path = self._cache_path_for(self.station_name)
+
+        # canonical store; defaults to the legacy cache directory
+        cache_db = sat_cfg.get("cache_db") or self.cache_path.parent / "satellite_cache.sqlite"
+        self.store = SatelliteCache(cache_db)
+
+        self.logger.info(f"Satellite cache set to: {cache_db}")
+
+        # adaptive fetch concurrency / retries; stats of the last run kept for reporting
+        self.scheduler_cfg = sat_cfg.get("scheduler", {}) or {}
+        self.fetch_stats = None
+
+        self.mode = sat_cfg.get("mode", "weekly")
+        if self.mode not in self.MODES:
+            raise ValueError(f"Unsupported satellite mode: {self.mode} (expected one of {sorted(self.MODES)})")
+
+        self.cadence = sat_cfg.get("cadence", "weekly")
+        if self.cadence not in self.CADENCES:
+            raise ValueError(f"Unsupported satellite cadence: {self.cadence} (expected one of {sorted(self.CADENCES)})")
+
+        # how window values reach the daily rows (midpoint = legacy exact-date merge)
+        self.join = sat_cfg.get("join", "midpoint")
+        if self.join not in self.JOINS:
+            raise ValueError(f"Unsupported satellite join: {self.join} (expected one of {sorted(self.JOINS)})")
+        self.join_tolerance = sat_cfg.get("join_tolerance_days", 3)
+
+        # Earth Engine session: opened on the first fetch (never when offline)
+        self.project = sat_cfg.get("project", "mdr-project-475522")
+        self.offline = sat_cfg.get("offline", False)
+        self.interactive_auth = sat_cfg.get("interactive_auth", True)
+        self.missing_windows = []
+
+    def _connect(self):
+        # post: ee imported and initialized once per process
+        # desc: the interactive Authenticate() fallback only runs on a terminal (and when
+        #       interactive_auth allows it); headless jobs fail fast instead of hanging
+        global _EE_READY
+        with _EE_LOCK:
+            module = _earth_engine()
+            if _EE_READY is module:
+                return
+            try:
+                module.Initialize(project=self.project)
+                self.logger.info(f"Authenticated with Google Earth Engine ({self.project}).")
+            except Exception as e:
+                if not (self.interactive_auth and sys.stdin is not None and sys.stdin.isatty()):
+                    raise RuntimeError(
+                        f"Earth Engine initialization failed ({e}) and no interactive terminal is available; "
+                        f"run `earthengine authenticate` or use satellite.offline: true."
+                    ) from e
+                self.logger.warning(f"EE init failed ({e}), trying to authenticate...")
+                module.Authenticate()
+                module.Initialize(project=self.project)
+            _EE_READY = module
+
+    def _cache_path_for(self, station_name):
         # per-station cache template
         cache_template = self.config["satellite"].get(
             "cache_path",
             "Pipeline/data/cache/{station}_satellite_cache.json"
         )
+        return Path(cache_template.format(station=station_name))
+
+    def _legacy_windows(self, station_name):
+        # post: {week key: {LST, NDVI, Rain_sat}} from the station's imported JSON cache
+        cache_path = self._cache_path_for(station_name)
+        imported = self.store.import_json(cache_path, station_name, self.BUFFER_M)
+        if imported:
+            self.logger.info(f"[{station_name}] Imported {imported} rows from legacy cache {cache_path}.")
+        return self.store.load_windows(station_name, self.PRODUCTS, self.BUFFER_M)
+
+    @staticmethod
+    def _weeks(df):
+        # post: (weekly groups, {week key: (lat, lon, start, end)}) with end exclusive
+        df["date"] = pd.to_datetime(df["date"])
+        grouped = df.groupby(df["date"].dt.to_period("W"))  # weekly for efficiency
+        weeks = {}
+        for period, group in grouped:
+            start = group["date"].min().strftime("%Y-%m-%d")
+            end = (group["date"].max() + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+            lat, lon = group["latitude"].median(), group["longitude"].median()
+            weeks[f"{start}_{end}"] = (lat, lon, start, end)
+        return grouped, weeks
+
+    @staticmethod
+    def _station_days(df):
+        # post: ((lat, lon) on the key grid, sorted unique ground dates)
+        df["date"] = pd.to_datetime(df["date"])
+        loc = location_key(df["latitude"].median(), df["longitude"].median())
+        return loc, pd.DatetimeIndex(df["date"].dt.normalize().unique()).sort_values()
+
+    def _week_frame(self, weeks):
+        # post: DataFrame (key, lat, lon, start, end) with coordinates on the key grid
+        rows = [(key, *location_key(lat, lon), pd.Timestamp(s), pd.Timestamp(e)) for key, (lat, lon, s, e) in weeks.items()]
+        return pd.DataFrame(rows, columns=["key", "lat", "lon", "start", "end"])
+
+    def _padded(self, weeks):
+        pad = pd.Timedelta(days=self.PAD_DAYS)
+        return list(zip(weeks["start"] - pad, weeks["end"] + pad))
+
+    def _gaps(self, needed, product, lat, lon):
+        # post: day ranges of `needed` the store has not fetched yet for product/location
+        return subtract_ranges(needed, self.store.coverage(product, lat, lon, self.BUFFER_M))
+
+    def _period_start(self, product, days):
+        # post: start of the native period holding each day (the day itself for daily
+        #       products; composites restart every Jan 1 at DOY 1, 17, 33, ...)
+        days = pd.DatetimeIndex(days).normalize()
+        period = self.PRODUCTS[product]["period_days"]
+        if not period:
+            return days
+        doy = days.dayofyear.to_numpy() - 1
+        return days - pd.to_timedelta(doy - (doy // period) * period, unit="D")
+
+    def _split(self, product, ranges):
+        # post: uncovered ranges cut into request chunks: years in series mode; weeks,
+        #       or whole composites for composite products, in weekly mode
+        period = self.PRODUCTS[product]["period_days"]
+        if self.mode == "series" or not period:
+            return split_ranges(ranges, self.MODE_SPLIT[self.mode])
+        return split_ranges(ranges, lambda start, end: self._period_start(
+            product, pd.date_range(start, end, freq="D")).unique())
+
+    def _week_needs(self, weeks):
+        # post: {(lat, lon): {product: padded week ranges}} for a week frame
+        return {
+            (lat, lon): {product: self._padded(group) for product in self.PRODUCTS}
+            for (lat, lon), group in weeks.groupby(["lat", "lon"])
+        }
 
-        # resolve per-station cache file
-        self.cache_path = Path(cache_template.format(station=self.station_name))
-
-        self.logger.info(f"Satellite cache path set to: {self.cache_path}")
-
-        try:
-            ee.Initialize(project="mdr-project-475522")
-            self.logger.info("Authenticated with Google Earth Engine (mdr-project-475522).")
-        except Exception as e:
-            self.logger.warning(f"EE init failed ({e}), trying to authenticate...")
-            ee.Authenticate()
-            ee.Initialize(project="mdr-project-475522")
-
-    def fetch_satellite_batch(self, lat, lon, start_date, end_date):
-        # pre: coordinates and date range provided
-        # post: returns dictionary with LST, NDVI, and Rain_sat values
-
-        point = ee.Geometry.Point([lon, lat])
-        buffer_region = point.buffer(1000)  # 1 km buffer
-
-        from datetime import datetime, timedelta
-        start_dt = datetime.strptime(start_date, "%Y-%m-%d") - timedelta(days=3)
-        end_dt = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=3)
-        padded_start, padded_end = start_dt.strftime("%Y-%m-%d"), end_dt.strftime("%Y-%m-%d")
-
-        results = {"LST": None, "NDVI": None, "Rain_sat": None}
-
-        try:
-            # MODIS LST
-            try:
-                lst = (
-                    ee.ImageCollection(self.MODIS_LST)
-                    .filterBounds(buffer_region)
-                    .filterDate(padded_start, padded_end)
-                    .select("LST_Day_1km")
-                )
-                if lst.size().getInfo() > 0:
-                    val = lst.mean().reduceRegion(
-                        reducer=ee.Reducer.mean(),
-                        geometry=buffer_region,
-                        scale=1000,
-                        bestEffort=True,
-                        maxPixels=1e9,
-                    ).get("LST_Day_1km").getInfo()
-                    if val is not None:
-                        results["LST"] = float(val) * 0.02
-            except Exception as e:
-                self.logger.debug(f"LST failed: {e}")
+    def _day_needs(self, days):
+        # post: {product: ranges} covering the native period of every day
+        needs = {}
+        for product in self.PRODUCTS:
+            starts = self._period_start(product, days).unique()
+            needs[product] = [(s, s + pd.Timedelta(days=1)) for s in starts]
+        return needs
+
+    def _fetch(self, needed):
+        # pre:  needed maps (lat, lon) -> {product: day ranges}
+        # post: every uncovered range is requested (one fetch_series per chunk) and each
+        #       result committed to the store as it completes
+        # desc: a failed range is not recorded as covered, so it is requested again on the
+        #       next run.
+        jobs = {}
+        for (lat, lon), ranges in needed.items():
+            for product in self.PRODUCTS:
+                for start, end in self._split(product, self._gaps(ranges[product], product, lat, lon)):
+                    jobs[(product, lat, lon, start, end)] = (
+                        lat, lon, product, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"),
+                    )
+
+        if jobs:
+            self.logger.info(f"[{self.station_name}] Fetching {len(jobs)} uncovered {self.mode} ranges.")
+        for (product, lat, lon, start, end), rows in self._schedule(self.fetch_series, jobs, f"Satellite ({self.station_name})"):
+            self.store.put_series(product, lat, lon, self.BUFFER_M, start, end, self._daily(rows))
+
+    def _schedule(self, fn, jobs, desc):
+        # pre:  jobs maps (product, ..., start, end) -> args for fn
+        # post: yields (job key, result) for every job that succeeded; failures (after
+        #       retries) are logged and skipped so they never reach the store. Offline,
+        #       nothing is fetched: the jobs are reported as missing windows instead.
+        if not jobs:
+            return
+        if self.offline:
+            self._report_missing(jobs)
+            return
+
+        self._connect()
+        scheduler = FetchScheduler.from_config(self.scheduler_cfg)
+        with tqdm(total=len(jobs), desc=desc) as bar:
+            for key, result, error in scheduler.run(fn, jobs):
+                bar.update(1)
+                bar.set_postfix(queue=scheduler.queue_depth, workers=scheduler.limit,
+                                rate=f"{scheduler.throughput:.1f}/s", retries=scheduler.retries)
+                if error is not None:
+                    product, *_, start, end = key
+                    self.logger.warning(f"[{self.station_name}] {product} {start:%Y-%m-%d}_{end:%Y-%m-%d} failed: {error}")
+                    continue
+                yield key, result
 
-            # MODIS NDVI
-            try:
-                ndvi = (
-                    ee.ImageCollection(self.MODIS_NDVI)
-                    .filterBounds(buffer_region)
-                    .filterDate(padded_start, padded_end)
-                    .select("NDVI")
-                )
-                if ndvi.size().getInfo() > 0:
-                    val = ndvi.mean().reduceRegion(
-                        reducer=ee.Reducer.mean(),
-                        geometry=buffer_region,
-                        scale=250,
-                        bestEffort=True,
-                        maxPixels=1e9,
-                    ).get("NDVI").getInfo()
-                    if val is not None:
-                        results["NDVI"] = float(val) * 0.0001
-            except Exception as e:
-                self.logger.debug(f"NDVI failed: {e}")
+        self.fetch_stats = stats = scheduler.stats()
+        self.logger.info(
+            f"[{self.station_name}] Fetch stats — {stats['completed']} ok, {stats['failed']} failed, "
+            f"{stats['retries']} retries ({stats['throttled']} throttled), "
+            f"{stats['throughput']:.2f} req/s, concurrency {stats['concurrency']} (peak {stats['peak_concurrency']})."
+        )
 
-            # GPM Rain
-            try:
-                rain = (
-                    ee.ImageCollection(self.GPM_RAIN)
-                    .filterBounds(buffer_region)
-                    .filterDate(padded_start, padded_end)
-                    .select("precipitation")
-                )
-                if rain.size().getInfo() > 0:
-                    val = rain.mean().reduceRegion(
-                        reducer=ee.Reducer.mean(),
-                        geometry=buffer_region,
-                        scale=10000,
-                        bestEffort=True,
-                        maxPixels=1e9,
-                    ).get("precipitation").getInfo()
-                    if val is not None:
-                        results["Rain_sat"] = float(val)
-            except Exception as e:
-                self.logger.debug(f"Rain failed: {e}")
+    def _report_missing(self, jobs):
+        # post: uncovered ranges appended to self.missing_windows and summarized in the log
+        per_product = {}
+        for product, *loc, start, end in jobs:
+            window = {"product": product, "start": f"{start:%Y-%m-%d}", "end": f"{end:%Y-%m-%d}"}
+            if loc:
+                window["lat"], window["lon"] = loc
+            self.missing_windows.append(window)
+            per_product.setdefault(product, []).append(window)
+        summary = ", ".join(
+            f"{product}: {len(windows)} ({windows[0]['start']} .. {windows[-1]['end']})"
+            for product, windows in per_product.items()
+        )
+        self.logger.warning(f"[{self.station_name}] Offline — {len(jobs)} uncovered ranges left empty: {summary}")
+
+    @staticmethod
+    def _daily(rows):
+        # post: [(YYYY-MM-DD, value)] with one value per day (mean of same-day images)
+        if not rows:
+            return []
+        values = pd.Series([v for _, v in rows], index=[d for d, _ in rows], dtype="float64")
+        daily = values.groupby(level=0).mean()
+        return list(zip(daily.index, daily.tolist()))
+
+    @staticmethod
+    def _collection(spec, region, start_date, end_date):
+        # post: the product's images over [start_date, end_date) at native cadence;
+        #       sub-daily products become one mean image per day (server-side)
+        collection = (
+            ee.ImageCollection(spec["collection"])
+            .filterBounds(region)
+            .filterDate(start_date, end_date)
+            .select(spec["band"])
+        )
+        if not spec.get("daily_mean"):
+            return collection
+
+        start = ee.Date(start_date)
+        n_days = (pd.Timestamp(end_date) - pd.Timestamp(start_date)).days
+
+        def day_mean(offset):
+            day = start.advance(offset, "day")
+            return collection.filterDate(day, day.advance(1, "day")).mean().set("system:time_start", day.millis())
+
+        return ee.ImageCollection.fromImages(ee.List.sequence(0, n_days - 1).map(day_mean))
+
+    def fetch_series(self, lat, lon, product, start_date, end_date):
+        # pre:  product is a PRODUCTS key, dates are YYYY-MM-DD with end exclusive
+        # post: returns [(YYYY-MM-DD, scaled value)] for every image in the range with data
+        # desc: builds the per-image region reduction server-side and pulls the whole
+        #       series back with one getInfo() call.
+
+        spec = self.PRODUCTS[product]
+        region = ee.Geometry.Point([lon, lat]).buffer(self.BUFFER_M)
+        collection = self._collection(spec, region, start_date, end_date)
+
+        def reduce_image(image):
+            value = image.reduceRegion(
+                reducer=ee.Reducer.mean(),
+                geometry=region,
+                scale=spec["scale"],
+                bestEffort=True,
+                maxPixels=1e9,
+            ).get(spec["band"])
+            return ee.Feature(None, {"date": image.date().format("YYYY-MM-dd"), "value": value})
+
+        rows = (
+            collection.map(reduce_image)
+            .filter(ee.Filter.notNull(["value"]))
+            .reduceColumns(ee.Reducer.toList(2), ["date", "value"])
+            .get("list")
+            .getInfo()
+        )
+        return [(day, float(value) * spec["factor"]) for day, value in rows or []]
+
+    def _fetch_weeks(self, missing):
+        # pre:  missing maps week key -> (lat, lon, start, end) (YYYY-MM-DD, end exclusive)
+        # post: returns {week key: {LST, NDVI, Rain_sat}}; only days not yet in the store
+        #       are requested; weeks whose padded window is not fully covered are None
+
+        weeks = self._week_frame(missing)
+        self._fetch(self._week_needs(weeks))
+
+        results = {}
+        for (lat, lon), group in weeks.groupby(["lat", "lon"]):
+            results.update(self._week_values(group, lat, lon))
+        return results
+
+    def _week_values(self, weeks, lat, lon):
+        # post: {week key: {LST, NDVI, Rain_sat}} from the stored series; None where the
+        #       padded window is not fully covered or holds no valid values
+        pad = pd.Timedelta(days=self.PAD_DAYS)
+        out = {key: {product: None for product in self.PRODUCTS} for key in weeks["key"]}
+        for product in self.PRODUCTS:
+            covered = self.store.coverage(product, lat, lon, self.BUFFER_M)
+            ok = covered_mask(weeks["start"] - pad, weeks["end"] + pad, covered)
+            if not ok.any():
+                continue
+            rows = self.store.series(
+                product, lat, lon, self.BUFFER_M,
+                weeks["start"].min() - pad, weeks["end"].max() + pad,
+            )
+            rows = [(day, value) for day, value in rows if value is not None]
+            for key, value in self._window_means(rows, weeks[ok]).items():
+                out[key][product] = value
+        return out
+
+    def _native_windows(self, product, days, lat, lon):
+        # pre:  days is a sorted DatetimeIndex of unique ground dates
+        # post: (starts, ends, values) of the stored native periods around the days: one
+        #       day for daily products, the composite (cut at Dec 31) for composites
+        # desc: only fetched periods have rows, so uncovered days simply get no window
+        keys = self._period_start(product, days)
+        period = self.PRODUCTS[product]["period_days"] or 1
+        margin = pd.Timedelta(days=period + (self.join_tolerance or 0))
+        rows = self.store.series(product, lat, lon, self.BUFFER_M, keys.min() - margin, keys.max() + margin)
+
+        starts = pd.DatetimeIndex(pd.to_datetime([day for day, _ in rows]))
+        values = np.array([value for _, value in rows], dtype="float64")
+        ends = starts + pd.Timedelta(days=period)
+        if period > 1:
+            ends = ends.where(ends.year == starts.year, (starts + pd.offsets.YearBegin(1)).normalize())
+        return starts, ends, values
+
+    def _window_means(self, rows, weeks):
+        # pre:  rows is [(YYYY-MM-DD, value)], weeks has key/start/end (Timestamps, end exclusive)
+        # post: {week key: mean of rows in [start - pad, end + pad) or None}
+        # desc: cumulative sums + searchsorted -> every window mean in one vectorized pass
+        if not rows:
+            return {}
+        pad = pd.Timedelta(days=self.PAD_DAYS)
+        values = pd.Series([v for _, v in rows], index=pd.to_datetime([d for d, _ in rows])).sort_index()
+        days = values.index.to_numpy()
+        csum = np.concatenate([[0.0], np.cumsum(values.to_numpy())])
+
+        lo = np.searchsorted(days, (weeks["start"] - pad).to_numpy(), side="left")
+        hi = np.searchsorted(days, (weeks["end"] + pad).to_numpy(), side="left")
+        count = hi - lo
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = (csum[hi] - csum[lo]) / count
+        return {key: float(mean) if n > 0 else None for key, n, mean in zip(weeks["key"], count, means)}
+
+    # ---------------------------------------------------------------------
+    # multi-station retrieval
+    # ---------------------------------------------------------------------
+
+    def _points(self, locations):
+        # locations: {id: (lat, lon)} -> FeatureCollection of 1 km buffers tagged by id
+        return ee.FeatureCollection([
+            ee.Feature(ee.Geometry.Point([lon, lat]).buffer(self.BUFFER_M), {"id": name})
+            for name, (lat, lon) in locations.items()
+        ])
+
+    def fetch_regions_series(self, locations, product, start_date, end_date):
+        # pre:  locations maps id -> (lat, lon); dates YYYY-MM-DD, end exclusive
+        # post: {id: [(YYYY-MM-DD, scaled value)]} from a single getInfo()
+        # desc: reduceRegions over all station buffers for every image, flattened and
+        #       returned as one (station, date, mean) list.
+
+        spec = self.PRODUCTS[product]
+        points = self._points(locations)
+        collection = self._collection(spec, points, start_date, end_date)
+
+        def reduce_image(image):
+            day = image.date().format("YYYY-MM-dd")
+            return image.reduceRegions(
+                collection=points, reducer=ee.Reducer.mean(), scale=spec["scale"]
+            ).map(lambda f: f.set("date", day))
+
+        rows = (
+            collection.map(reduce_image)
+            .flatten()
+            .filter(ee.Filter.notNull(["mean"]))
+            .reduceColumns(ee.Reducer.toList(3), ["id", "date", "mean"])
+            .get("list")
+            .getInfo()
+        )
+        out = {name: [] for name in locations}
+        for name, day, value in rows or []:
+            out[name].append((day, float(value) * spec["factor"]))
+        return out
+
+    def prefetch_stations(self, frames):
+        # pre:  frames maps station name -> ground DataFrame (date, latitude, longitude)
+        # post: the store covers every station's weeks (days with cadence: native);
+        #       returns {station: weeks / days resolved}
+        # desc: one shared Earth Engine session for all stations. Uncovered days are
+        #       gathered per product across station locations and cut into the mode's
+        #       chunks (years or weeks); each chunk is one reduceRegions computation over
+        #       the locations that need it, committed per location as it completes.
+
+        needed, counts = {}, {}
+        for name, df in frames.items():
+            if df is None or df.empty:
+                continue
+            if self.cadence == "native":
+                loc, days = self._station_days(df)
+                counts[name] = len(days)
+                station_needs = {loc: self._day_needs(days)}
+            else:
+                legacy = self._legacy_windows(name)
+                _, weeks = self._weeks(df)
+                missing = {key: week for key, week in weeks.items() if key not in legacy}
+                counts[name] = len(missing)
+                station_needs = self._week_needs(self._week_frame(missing)) if missing else {}
+
+            for loc, ranges in station_needs.items():
+                for product, product_ranges in ranges.items():
+                    needed.setdefault(loc, {}).setdefault(product, []).extend(product_ranges)
+
+        jobs = {}
+        for product in self.PRODUCTS:
+            gaps = {loc: self._gaps(ranges[product], product, *loc) for loc, ranges in needed.items()}
+            gaps = {loc: g for loc, g in gaps.items() if g}
+            for start, end in self._split(product, [r for g in gaps.values() for r in g]):
+                locations = {
+                    f"{lat},{lon}": (lat, lon) for (lat, lon), g in gaps.items()
+                    if any(s < end and e > start for s, e in g)
+                }
+                jobs[(product, start, end)] = (locations, product, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))
+
+        if not jobs:
+            self.logger.info(f"[{self.station_name}] Satellite store already covers every station — nothing to prefetch.")
+            return counts
 
-            return results
+        self.logger.info(
+            f"[{self.station_name}] Multi-station prefetch ({self.mode}) for {len(needed)} locations: "
+            f"{len(jobs)} reduceRegions requests."
+        )
+        for (product, start, end), result in self._schedule(self.fetch_regions_series, jobs, "Satellite multi-station"):
+            for loc_id, (lat, lon) in jobs[(product, start, end)][0].items():
+                self.store.put_series(product, lat, lon, self.BUFFER_M, start, end, self._daily(result[loc_id]))
 
-        except Exception as e:
-            self.logger.warning(f"Batch satellite retrieval failed: {e}")
-            return results
+        return counts
 
     def run(self, df):
         if df is None or df.empty:
             self.logger.warning("No data received in SatellitePipe.")
             return pd.DataFrame()
 
-        cache_path = self.cache_path
-        cache = {}
-        if cache_path.exists():
-            self.logger.info(f"Using satellite cache at {cache_path.resolve()}")
-            with open(cache_path) as f:
-                cache = json.load(f)
-
         self.logger.info(f"[{self.station_name}] Starting batched satellite retrieval for {len(df)} rows...")
-        df["date"] = pd.to_datetime(df["date"])
-        grouped = df.groupby(df["date"].dt.to_period("W"))  # weekly for efficiency
-
-        # fetch only missing weeks
-        futures = {}
-        with ThreadPoolExecutor(max_workers=4) as executor:
-            for period, group in grouped:
-                start = group["date"].min().strftime("%Y-%m-%d")
-                end = (group["date"].max() + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
-                date_key = f"{start}_{end}"
-                if date_key in cache:
-                    continue
-                lat, lon = group["latitude"].median(), group["longitude"].median()
-                futures[executor.submit(self.fetch_satellite_batch, lat, lon, start, end)] = date_key
-
-            for future in tqdm(as_completed(futures), total=len(futures), desc=f"Satellite ({self.station_name})"):
-                date_key = futures[future]
-                try:
-                    cache[date_key] = future.result()
-                except Exception as e:
-                    self.logger.warning(f"Batch {date_key} failed: {e}")
-                    cache[date_key] = {"LST": None, "NDVI": None, "Rain_sat": None}
-
-        # save updated cache
-        cache_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(cache_path, "w") as f:
-            json.dump(cache, f, indent=2)
+        if self.cadence == "native":
+            loc, days = self._station_days(df)
+            self._fetch({loc: self._day_needs(days)})
+            how = "window" if self.join == "midpoint" else self.join
+            for product in self.PRODUCTS:
+                starts, ends, values = self._native_windows(product, days, *loc)
+                df[product] = interval_join(df["date"], starts, ends, values, how, self.join_tolerance)
+            return self._report(df)
+
+        legacy = self._legacy_windows(self.station_name)
+        grouped, weeks = self._weeks(df)
+
+        # legacy records serve exact week matches; everything else comes from the grid
+        cache = {key: legacy[key] for key in weeks if key in legacy}
+        missing = {key: week for key, week in weeks.items() if key not in legacy}
+        if missing:
+            cache.update(self._fetch_weeks(missing))
+
+        if self.join != "midpoint":
+            # every day of a week's ground span belongs to that week's window
+            spans = [(key, pd.Timestamp(start), pd.Timestamp(end)) for key, (_, _, start, end) in weeks.items()]
+            starts = [start for _, start, _ in spans]
+            ends = [end for _, _, end in spans]
+            for product in self.PRODUCTS:
+                values = [cache.get(key, {}).get(product) for key, _, _ in spans]
+                values = np.array([np.nan if v is None else v for v in values], dtype="float64")
+                df[product] = interval_join(df["date"], starts, ends, values, self.join, self.join_tolerance)
+            return self._report(df)
 
         sat_rows = []
         for period, group in grouped:
@@ -193,7 +584,9 @@ class SatellitePipe:
 
         # merge (keep NaNs — let TemporalFillPipe handle later)
         merged = pd.merge(df, sat_df, on="date", how="left")
+        return self._report(merged)
 
+    def _report(self, merged):
         coverage = {
             "LST": merged["LST"].notna().mean(),
             "NDVI": merged["NDVI"].notna().mean(),
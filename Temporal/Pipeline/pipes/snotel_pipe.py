@@ -0,0 +1,222 @@
+# Jakob Balkovec
+# SNOTEL Pipe
+
+# This module defines the SNOTELPipe class, which parses SNOTEL station histories
+# distributed as ISMN "header + values" .stm files (one file per variable and sensor
+# depth) into the same daily schema the USCRN path produces.
+#
+# .stm layout (whitespace-delimited):
+#   line 1:  CSE_id network station lat lon elevation depth_from depth_to sensor...
+#   line 2+: YYYY/MM/DD HH:MM value ismn_flag provider_flag
+# The variable and depths (m) are also encoded in the file name:
+#   <network>_<network>_<station>_<var>_<from>_<to>_<sensor>_<start>_<end>.stm
+
+import re
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from utils.logger import get_logger
+from utils.config import load_config
+from utils.parse_cache import ParseCache
+
+# ISMN variable code -> USCRN column stem
+SNOTEL_VARIABLES = {"sm": "soil_moisture", "ts": "soil_temp", "ta": "air_temp", "p": "precipitation"}
+
+# USCRN sensor depths; SNOTEL probes sit at 2/4/8/20/40 in (5.08/10.16/20.32/50.8/101.6 cm)
+USCRN_DEPTHS_CM = (5, 10, 20, 50, 100)
+
+STM_FILE = re.compile(r"_(?P<var>[a-z]+)_(?P<depth_from>-?\d+(?:\.\d+)?)_(?P<depth_to>-?\d+(?:\.\d+)?)_")
+STM_NA_VALUES = ["-9999", "-9999.0", "-9999.00", "NaN", "nan"]
+
+
+def stm_column(var, depth_m):
+    # pre:  var is an ISMN variable code, depth_m the sensor depth in meters
+    # post: returns the USCRN column name for the variable, or None if unsupported
+    stem = SNOTEL_VARIABLES.get(var)
+    if stem is None or var not in ("sm", "ts"):
+        return stem
+    depth_cm = min(USCRN_DEPTHS_CM, key=lambda d: abs(d - depth_m * 100))
+    return f"{stem}_{depth_cm}cm"
+
+
+def read_stm_header(path):
+    # post: returns {station, latitude, longitude, elevation, depth_from, depth_to}
+    with open(path) as f:
+        fields = f.readline().split()
+    return {
+        "station": fields[2],
+        "latitude": float(fields[3]),
+        "longitude": float(fields[4]),
+        "elevation": float(fields[5]),
+        "depth_from": float(fields[6]),
+        "depth_to": float(fields[7]),
+    }
+
+
+def read_stm(path, good_flags=("G",)):
+    # pre:  path is an ISMN header+values .stm file
+    # post: returns a DataFrame (day: datetime64, value: float64) with one row per record;
+    #       values whose ISMN flag is not in good_flags are NaN
+    # desc: one C-engine pass with fixed dtypes; the HH:MM field is skipped since the
+    #       pipeline only needs the calendar day, which parses with an exact format.
+
+    df = pd.read_csv(
+        path,
+        sep=r"\s+",
+        skiprows=1,
+        header=None,
+        names=["day", "time", "value", "ismn_flag", "provider_flag"],
+        usecols=["day", "value", "ismn_flag"],
+        dtype={"day": "str", "value": "float64", "ismn_flag": "category"},
+        na_values={"value": STM_NA_VALUES},
+        keep_default_na=False,
+        engine="c",
+    )
+    df["day"] = pd.to_datetime(df["day"], format="%Y/%m/%d")
+    if good_flags:
+        df["value"] = df["value"].where(df["ismn_flag"].isin(good_flags))
+    return df[["day", "value"]]
+
+
+def daily_stm(path, column, good_flags=("G",)):
+    # pre:  column is the USCRN column stm_column() mapped this file to
+    # post: returns a daily DataFrame indexed by `date` with the USCRN column(s)
+    df = read_stm(path, good_flags)
+    grouped = df.groupby("day", sort=True)["value"]
+
+    if column == "air_temp":
+        daily = pd.DataFrame({
+            "air_temp_max": grouped.max(),
+            "air_temp_min": grouped.min(),
+            "air_temp_avg": grouped.mean(),
+        })
+        # TEMP_DAILY_MEAN in daily01 is (max + min) / 2
+        daily["air_temp_mean"] = (daily["air_temp_max"] + daily["air_temp_min"]) / 2
+    elif column == "precipitation":
+        daily = grouped.sum(min_count=1).to_frame(column)
+    else:
+        daily = grouped.mean().to_frame(column)
+
+    daily.index.name = "date"
+    return daily
+
+
+class SNOTELPipe:
+    FILE_GLOB = "*.stm"
+
+    def __init__(self, config=None):
+        # pre:  config is the station's parse block (snotel_mode: true) or None
+        # post: initializes SNOTELPipe with station metadata and parse options
+        # desc: lat/lon/elevation come from config (header values are the fallback),
+        #       station_id is the trailing SNOTEL site number of `station`.
+
+        self.config = config or load_config()
+        snotel_cfg = self.config
+
+        self.in_dir = Path(snotel_cfg.get("in_dir", "data/raw"))
+        self.station_name = snotel_cfg.get("station", "unknown_station")
+        self.latitude = snotel_cfg.get("latitude")
+        self.longitude = snotel_cfg.get("longitude")
+        self.elevation = snotel_cfg.get("elevation")
+        self.add_rolling_rain = snotel_cfg.get("add_rolling_rain", False)
+        self.drop_duplicates = snotel_cfg.get("drop_duplicates", True)
+        self.start_year = snotel_cfg.get("start_year")
+        self.end_year = snotel_cfg.get("end_year")
+
+        # ISMN quality flags accepted as valid (everything else -> NaN)
+        self.good_flags = tuple(snotel_cfg.get("good_flags", ["G"]))
+
+        # same content-addressed cache ParsePipe uses for USCRN files
+        cache_dir = snotel_cfg.get("cache_dir")
+        self.cache = ParseCache(cache_dir) if cache_dir else None
+
+        site = re.search(r"(\d+)$", self.station_name)
+        self.station_id = int(site.group(1)) if site else None
+
+        self.logger = get_logger().getChild(f"snotel.{self.station_name}")
+
+    def _file_column(self, path):
+        # post: (USCRN column, header) for a .stm file; column None when unsupported
+        header = read_stm_header(path)
+        m = STM_FILE.search(path.name)
+        var = m.group("var") if m else None
+        depth = float(m.group("depth_from")) if m else header["depth_from"]
+        return stm_column(var, depth), header
+
+    def _daily(self, path, column):
+        # post: daily frame for one file, served from the parse cache when unchanged
+        if self.cache is None:
+            return daily_stm(path, column, self.good_flags), False
+
+        key = self.cache.key(path, format="stm-daily", column=column, good_flags=self.good_flags)
+        cached = self.cache.load(path, key)
+        if cached is not None:
+            return cached.set_index("date"), True
+
+        daily = daily_stm(path, column, self.good_flags)
+        self.cache.store(path, key, daily.reset_index())
+        return daily, False
+
+    def run(self, _=None):
+        # pre:  .stm files for this station exist in in_dir
+        # post: returns a daily DataFrame in the USCRN schema (station_id, date, longitude,
+        #       latitude, air_temp_*, precipitation, soil_moisture_*cm, soil_temp_*cm)
+        # desc: each file is read once and reduced to daily values, then all variables are
+        #       aligned on date. Files of the same column (sensor swaps) are combined,
+        #       earlier files taking precedence.
+
+        files = sorted(self.in_dir.glob(self.FILE_GLOB))
+        if not files:
+            self.logger.warning(f"[{self.station_name}] No SNOTEL .stm files found in {self.in_dir}")
+            return pd.DataFrame()
+
+        self.logger.info(f"[{self.station_name}] Found {len(files)} SNOTEL files.")
+
+        columns, header, hits = {}, None, 0
+        for path in files:
+            try:
+                column, header = self._file_column(path)
+                if column is None:
+                    self.logger.debug(f"[{self.station_name}] Skipping {path.name}: unsupported variable.")
+                    continue
+
+                daily, cached = self._daily(path, column)
+                hits += cached
+                for col in daily.columns:
+                    columns[col] = daily[col] if col not in columns else columns[col].combine_first(daily[col])
+                self.logger.debug(f"[{self.station_name}] Parsed {path.name}: {len(daily)} days -> {column}")
+
+            except Exception as e:
+                self.logger.error(f"[{self.station_name}] Failed to parse {path.name}: {e}")
+
+        if not columns:
+            self.logger.warning(f"[{self.station_name}] No valid data parsed from any files.")
+            return pd.DataFrame()
+
+        if self.cache is not None:
+            self.logger.info(f"[{self.station_name}] Parse cache: {hits}/{len(files)} files reused.")
+
+        df = pd.DataFrame(columns).sort_index().reset_index()
+
+        if self.start_year is not None:
+            df = df[df["date"].dt.year >= self.start_year]
+        if self.end_year is not None:
+            df = df[df["date"].dt.year <= self.end_year]
+
+        df.insert(0, "station_id", self.station_id)
+        df.insert(2, "longitude", float(self.longitude if self.longitude is not None else header["longitude"]))
+        df.insert(3, "latitude", float(self.latitude if self.latitude is not None else header["latitude"]))
+        df.attrs["elevation"] = self.elevation if self.elevation is not None else header["elevation"]
+
+        if self.add_rolling_rain and "precipitation" in df.columns:
+            df["Rain_3d"] = df["precipitation"].fillna(0).rolling(window=3, min_periods=1).sum()
+
+        if self.drop_duplicates:
+            df = df.drop_duplicates(subset=["station_id", "date"])
+
+        df = df.reset_index(drop=True)
+        self.logger.info(
+            f"[{self.station_name}] SNOTELPipe complete — {len(df)} days "
+            f"({df['date'].min():%Y-%m-%d} to {df['date'].max():%Y-%m-%d}), {len(df.columns)} columns."
+        )
+        return df
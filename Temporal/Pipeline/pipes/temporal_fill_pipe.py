@@ -3,13 +3,40 @@
 
 # This module defines the TemporalFillPipe class, which fills temporal gaps in the data
 # for each station by interpolating missing timestamps.
+#
+# Fitted imputers are kept in a ModelCache (utils/model_cache.py) keyed by a fingerprint
+# of the station, column, features, hyperparameters and training rows, so a rerun on
+# unchanged satellite data only predicts. `retrain: true` refits (and overwrites).
+#
+# With `workers` > 1 the columns are imputed concurrently (XGBoost releases the GIL);
+# `cpu_budget` threads are split between column workers and per-model XGBoost threads.
+# Results are written back by index alignment and wall time is reported per column.
+#
+# Engines (`engine`):
+#   xgboost  every missing value is predicted by the tree model
+#   hybrid   gaps are routed by length (utils/gap_fill.py): interpolation up to
+#            switch_gap days, rolling regression up to regression_window, the model
+#            up to max_gap_days; longer gaps stay NaN and are flagged in {col}_gap_flag
+#
+# Incremental mode (`incremental: true`) keeps the last output and models in a FillState
+# (utils/fill_state.py). A run then refills only new / changed rows and the gaps whose
+# fill depends on them, predicting with the saved model, so a daily append costs about
+# the same however long the history is. Delete the state (or turn the mode off) to refit.
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import pandas as pd
 
 from utils.logger import get_logger
 from utils.config import load_config
-from utils.impute_models import run_xgboost
+from utils.impute_models import fit_xgboost, xgb_features, XGB_PARAMS
+from utils.model_cache import ModelCache
+from utils.fill_state import FillState
+from utils.gap_fill import hybrid_fill, update_fill, METHOD_NAMES, OBSERVED, MODEL, UNFILLED
+from xgboost import XGBRegressor
 
 # cuz I just couldn't be bothered to fix all the FutureWarnings right now
 import warnings
@@ -22,6 +49,8 @@ warnings.filterwarnings(
 
 
 class TemporalFillPipe:
+    ENGINES = {"xgboost", "hybrid"}
+
     def __init__(self, config=None, station_name=None):
         self.config = config or load_config()
         self.station_name = station_name or "global"
@@ -32,8 +61,44 @@ class TemporalFillPipe:
         self.switch_gap = fill_cfg.get("switch_gap", 4)
         self.regression_window = fill_cfg.get("regression_window", 7)
 
+        self.engine = fill_cfg.get("engine", "xgboost")
+        if self.engine not in self.ENGINES:
+            raise ValueError(f"Unsupported temporal fill engine: {self.engine} (expected one of {sorted(self.ENGINES)})")
+
+        # fitted-model cache (null = always train)
+        cache_dir = fill_cfg.get("model_cache_dir")
+        self.model_cache = ModelCache(cache_dir, fill_cfg.get("model_cache_max_entries", 64)) if cache_dir else None
+        self.retrain = fill_cfg.get("retrain", False)
+
+        # CPU budget: column workers x XGBoost threads per model <= cpu_budget
+        self.workers = int(fill_cfg.get("workers", 1) or 1)
+        self.cpu_budget = int(fill_cfg.get("cpu_budget") or os.cpu_count() or 1)
+        self.timings = {}  # column -> wall time (s) of the last run
+
+        # incremental mode: the last output + models per station (null state_dir = off)
+        state_dir = fill_cfg.get("state_dir")
+        self.state = None
+        if fill_cfg.get("incremental", False) and state_dir:
+            settings = {"engine": self.engine, "routing": self._routing(), "params": XGB_PARAMS}
+            self.state = FillState(state_dir, self.station_name, settings)
+        self._models = {}  # column -> model fitted in the current run
+
         self.logger = get_logger().getChild(f"temporal_fill.{self.station_name}")
 
+    def _plan(self, n_columns):
+        # post: (column workers, XGBoost threads per model) within cpu_budget
+        if self.workers <= 1 or n_columns <= 1:
+            return 1, self.cpu_budget
+        workers = max(1, min(self.workers, n_columns, self.cpu_budget))
+        return workers, max(1, self.cpu_budget // workers)
+
+    def _routing(self):
+        # post: (switch_gap, regression_window, max_gap_days) for hybrid_fill; the xgboost
+        #       engine routes every gap to the model
+        if self.engine == "hybrid":
+            return self.switch_gap, self.regression_window, self.max_gap_days
+        return -1, -1, np.inf
+
     def run(self, df):
         if df is None or df.empty:
             self.logger.warning(f"[{self.station_name}] Received empty DataFrame in TemporalFillPipe.")
@@ -45,43 +110,144 @@ class TemporalFillPipe:
 
         df = df.copy()
         df["date"] = pd.to_datetime(df["date"], errors="coerce")
-        df = df.sort_values("date").reset_index(drop=True)
+        if not df["date"].is_monotonic_increasing:
+            df = df.sort_values("date", kind="stable")
+        df = df.reset_index(drop=True)
 
         satellite_cols = [c for c in ["LST", "NDVI", "Rain_sat"] if c in df.columns]
         if not satellite_cols:
             self.logger.info(f"[{self.station_name}] No satellite columns found for XGBoost imputation.")
             return df
 
-        self.logger.info(
-            f"[{self.station_name}] Running XGBoost imputation for satellite data: {', '.join(satellite_cols)}"
-        )
-
-        for col in satellite_cols:
-            try:
-                work = df[["date", col]].drop_duplicates(subset="date").sort_values("date")
-                work = work.dropna(subset=["date"])
-
-                n_known = work[col].notna().sum()
-                if n_known < 2:
-                    self.logger.warning(f"[{self.station_name}] Skipping {col}: insufficient known values ({n_known}).")
-                    continue
-
-                imputed = run_xgboost(work.copy(), col)
-
-                # Merge predictions back by date
-                merged = df.merge(
-                    imputed[["date", col + "_interp"]],
-                    on="date",
-                    how="left"
-                )
+        # one row per date (first occurrence); rows maps every df row onto it (-1 = no date)
+        base = df[["date", *satellite_cols]].dropna(subset=["date"]).drop_duplicates(subset="date")
+        base = base.reset_index(drop=True)
+        rows = pd.Index(base["date"]).get_indexer(df["date"])
 
-                # Replace original values with XGBoost predictions where missing
-                df[col] = merged[col].combine_first(merged[col + "_interp"])
-                coverage = df[col].notna().mean()
-                self.logger.info(f"[{self.station_name}] {col}: XGBoost imputed coverage = {coverage:.2%}")
+        state = self.state.load() if self.state is not None else None
+        prev_rows = pd.Index(state["date"]).get_indexer(base["date"]) if state is not None else None
+        self._models = {}
 
-            except Exception as e:
-                self.logger.warning(f"[{self.station_name}] XGBoost imputation failed for {col}: {e}")
+        workers, n_jobs = self._plan(len(satellite_cols))
+        self.logger.info(
+            f"[{self.station_name}] Running {self.engine} imputation for satellite data: {', '.join(satellite_cols)} "
+            f"({workers} column worker(s) x {n_jobs} thread(s)"
+            + (", incremental)" if state is not None else ")")
+        )
 
+        # columns only read base; each result is written back once all are done
+        impute = lambda col: self._impute(base, col, n_jobs, state, prev_rows)
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = dict(zip(satellite_cols, executor.map(impute, satellite_cols)))
+        else:
+            results = {col: impute(col) for col in satellite_cols}
+
+        saved = {"date": base["date"]}
+        changed = 0
+        for col, (values, method, n_changed, seconds) in results.items():
+            self.timings[col] = seconds
+            if values is None:
+                continue
+            changed += n_changed
+
+            # values by date -> df rows (index-aligned, no merge copy of the frame);
+            # replace original values with the imputed ones where missing
+            df[col] = df[col].fillna(pd.Series(_take(values, rows, np.nan), index=df.index))
+            if self.engine == "hybrid":
+                df[f"{col}_gap_flag"] = _take(method, rows, OBSERVED) == UNFILLED
+            saved.update({f"{col}_raw": base[col].to_numpy(dtype="float64"), col: values, f"{col}_method": method})
+
+            coverage = df[col].notna().mean()
+            self.logger.info(f"[{self.station_name}] {col}: {self.engine} imputed coverage = {coverage:.2%} ({seconds:.2f}s)")
+
+        if self.state is not None and (changed or state is None):
+            self.state.save(pd.DataFrame(saved))
+            for col, model in self._models.items():
+                self.state.save_model(col, model)
+
+        if self.model_cache is not None:
+            self.logger.info(
+                f"[{self.station_name}] Model cache: {self.model_cache.hits} reused, "
+                f"{self.model_cache.misses} trained" + (" (retrain forced)" if self.retrain else "")
+            )
         self.logger.info(f"[{self.station_name}] TemporalFillPipe complete — {len(df)} rows processed.")
         return df
+
+    def _impute(self, base, col, n_jobs, state=None, prev_rows=None):
+        # pre:  base has one date-sorted row per date; state / prev_rows are the previous
+        #       run's saved frame and the state row of each base row (incremental mode)
+        # post: (filled values, fill method codes - both aligned with base - or None on
+        #       skip / failure; number of rows imputed from scratch; wall time in seconds)
+        started = time.perf_counter()
+        try:
+            raw = base[col].to_numpy(dtype="float64")
+            n_known = int((~np.isnan(raw)).sum())
+            if n_known < 2:
+                self.logger.warning(f"[{self.station_name}] Skipping {col}: insufficient known values ({n_known}).")
+                return None, None, 0, time.perf_counter() - started
+
+            if state is not None and f"{col}_raw" in state.columns:
+                values, method, n_changed = self._update(base, col, raw, state, prev_rows, n_jobs)
+                self.logger.info(f"[{self.station_name}] {col}: {n_changed} new / changed rows")
+            else:
+                values, method = self._fill(base, col, raw, n_jobs)
+                n_changed = len(raw)
+
+            if self.engine == "hybrid":
+                counts = np.bincount(method[method >= 0], minlength=len(METHOD_NAMES))
+                self.logger.info(
+                    f"[{self.station_name}] {col} gaps: "
+                    + ", ".join(f"{METHOD_NAMES[m]} {counts[m]}" for m in sorted(METHOD_NAMES) if m)
+                )
+            return values, method, n_changed, time.perf_counter() - started
+
+        except Exception as e:
+            self.logger.warning(f"[{self.station_name}] {self.engine} imputation failed for {col}: {e}")
+            return None, None, 0, time.perf_counter() - started
+
+    def _fill(self, base, col, raw, n_jobs):
+        # post: (values, method) for the whole column
+        def model():
+            fitted, featured, features = fit_xgboost(base[["date", col]], col, cache=self.model_cache,
+                                                     station=self.station_name, retrain=self.retrain, n_jobs=n_jobs)
+            if fitted is None:
+                return raw
+            self._models[col] = fitted
+            return fitted.predict(featured[features].ffill().bfill())
+
+        if self.engine == "hybrid":
+            return hybrid_fill(base["date"], raw, *self._routing(), model)
+
+        # xgboost engine: the model fills every missing value
+        missing = np.isnan(raw)
+        return np.where(missing, model(), raw), np.where(missing, MODEL, OBSERVED).astype(np.int8)
+
+    def _update(self, base, col, raw, state, prev_rows, n_jobs):
+        # post: (values, method, changed row count): the previous output, refilled only
+        #       where new / changed input invalidates it
+        prev_raw = _take(state[f"{col}_raw"].to_numpy(dtype="float64"), prev_rows, np.nan)
+        same = (prev_rows >= 0) & ((raw == prev_raw) | (np.isnan(raw) & np.isnan(prev_raw)))
+        filled = _take(state[col].to_numpy(dtype="float64"), prev_rows, np.nan)
+        method = _take(state[f"{col}_method"].to_numpy(dtype=np.int8), prev_rows, -1)
+
+        def model(lo, hi):
+            # the previous run's model predicts the region; fitted only if there is none
+            fitted = self.state.load_model(col, XGBRegressor(n_jobs=n_jobs))
+            if fitted is None:
+                fitted, _, _ = fit_xgboost(base[["date", col]], col, cache=self.model_cache,
+                                           station=self.station_name, retrain=self.retrain, n_jobs=n_jobs)
+                if fitted is None:
+                    return raw[lo:hi]
+                self._models[col] = fitted
+            featured, features = xgb_features(base.iloc[lo:hi][["date", col]], col)
+            return fitted.predict(featured[features].ffill().bfill())
+
+        values, method = update_fill(base["date"], raw, filled, method, ~same, *self._routing(), model)
+        return values, method, int((~same).sum())
+
+
+def _take(values, rows, fill):
+    # post: values[rows] with fill where rows == -1
+    out = np.asarray(values)[np.clip(rows, 0, None)] if len(values) else np.full(len(rows), fill)
+    return np.where(rows >= 0, out, fill)
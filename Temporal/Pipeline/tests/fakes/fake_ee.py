@@ -0,0 +1,395 @@
+# Jakob Balkovec
+# Fake Earth Engine
+
+# Local stand-in for the subset of the `ee` client API SatellitePipe uses. Everything
+# is evaluated eagerly in Python, but values only leave the "server" through
+# getInfo(), which is counted and can be delayed (latency) or made to fail, so the
+# number of round trips a retrieval strategy makes is observable offline.
+#
+# Collections are synthetic and deterministic in (collection, lon, lat, day):
+#   MODIS/061/MOD11A1      daily,        LST_Day_1km  ~ 15000 (x0.02 K), some days masked
+#   MODIS/061/MOD13Q1      16-day (DOY 1, 17, ...), NDVI ~ 4700 (x0.0001)
+#   NASA/GPM_L3/IMERG_V07  half-hourly images (48 per day), precipitation (mm/hr)
+#
+# usage: FakeEarthEngine(latency=0.05) is installed in place of the module (it exposes
+#        Initialize, Geometry, ImageCollection, Reducer, ...).
+
+import math
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+
+class EEException(Exception):
+    pass
+
+
+def _value(obj):
+    # unwrap ComputedObjects (and containers of them) into plain Python values
+    if isinstance(obj, ComputedObject):
+        return obj._value
+    if isinstance(obj, dict):
+        return {k: _value(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_value(v) for v in obj]
+    return obj
+
+
+def _day(value):
+    value = _value(value)
+    if isinstance(value, Date):
+        return value._day
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value / 1000).date()  # millis (Date.millis())
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+
+
+_ACTIVE = None  # FakeEarthEngine that receives getInfo() calls (the latest one created)
+
+
+class ComputedObject:
+    def __init__(self, value):
+        self._value = value
+
+    def getInfo(self):
+        return _ACTIVE._get_info(self)
+
+
+class Number(ComputedObject):
+    pass
+
+
+class String(ComputedObject):
+    pass
+
+
+class List(ComputedObject):
+    @classmethod
+    def sequence(cls, start, end):
+        return cls(list(range(int(_value(start)), int(_value(end)) + 1)))
+
+    def map(self, fn):
+        return List([fn(Number(v)) for v in self._value])
+
+    def get(self, index):
+        return ComputedObject(self._value[_value(index)])
+
+    def size(self):
+        return Number(len(self._value))
+
+
+class Dictionary(ComputedObject):
+    def get(self, key):
+        return ComputedObject(self._value.get(_value(key)))
+
+
+class Date(ComputedObject):
+    def __init__(self, value):
+        self._day = _day(value)
+        super().__init__(self._day.isoformat())
+
+    def format(self, fmt="YYYY-MM-dd"):
+        return String(self._day.strftime(fmt.replace("YYYY", "%Y").replace("MM", "%m").replace("dd", "%d")))
+
+    def advance(self, delta, unit="day"):
+        days = {"day": 1, "week": 7}[unit] * _value(delta)
+        return Date(self._day + timedelta(days=days))
+
+    def millis(self):
+        return Number(int(datetime(self._day.year, self._day.month, self._day.day).timestamp() * 1000))
+
+
+class Geometry(ComputedObject):
+    def __init__(self, lon, lat, radius=0.0):
+        super().__init__({"type": "Point", "coordinates": [lon, lat]})
+        self.lon, self.lat, self.radius = lon, lat, radius
+
+    @classmethod
+    def Point(cls, coords):
+        lon, lat = _value(coords)
+        return cls(float(lon), float(lat))
+
+    def buffer(self, distance):
+        return Geometry(self.lon, self.lat, float(_value(distance)))
+
+
+class Reducer:
+    def __init__(self, kind, n=None):
+        self.kind, self.n = kind, n
+
+    @classmethod
+    def mean(cls):
+        return cls("mean")
+
+    @classmethod
+    def sum(cls):
+        return cls("sum")
+
+    @classmethod
+    def toList(cls, n=None):
+        return cls("toList", n)
+
+    def reduce(self, values):
+        values = [v for v in values if v is not None]
+        if not values:
+            return None
+        if self.kind == "mean":
+            return sum(values) / len(values)
+        if self.kind == "sum":
+            return sum(values)
+        return values
+
+
+class Filter:
+    def __init__(self, test):
+        self.test = test
+
+    @classmethod
+    def notNull(cls, names):
+        names = _value(names)
+        return cls(lambda props: all(props.get(n) is not None for n in names))
+
+
+class Feature(ComputedObject):
+    def __init__(self, geometry, properties=None):
+        self.geometry = geometry
+        props = _value(properties or {})
+        super().__init__({"type": "Feature", "properties": props})
+
+    @property
+    def properties(self):
+        return self._value["properties"]
+
+    def get(self, name):
+        return ComputedObject(self.properties.get(_value(name)))
+
+    def set(self, *args):
+        props = dict(self.properties)
+        if len(args) == 1:
+            props.update(_value(args[0]))
+        else:
+            props[_value(args[0])] = _value(args[1])
+        return Feature(self.geometry, props)
+
+
+class FeatureCollection(ComputedObject):
+    # items are Features, or FeatureCollections until flatten() (collection.map(reduceRegions))
+    def __init__(self, features):
+        self.features = [f if isinstance(f, (Feature, FeatureCollection)) else Feature(f) for f in features]
+
+    @property
+    def _value(self):
+        return {"type": "FeatureCollection", "features": [f._value for f in self.features]}
+
+    def filter(self, flt):
+        return FeatureCollection([f for f in self.features if flt.test(f.properties)])
+
+    def map(self, fn):
+        return FeatureCollection([fn(f) for f in self.features])
+
+    def size(self):
+        return Number(len(self.features))
+
+    def aggregate_array(self, name):
+        return List([f.properties.get(name) for f in self.features if f.properties.get(name) is not None])
+
+    def reduceColumns(self, reducer, selectors):
+        rows = [[f.properties.get(s) for s in selectors] for f in self.features]
+        rows = [r for r in rows if all(v is not None for v in r)]
+        return Dictionary({"list": rows})
+
+    def flatten(self):
+        out = []
+        for f in self.features:
+            out.extend(f.features if isinstance(f, FeatureCollection) else [f])
+        return FeatureCollection(out)
+
+
+# ---------------------------------------------------------------------
+# synthetic imagery
+# ---------------------------------------------------------------------
+
+def _pixel(collection, band, lon, lat, day, slot=0):
+    # deterministic "pixel" value for a point on a day / half-hour slot (None = masked)
+    doy = day.timetuple().tm_yday
+    season = math.sin(2 * math.pi * (doy - 100) / 365)
+    if collection.endswith("MOD11A1"):
+        if (day.toordinal() + int(abs(lon) * 10)) % 4 == 0:
+            return None  # cloud
+        return 14500 + 600 * season + 10 * (lat - 46)
+    if collection.endswith("MOD13Q1"):
+        return 4700 + 1500 * season
+    if "IMERG" in collection:
+        return ((day.toordinal() + int(abs(lat) * 10)) % 7) * 0.02 + 0.0005 * (slot % 4)
+    raise EEException(f"Unknown collection: {collection}")
+
+
+def _image_days(collection, start, end):
+    # dates of the images the collection holds in [start, end)
+    if collection.endswith("MOD13Q1"):
+        days = []
+        for year in range(start.year, end.year + 1):
+            first = date(year, 1, 1)
+            for k in range(0, 366, 16):
+                d = first + timedelta(days=k)
+                if d.year == year and start <= d < end:
+                    days.append(d)
+        return days
+    return [start + timedelta(days=i) for i in range((end - start).days)]
+
+
+SLOTS_PER_DAY = {"IMERG": 48}
+
+
+def _slots(collection):
+    return next((n for name, n in SLOTS_PER_DAY.items() if name in collection), 1)
+
+
+class Image(ComputedObject):
+    def __init__(self, collection, band, day=None, members=None, slot=0, props=None):
+        # members: [(day, slot)] for composites (mean of member images)
+        self.collection, self.band, self.day, self.slot = collection, band, day, slot
+        self.members = members if members is not None else [(day, slot)]
+        self.props = dict(props or {})
+        super().__init__({"type": "Image", "id": collection, "band": band})
+
+    def select(self, band):
+        return Image(self.collection, _value(band), self.day, self.members, self.slot, self.props)
+
+    def set(self, name, value):
+        props = {**self.props, _value(name): _value(value)}
+        day = _day(props["system:time_start"]) if "system:time_start" in props else self.day
+        return Image(self.collection, self.band, day, self.members, self.slot, props)
+
+    def date(self):
+        return Date(self.day)
+
+    def _at(self, geometry):
+        vals = [_pixel(self.collection, self.band, geometry.lon, geometry.lat, d, k) for d, k in self.members]
+        vals = [v for v in vals if v is not None]
+        return sum(vals) / len(vals) if vals else None
+
+    def reduceRegion(self, reducer=None, geometry=None, scale=None, **kwargs):
+        return Dictionary({self.band: self._at(geometry)})
+
+    def reduceRegions(self, collection, reducer=None, scale=None, **kwargs):
+        out = []
+        for f in collection.features:
+            props = dict(f.properties)
+            props.setdefault("date", self.day.isoformat() if self.day else None)
+            props[reducer.kind if reducer is not None else "mean"] = self._at(f.geometry)
+            out.append(Feature(f.geometry, props))
+        return FeatureCollection(out)
+
+
+class ImageCollection(ComputedObject):
+    def __init__(self, collection_id, band=None, start=None, end=None, images=None):
+        # images: explicit image list (fromImages); otherwise generated from the catalog
+        self.collection_id, self.band = _value(collection_id), band
+        self.start = start or date(2000, 1, 1)
+        self.end = end or date(2026, 1, 1)
+        self.images = images
+        super().__init__({"type": "ImageCollection", "id": self.collection_id})
+
+    @classmethod
+    def fromImages(cls, images):
+        images = _value(images) if not isinstance(images, list) else images
+        images = [img for img in images if isinstance(img, Image)]
+        return cls(images[0].collection if images else "", images[0].band if images else None, images=images)
+
+    def _images(self):
+        if self.images is not None:
+            return [img for img in self.images if img.day is not None and self.start <= img.day < self.end]
+        return [
+            Image(self.collection_id, self.band, d, slot=k)
+            for d in _image_days(self.collection_id, self.start, self.end)
+            for k in range(_slots(self.collection_id))
+        ]
+
+    def filterBounds(self, geometry):
+        return self
+
+    def filterDate(self, start, end):
+        return ImageCollection(self.collection_id, self.band,
+                               max(self.start, _day(start)), min(self.end, _day(end)), self.images)
+
+    def select(self, band):
+        band = _value(band)
+        images = None if self.images is None else [img.select(band) for img in self.images]
+        return ImageCollection(self.collection_id, band, self.start, self.end, images)
+
+    def size(self):
+        return Number(len(self._images()))
+
+    def mean(self):
+        images = self._images()
+        members = [m for img in images for m in img.members]
+        return Image(self.collection_id, self.band, images[0].day if images else None, members=members)
+
+    def sum(self):
+        return self.mean()  # only used for presence checks in the fake
+
+    def map(self, fn):
+        return FeatureCollection([fn(img) for img in self._images()])
+
+
+class FakeEarthEngine:
+    EEException = EEException
+
+    def __init__(self, latency=0.0, failures=None, initialize_error=None):
+        # pre:  latency in seconds per getInfo(); failures is an optional callable
+        #       (call number) -> Exception | None used to inject errors;
+        #       initialize_error is raised by Initialize() (e.g. missing credentials)
+        # post: fake ready; counters at zero
+        self.latency = latency
+        self.failures = failures
+        self.initialize_error = initialize_error
+        self.getinfo_calls = 0
+        self.rows_transferred = 0  # list rows returned by getInfo()
+        self.initialize_calls = 0
+        self.authenticate_calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+        for cls in (ComputedObject, Number, String, List, Dictionary, Date, Geometry, Feature,
+                    FeatureCollection, Image, ImageCollection, Reducer, Filter):
+            setattr(self, cls.__name__, cls)
+
+        global _ACTIVE
+        _ACTIVE = self
+
+    # module-level functions of `ee`
+    def Initialize(self, *args, **kwargs):
+        self.initialize_calls += 1
+        if self.initialize_error is not None:
+            raise self.initialize_error
+
+    def Authenticate(self, *args, **kwargs):
+        self.authenticate_calls += 1
+
+    def _get_info(self, obj):
+        with self._lock:
+            self.getinfo_calls += 1
+            call = self.getinfo_calls
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            if self.failures is not None:
+                err = self.failures(call)
+                if err is not None:
+                    raise err
+            value = _value(obj)
+            if isinstance(value, list):
+                with self._lock:
+                    self.rows_transferred += len(value)
+            return value
+        finally:
+            with self._lock:
+                self.in_flight -= 1
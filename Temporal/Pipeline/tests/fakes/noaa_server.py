@@ -0,0 +1,130 @@
+# Jakob Balkovec
+# Fake NOAA Server
+
+# Local HTTP stand-in for the NCEI USCRN product tree. It serves the checked-in
+# data/raw files under the same URL layout RequestPipe uses
+# (<base_url>/<year>/CRND0103-<year>-<station>.txt) and can inject a fixed
+# per-request latency so serial vs concurrent downloads can be compared offline.
+# Responses carry ETag/Last-Modified and honour conditional GETs (304), and
+# /<year>/ returns an Apache-style directory listing of that year's files.
+
+import re
+import hashlib
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+RAW_DIR = Path(__file__).resolve().parent.parent.parent / "data" / "raw"
+RAW_PATTERN = re.compile(r"uscrn_(?P<station>.+)_(?P<year>\d{4})\.txt$")
+
+
+class FakeNOAAServer:
+    FILE_PREFIX = "CRND0103"
+
+    def __init__(self, raw_dir=RAW_DIR, latency=0.0):
+        # pre:  raw_dir contains uscrn_<station>_<year>.txt files (any depth)
+        # post: server configured, not yet started
+        # desc: indexes the raw files by their upstream NOAA file name.
+
+        self.latency = latency
+        self.request_count = 0
+        self.status_counts = {}
+        self._lock = threading.Lock()
+        self.files = {}
+        for path in Path(raw_dir).rglob("uscrn_*.txt"):
+            m = RAW_PATTERN.match(path.name)
+            if m:
+                name = f"{self.FILE_PREFIX}-{m['year']}-{m['station']}.txt"
+                self.files[f"/{m['year']}/{name}"] = path
+
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so pooling is observable
+
+            def do_GET(self):
+                with server._lock:
+                    server.request_count += 1
+                if server.latency:
+                    time.sleep(server.latency)
+
+                if self.path.endswith("/"):
+                    return self._send_listing()
+
+                path = server.files.get(self.path)
+                if path is None:
+                    return self._send(404, b"Not Found")
+
+                body = path.read_bytes()
+                etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+                mtime = int(path.stat().st_mtime)
+                headers = {"ETag": etag, "Last-Modified": formatdate(mtime, usegmt=True)}
+
+                inm = self.headers.get("If-None-Match")
+                ims = self.headers.get("If-Modified-Since")
+                if inm is not None:
+                    not_modified = inm == etag
+                elif ims is not None:
+                    not_modified = parsedate_to_datetime(ims).timestamp() >= mtime
+                else:
+                    not_modified = False
+
+                if not_modified:
+                    return self._send(304, b"", headers)
+                self._send(200, body, headers)
+
+            def _send_listing(self):
+                names = sorted(p.rsplit("/", 1)[-1] for p in server.files if p.startswith(self.path))
+                if not names:
+                    return self._send(404, b"Not Found")
+                rows = "".join(f'<a href="{n}">{n}</a>\n' for n in names)
+                body = f"<html><body><pre>{rows}</pre></body></html>".encode()
+                self._send(200, body, {"Content-Type": "text/html"})
+
+            def _send(self, status, body, headers=None):
+                with server._lock:
+                    server.status_counts[status] = server.status_counts.get(status, 0) + 1
+                headers = dict(headers or {})
+                self.send_response(status)
+                self.send_header("Content-Type", headers.pop("Content-Type", "text/plain"))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                if status != 304:
+                    self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,97 @@
+# Jakob Balkovec
+# gap_fill_test.py
+
+# Gap-length routing of the hybrid imputation engine (utils/gap_fill.py)
+
+import numpy as np
+import pandas as pd
+
+from utils.gap_fill import hybrid_fill, update_fill, gap_runs, gap_lengths, OBSERVED, INTERP, REGRESSION, MODEL, UNFILLED
+
+DATES = pd.date_range("2020-01-01", periods=100, freq="D")
+
+
+def series_with_gaps(gaps):
+    # linear trend so interpolation / regression are exact
+    values = np.arange(len(DATES), dtype="float64") * 0.5
+    for start, length in gaps:
+        values[start:start + length] = np.nan
+    return values
+
+def test_gap_runs_and_lengths():
+    missing = np.array([1, 1, 0, 0, 1, 0, 1, 1, 1], dtype=bool)
+    starts, ends = gap_runs(missing)
+    assert starts.tolist() == [0, 4, 6] and ends.tolist() == [2, 5, 9]
+
+    _, _, length, bracketed = gap_lengths(np.arange(9), missing)
+    assert length.tolist() == [2, 1, 3] and bracketed.tolist() == [False, True, False]
+
+    # gaps are measured in days, not rows (a missing ground row widens the gap)
+    days = np.array([0, 1, 2, 3, 4, 10, 11, 12, 13])
+    _, _, length, _ = gap_lengths(days, missing)
+    assert length[1] == 6
+
+def test_routes_by_gap_length():
+    calls = []
+    def model():
+        calls.append(1)
+        return np.full(len(DATES), -1.0)
+
+    values = series_with_gaps([(10, 2), (30, 6), (50, 12), (70, 25)])
+    filled, method = hybrid_fill(DATES, values, switch_gap=4, regression_window=7, max_gap_days=20, model=model)
+
+    assert (method[10:12] == INTERP).all() and (method[30:36] == REGRESSION).all()
+    assert (method[50:62] == MODEL).all() and (method[70:95] == UNFILLED).all()
+    assert (method[~np.isnan(values)] == OBSERVED).all()
+
+    truth = np.arange(len(DATES)) * 0.5
+    np.testing.assert_allclose(filled[10:12], truth[10:12])
+    np.testing.assert_allclose(filled[30:36], truth[30:36])
+    assert (filled[50:62] == -1.0).all() and np.isnan(filled[70:95]).all()
+    assert len(calls) == 1
+
+def test_model_is_skipped_without_long_gaps():
+    def model():
+        raise AssertionError("model should not run")
+
+    values = series_with_gaps([(5, 1), (20, 3), (40, 7)])
+    filled, method = hybrid_fill(DATES, values, model=model)
+    assert not np.isnan(filled).any()
+    assert set(np.unique(method)) == {OBSERVED, INTERP, REGRESSION}
+
+def test_edge_gaps_go_to_the_model():
+    values = series_with_gaps([(0, 2), (97, 3)])
+    filled, method = hybrid_fill(DATES, values, model=lambda: np.zeros(len(DATES)))
+    assert (method[:2] == MODEL).all() and (method[97:] == MODEL).all()
+    assert (filled[:2] == 0).all()
+
+    # without a model they stay unfilled
+    _, method = hybrid_fill(DATES, values)
+    assert (method[:2] == UNFILLED).all()
+
+def test_update_matches_a_full_fill():
+    rng = np.random.default_rng(0)
+    values = np.sin(np.arange(len(DATES)) / 10) + rng.normal(0, 0.05, len(DATES))
+    values[rng.random(len(DATES)) < 0.3] = np.nan
+    values[40:55] = np.nan
+    model = lambda: np.zeros(len(DATES))
+    region_model = lambda lo, hi: np.zeros(hi - lo)
+
+    # append: previous output for the first 70 days, 30 new days
+    prev, prev_method = hybrid_fill(DATES[:70], values[:70], model=lambda: np.zeros(70))
+    filled = np.concatenate([prev, np.full(30, np.nan)])
+    method = np.concatenate([prev_method, np.full(30, -1)])
+    changed = np.arange(len(DATES)) >= 70
+    expected, expected_method = hybrid_fill(DATES, values, model=model)
+    got, got_method = update_fill(DATES, values, filled, method, changed, model=region_model)
+    np.testing.assert_allclose(got, expected)
+    np.testing.assert_array_equal(got_method, expected_method)
+
+    # a late observation inside a gap
+    late = values.copy()
+    late[47] = 0.5
+    changed = np.arange(len(DATES)) == 47
+    got, got_method = update_fill(DATES, late, expected, expected_method, changed, model=region_model)
+    full, full_method = hybrid_fill(DATES, late, model=model)
+    np.testing.assert_allclose(got, full)
+    np.testing.assert_array_equal(got_method, full_method)
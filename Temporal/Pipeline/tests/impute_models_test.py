@@ -0,0 +1,55 @@
+# Jakob Balkovec
+# impute_models_test.py
+
+# Batched bridge tests behind experiments/benchmarks/impute_bench.py
+
+import numpy as np
+import pandas as pd
+import pytest # type: ignore
+
+pytest.importorskip("xgboost")
+
+from utils.impute_models import IMPUTERS, impute_timed, sample_bridges, batch_bridges, bridge_batch
+
+
+def daily(days=300, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2022-01-01", periods=days, freq="D")
+    values = 280 + 10 * np.sin(2 * np.pi * dates.dayofyear.to_numpy() / 365) + rng.normal(0, 1, days)
+    values[rng.random(days) < 0.3] = np.nan
+    return pd.DataFrame({"date": dates, "LST": values})
+
+@pytest.mark.parametrize("model", sorted(IMPUTERS))
+def test_timed_imputers_match_run_functions(model):
+    df = daily()
+    pred, fit_s, predict_s = impute_timed(model, df, "LST")
+    expected = IMPUTERS[model](df.copy(), "LST")["LST_interp"].to_numpy(dtype="float64")
+    np.testing.assert_allclose(pred, expected, rtol=1e-6)
+    assert fit_s >= 0 and predict_s > 0
+
+def test_sampled_bridges_are_bracketed():
+    values = daily()["LST"].to_numpy()
+    known = ~np.isnan(values)
+    starts = sample_bridges(values, 7, 50, np.random.default_rng(1))
+
+    assert len(starts) == 50 and (np.diff(starts) > 0).all()
+    for s in starts:
+        assert known[s:s + 7].any() and known[:s].any() and known[s + 7:].any()
+
+def test_batches_keep_windows_apart():
+    starts = sample_bridges(daily()["LST"].to_numpy(), 5, 80, np.random.default_rng(2))
+    batches = batch_bridges(starts, 5, per_fit=6)
+
+    assert sorted(s for b in batches for s in b) == sorted(starts)
+    assert all(len(b) <= 6 and (np.diff(b) >= 10).all() for b in batches)
+
+def test_bridge_batch_scores_each_window():
+    df = daily()
+    starts = [20, 60, 100]
+    records = bridge_batch(df, "LST", "rolling", starts, 7)
+
+    assert [r["start_date"] for r in records] == ["2022-01-21", "2022-03-02", "2022-04-11"]
+    for r, s in zip(records, starts):
+        assert r["points"] == df["LST"].iloc[s:s + 7].notna().sum()
+        assert r["span_days"] >= 8 and np.isfinite(r["RMSE"]) and r["MAE"] <= r["RMSE"]
+        assert r["windows_per_fit"] == 3
@@ -0,0 +1,51 @@
+# Jakob Balkovec
+# interval_join_test.py
+
+# interval_join policies (utils/interval_join.py)
+
+import numpy as np
+import pandas as pd
+import pytest # type: ignore
+
+from utils.interval_join import interval_join
+
+DAYS = pd.date_range("2020-01-01", "2020-01-20", freq="D")
+# two weeks with a 3-day hole between them, and a NaN window at the end
+STARTS = pd.to_datetime(["2020-01-01", "2020-01-11", "2020-01-18"])
+ENDS = pd.to_datetime(["2020-01-08", "2020-01-18", "2020-01-21"])
+VALUES = [1.0, 3.0, np.nan]
+
+
+def joined(how, tolerance=0):
+    return pd.Series(interval_join(DAYS, STARTS, ENDS, VALUES, how, tolerance), index=DAYS)
+
+def test_window_is_constant_inside_windows():
+    out = joined("window")
+    assert (out["2020-01-01":"2020-01-07"] == 1.0).all()
+    assert out["2020-01-08":"2020-01-10"].isna().all()
+    assert (out["2020-01-11":"2020-01-17"] == 3.0).all()
+    assert out["2020-01-18":].isna().all()  # NaN window assigns nothing
+
+def test_nearest_fills_within_tolerance():
+    out = joined("nearest", tolerance=1)
+    assert out["2020-01-08"] == 1.0 and out["2020-01-10"] == 3.0
+    assert np.isnan(out["2020-01-09"])  # two days from both windows
+    assert out["2020-01-18"] == 3.0 and out["2020-01-20"] != out["2020-01-20"]
+
+def test_linear_interpolates_between_midpoints():
+    out = joined("linear", tolerance=3)
+    # midpoints: Jan 4 (1.0) and Jan 14 (3.0) -> +0.2 per day
+    assert out["2020-01-04"] == pytest.approx(1.0)
+    assert out["2020-01-09"] == pytest.approx(2.0)
+    assert out["2020-01-14"] == pytest.approx(3.0)
+    assert out["2020-01-01"] == 1.0 and out["2020-01-17"] == 3.0  # outside the midpoints
+    # a gap wider than the tolerance is not bridged
+    out = joined("linear", tolerance=2)
+    assert out["2020-01-09"] != out["2020-01-09"] and out["2020-01-05"] == 1.0
+
+def test_unsorted_windows_and_unknown_policy():
+    order = [1, 0, 2]
+    out = interval_join(DAYS, STARTS[order], ENDS[order], np.array(VALUES)[order], "window")
+    np.testing.assert_array_equal(out, joined("window").to_numpy())
+    with pytest.raises(ValueError):
+        interval_join(DAYS, STARTS, ENDS, VALUES, "cubic")
@@ -0,0 +1,75 @@
+# Jakob Balkovec
+# merge_test.py
+
+# MergePipe join engine tests on small synthetic sources
+
+import numpy as np
+import pandas as pd
+import pytest # type: ignore
+
+from pipes.merge_pipe import MergePipe
+
+KEYS = ["station_id", "date"]
+
+
+def source(station, start, periods, **cols):
+    df = pd.DataFrame({
+        "station_id": station,
+        "date": pd.date_range(start, periods=periods, freq="D"),
+    })
+    for name, values in cols.items():
+        df[name] = values
+    return df
+
+def merge(data, **cfg):
+    return MergePipe({"on_columns": KEYS, **cfg}).run(data)
+
+@pytest.fixture()
+def sources():
+    uscrn = source(1, "2020-01-01", 4, sm=[0.1, np.nan, 0.3, 0.4], precipitation=[1.0, 2.0, 3.0, 4.0])
+    snotel = source(1, "2020-01-03", 4, sm=[0.9, 0.9, 0.9, 0.9], snow=[5.0, 6.0, 7.0, 8.0])
+    return {"uscrn": uscrn, "snotel": snotel}
+
+def test_outer_join_coalesces_by_priority(sources):
+    df = merge(sources, how="outer")
+    assert list(df["date"]) == list(pd.date_range("2020-01-01", periods=6))
+    # uscrn wins where it has a value, snotel fills the rest
+    assert df["sm"].tolist() == pytest.approx([0.1, np.nan, 0.3, 0.4, 0.9, 0.9], nan_ok=True)
+    assert df["snow"].isna().sum() == 2
+    assert list(df.columns) == ["station_id", "date", "sm", "precipitation", "snow"]
+
+def test_prefer_changes_winner(sources):
+    df = merge(sources, how="inner", prefer=["snotel"])
+    assert len(df) == 2
+    assert df["sm"].tolist() == [0.9, 0.9]
+    assert df["precipitation"].tolist() == [3.0, 4.0]
+
+def test_left_join_keeps_primary_keys(sources):
+    df = merge(sources, how="left")
+    assert list(df["date"]) == list(pd.date_range("2020-01-01", periods=4))
+    assert df["sm"].iloc[1] != df["sm"].iloc[1]  # NaN: snotel has no 2020-01-02
+    assert df["snow"].tolist() == pytest.approx([np.nan, np.nan, 5.0, 6.0], nan_ok=True)
+
+def test_asof_join_with_tolerance():
+    daily = source(1, "2020-01-01", 10, sm=np.arange(10.0))
+    weekly = pd.DataFrame({"station_id": 1, "date": pd.to_datetime(["2020-01-02", "2020-01-09"]), "ndvi": [0.5, 0.6]})
+    df = merge({"ground": daily, "sat": weekly}, how="left", asof_tolerance="1D")
+    assert df["ndvi"].tolist() == pytest.approx(
+        [0.5, 0.5, 0.5, np.nan, np.nan, np.nan, np.nan, 0.6, 0.6, 0.6], nan_ok=True
+    )
+
+def test_multi_station_matches_concat_dedupe():
+    # disjoint stations: the join reduces to the old concat + drop_duplicates
+    a = source(1, "2020-01-01", 5, sm=np.arange(5.0))
+    b = source(2, "2020-01-01", 5, sm=np.arange(5.0) + 10)
+    dup = pd.concat([a, a.iloc[:2]], ignore_index=True)
+
+    joined = merge([dup, b], how="outer")
+    legacy = pd.concat([dup, b], ignore_index=True).drop_duplicates(subset=KEYS)
+    pd.testing.assert_frame_equal(joined, legacy.sort_values(KEYS).reset_index(drop=True))
+
+def test_single_frame_and_bad_config():
+    a = source(1, "2020-01-01", 3, sm=[1.0, 2.0, 3.0])
+    assert len(merge(pd.concat([a, a]))) == 3
+    with pytest.raises(ValueError):
+        MergePipe({"on_columns": KEYS, "how": "cross"})
@@ -0,0 +1,213 @@
+# Jakob Balkovec
+# parse_test.py
+
+# ParsePipe tests on the checked-in daily corpus and small synthetic sub-daily files
+
+import numpy as np
+import pandas as pd
+import pytest # type: ignore
+from pathlib import Path
+
+from pipes.parse_pipe import ParsePipe
+from utils.uscrn_products import HOURLY02_COLUMNS, SUBHOURLY01_COLUMNS
+
+RAW_DIR = Path(__file__).resolve().parent.parent / "data" / "raw"
+STATION = "WA_Spokane_17_SSW"
+
+
+def write_subdaily(path, columns, rows):
+    # rows: list of dicts keyed by column name; unspecified fields are -9999.0 (flags 0)
+    lines = []
+    for row in rows:
+        fields = [str(row.get(col, "0" if col.endswith("_flag") else "-9999.0")) for col in columns]
+        lines.append(" ".join(fields))
+    path.write_text("\n".join(lines) + "\n")
+
+def hourly_rows(day, n_hours=24, precip=0.5, temp=10.0):
+    rows = []
+    for h in range(1, n_hours + 1):
+        end = pd.Timestamp(day) + pd.Timedelta(hours=h)
+        rows.append({
+            "station_id": "04136", "utc_date": end.strftime("%Y%m%d"), "utc_time": end.strftime("%H%M"),
+            "lst_date": end.strftime("%Y%m%d"), "lst_time": end.strftime("%H%M"),
+            "crx_vn": "2.622", "longitude": "-117.53", "latitude": "47.42",
+            "air_temp_calc": temp + h, "air_temp_avg": temp + h, "air_temp_max": temp + h + 1, "air_temp_min": temp + h - 1,
+            "precipitation": precip, "solar_radiation": 100, "solar_radiation_flag": 0,
+            "sur_temp_type": "C", "rh_mean": 50 + h, "soil_moisture_5cm": "-99.000" if h == 5 else 0.2,
+        })
+    return rows
+
+def parse(in_dir, tmp_path, **cfg):
+    return ParsePipe({"in_dir": str(in_dir), "out_dir": str(tmp_path / "processed"), "station": STATION, **cfg}).run()
+
+# ---------------------------------------------------------------------
+# daily01
+# ---------------------------------------------------------------------
+
+def test_daily_corpus(tmp_path):
+    df = parse(RAW_DIR / "spokane", tmp_path, product="daily01")
+    assert len(df) > 6000
+    assert df["date"].is_monotonic_increasing
+    assert not (df.select_dtypes("number") == -9999.0).any().any()
+    assert str(df["date"].dtype).startswith("datetime64")
+
+def test_typed_reader_schema():
+    from utils.uscrn_reader import read_uscrn
+
+    df = read_uscrn(RAW_DIR / "spokane" / f"uscrn_{STATION}_2020.txt", product="daily01")
+    assert len(df) == 366
+    assert df["station_id"].dtype == "int64"
+    assert str(df["date"].dtype).startswith("datetime64")
+    assert df["date"].iloc[0] == pd.Timestamp("2020-01-01")
+    measurements = df.drop(columns=["station_id", "date", "sur_temp_type"])
+    assert (measurements.dtypes == "float64").all()
+    assert not measurements.isin([-9999.0, -99.0]).any().any()
+
+def test_parallel_matches_serial(tmp_path):
+    serial = parse(RAW_DIR / "spokane", tmp_path, product="daily01")
+    parallel = parse(RAW_DIR / "spokane", tmp_path, product="daily01", workers=4)
+    pd.testing.assert_frame_equal(serial, parallel)
+
+def test_parallel_isolates_bad_files(tmp_path, caplog):
+    in_dir = tmp_path / "raw"
+    in_dir.mkdir()
+    for year in (2019, 2020):
+        name = f"uscrn_{STATION}_{year}.txt"
+        (in_dir / name).write_bytes((RAW_DIR / "spokane" / name).read_bytes())
+    (in_dir / f"uscrn_{STATION}_2021.txt").write_text("04136 20210101 not a number\n")
+
+    df = parse(in_dir, tmp_path, product="daily01", workers=2)
+    assert len(df) == 365 + 366
+    assert "Failed to parse uscrn_WA_Spokane_17_SSW_2021.txt" in caplog.text
+
+# ---------------------------------------------------------------------
+# hourly02 / subhourly01
+# ---------------------------------------------------------------------
+
+@pytest.fixture()
+def hourly_dir(tmp_path):
+    d = tmp_path / "hourly"
+    d.mkdir()
+    rows = hourly_rows("2021-06-01") + hourly_rows("2021-06-02", precip=0.0)
+    write_subdaily(d / f"uscrnh_{STATION}_2021.txt", HOURLY02_COLUMNS, rows)
+    return d
+
+def test_hourly_native(hourly_dir, tmp_path):
+    df = parse(hourly_dir, tmp_path, product="hourly02")
+    assert len(df) == 48
+    # timestamps are interval starts: first hour of 2021-06-01 starts at 00:00
+    assert df["date"].iloc[0] == pd.Timestamp("2021-06-01 00:00")
+    assert df["soil_moisture_5cm"].isna().sum() == 2  # -99.000 sentinel
+
+@pytest.mark.parametrize("chunk_rows", [7, 100_000])
+def test_hourly_to_daily(hourly_dir, tmp_path, chunk_rows):
+    df = parse(hourly_dir, tmp_path, product="hourly02", aggregate="daily", chunk_rows=chunk_rows)
+    assert list(df["date"]) == [pd.Timestamp("2021-06-01"), pd.Timestamp("2021-06-02")]
+    day1 = df.iloc[0]
+    assert day1["precipitation"] == pytest.approx(12.0)
+    assert day1["air_temp_max"] == pytest.approx(10 + 24 + 1)
+    assert day1["air_temp_min"] == pytest.approx(10 + 1 - 1)
+    assert day1["air_temp_mean"] == pytest.approx((35 + 10) / 2)
+    assert day1["solar_radiation"] == pytest.approx(100 * 0.0864)
+    assert day1["soil_moisture_5cm"] == pytest.approx(0.2)
+    assert df.iloc[1]["precipitation"] == 0.0
+
+def test_subhourly_to_hourly(tmp_path):
+    d = tmp_path / "sub"
+    d.mkdir()
+    rows = []
+    for i in range(1, 25):  # two hours of 5-minute records
+        end = pd.Timestamp("2021-06-01") + pd.Timedelta(minutes=5 * i)
+        rows.append({
+            "station_id": "04136", "utc_date": end.strftime("%Y%m%d"), "utc_time": end.strftime("%H%M"),
+            "lst_date": end.strftime("%Y%m%d"), "lst_time": end.strftime("%H%M"),
+            "crx_vn": "2.622", "longitude": "-117.53", "latitude": "47.42",
+            "air_temp": float(i), "precipitation": 0.1, "soil_moisture_5cm": 0.3, "sur_temp_type": "C",
+        })
+    write_subdaily(d / f"uscrns_{STATION}_2021.txt", SUBHOURLY01_COLUMNS, rows)
+
+    df = parse(d, tmp_path, product="subhourly01", aggregate="hourly", chunk_rows=5)
+    assert len(df) == 2
+    assert df["precipitation"].to_numpy() == pytest.approx([1.2, 1.2])
+    assert df["air_temp_avg"].to_numpy() == pytest.approx([np.mean(range(1, 13)), np.mean(range(13, 25))])
+    assert df["air_temp_max"].iloc[1] == 24.0
+
+# ---------------------------------------------------------------------
+# parse cache
+# ---------------------------------------------------------------------
+
+def copy_years(in_dir, years):
+    in_dir.mkdir(exist_ok=True)
+    for year in years:
+        name = f"uscrn_{STATION}_{year}.txt"
+        (in_dir / name).write_bytes((RAW_DIR / "spokane" / name).read_bytes())
+
+def test_cache_hit_matches_fresh_parse(tmp_path, caplog):
+    in_dir = tmp_path / "raw"
+    copy_years(in_dir, (2019, 2020))
+    cache_dir = tmp_path / "cache"
+
+    fresh = parse(in_dir, tmp_path, product="daily01")
+    first = parse(in_dir, tmp_path, product="daily01", cache_dir=str(cache_dir))
+    caplog.clear()
+    with caplog.at_level("INFO"):
+        second = parse(in_dir, tmp_path, product="daily01", cache_dir=str(cache_dir))
+
+    assert "Parse cache: 2/2 files reused" in caplog.text
+    pd.testing.assert_frame_equal(fresh, first)
+    pd.testing.assert_frame_equal(fresh, second)
+
+def test_cache_reparses_changed_file(tmp_path, caplog):
+    in_dir = tmp_path / "raw"
+    copy_years(in_dir, (2019, 2020))
+    cache_dir = tmp_path / "cache"
+    parse(in_dir, tmp_path, product="daily01", cache_dir=str(cache_dir))
+
+    # drop the last day of 2020: the hash changes, only that file is re-parsed
+    path = in_dir / f"uscrn_{STATION}_2020.txt"
+    path.write_text("".join(path.read_text().splitlines(keepends=True)[:-1]))
+    caplog.clear()
+    with caplog.at_level("INFO"):
+        df = parse(in_dir, tmp_path, product="daily01", cache_dir=str(cache_dir))
+
+    assert "Parse cache: 1/2 files reused" in caplog.text
+    assert len(df) == 365 + 365
+    assert len(list(cache_dir.glob(f"uscrn_{STATION}_2020.*"))) == 1  # stale entry evicted
+
+def test_cache_aggregated_subdaily(hourly_dir, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    fresh = parse(hourly_dir, tmp_path, product="hourly02", aggregate="daily")
+    parse(hourly_dir, tmp_path, product="hourly02", aggregate="daily", cache_dir=cache_dir)
+    cached = parse(hourly_dir, tmp_path, product="hourly02", aggregate="daily", cache_dir=cache_dir)
+    pd.testing.assert_frame_equal(fresh, cached)
+
+def test_year_window(tmp_path):
+    df = parse(RAW_DIR / "spokane", tmp_path, product="daily01", start_year=2019, end_year=2020)
+    assert set(df["date"].dt.year) == {2019, 2020}
+
+# ---------------------------------------------------------------------
+# projection / compact dtypes
+# ---------------------------------------------------------------------
+
+def test_compact_dtypes_match_full_precision(tmp_path):
+    full = parse(RAW_DIR / "spokane", tmp_path, product="daily01")
+    compact = parse(RAW_DIR / "spokane", tmp_path, product="daily01", compact_dtypes=True)
+
+    assert compact["soil_moisture_5cm"].dtype == "float32"
+    assert compact["latitude"].dtype == "float64"
+    for col in ("station_id", "source_file", "sur_temp_type"):
+        assert isinstance(compact[col].dtype, pd.CategoricalDtype)
+    assert compact.memory_usage(deep=True).sum() < 0.6 * full.memory_usage(deep=True).sum()
+    np.testing.assert_allclose(compact["air_temp_mean"], full["air_temp_mean"], rtol=1e-6)
+    assert list(compact["source_file"].astype(str)) == list(full["source_file"])
+
+def test_projection_reads_required_columns(tmp_path):
+    from utils.columns import required_columns
+
+    station_cfg = {"clean": {"keep_columns": ["date", "soil_temp_5cm"]}, "merge": {"on_columns": ["station_id", "date"]}}
+    columns = required_columns(station_cfg)
+    assert {"latitude", "longitude", "precipitation", "soil_moisture_5cm", "station_id"} <= set(columns)
+    assert required_columns({"clean": {"keep_columns": []}}) is None
+
+    df = parse(RAW_DIR / "spokane", tmp_path, product="daily01", columns=columns)
+    assert set(df.columns) == set(columns) | {"source_file"}
@@ -0,0 +1,86 @@
+# Jakob Balkovec
+# qc_test.py
+
+# QCEngine / CleanPipe QC tests on small synthetic frames
+
+import numpy as np
+import pandas as pd
+import pytest # type: ignore
+from pathlib import Path
+
+from pipes.clean_pipe import CleanPipe
+from utils.qc import QCEngine, passes
+
+QC_RULES = Path(__file__).resolve().parent.parent / "qc_rules.yaml"
+
+RULES = [
+    {"name": "temp_range", "type": "range", "columns": ["air_temp_max", "air_temp_min"], "min": -60, "max": 60},
+    {"name": "sm_step", "type": "step", "columns": ["sm"], "max_step": 0.2},
+    {"name": "sm_spike", "type": "spike", "columns": ["sm"], "threshold": 0.1},
+    {"name": "sm_flat", "type": "flatline", "columns": ["sm"], "window": 4},
+    {"name": "temp_order", "type": "consistency", "greater": "air_temp_max", "lesser": "air_temp_min"},
+]
+
+
+def frame(sm, tmax=None, tmin=None, station=None):
+    n = len(sm)
+    return pd.DataFrame({
+        "station_id": station if station is not None else [1] * n,
+        "date": pd.date_range("2020-01-01", periods=n, freq="D"),
+        "sm": sm,
+        "air_temp_max": tmax if tmax is not None else [10.0] * n,
+        "air_temp_min": tmin if tmin is not None else [0.0] * n,
+    })
+
+def failed(mask, engine, name):
+    return list(np.flatnonzero(mask & engine.mask_for([name])))
+
+def test_rules_set_their_bits():
+    engine = QCEngine(RULES)
+    df = frame(
+        sm=[0.20, 0.21, 0.45, 0.22, 0.23, 0.23, 0.23, 0.23, 0.24, np.nan],
+        tmax=[10, 10, 99, 10, 10, 10, -5, 10, 10, 10],
+        tmin=[0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+    )
+    mask, counts = engine.evaluate(df)
+
+    assert mask.dtype == np.uint32
+    assert failed(mask, engine, "temp_range") == [2]
+    assert failed(mask, engine, "sm_step") == [2, 3]
+    assert failed(mask, engine, "sm_spike") == [2]
+    assert failed(mask, engine, "sm_flat") == [4, 5, 6, 7]
+    assert failed(mask, engine, "temp_order") == [6]
+    assert counts["sm_flat"] == 4
+
+def test_temporal_rules_respect_station_boundaries():
+    engine = QCEngine(RULES)
+    df = frame(sm=[0.1, 0.1, 0.5, 0.5], station=[1, 1, 2, 2])
+    mask, _ = engine.evaluate(df)
+    assert failed(mask, engine, "sm_step") == []
+
+def test_missing_columns_and_bad_rules():
+    mask, counts = QCEngine(RULES).evaluate(frame(sm=[0.1, 0.2]).drop(columns=["air_temp_max"]))
+    assert counts["temp_order"] is None and counts["sm_step"] == 0
+    with pytest.raises(ValueError):
+        QCEngine([{"name": "x", "type": "median"}])
+    with pytest.raises(ValueError):
+        QCEngine([{"type": "range", "columns": ["a"]}] * 33)
+
+def test_clean_pipe_adds_mask_without_dropping(tmp_path):
+    rules = tmp_path / "rules.yaml"
+    rules.write_text(
+        "rules:\n"
+        "  - {name: temp_order, type: consistency, greater: air_temp_max, lesser: air_temp_min}\n"
+    )
+    # unsorted input: mask must stay aligned with the original rows
+    df = frame(sm=[0.1] * 4, tmax=[10, 10, -5, 10]).iloc[[3, 2, 1, 0]]
+    out = CleanPipe({"qc_rules": str(rules), "keep_columns": ["date", "sm"]}).run(df)
+
+    assert len(out) == 4
+    assert list(out["qc_mask"]) == [0, 1, 0, 0]
+    assert out.attrs["qc_bits"] == {"temp_order": 0}
+    assert list(passes(out)) == [True, False, True, True]
+
+def test_shipped_rules_load():
+    engine = QCEngine.from_yaml(QC_RULES)
+    assert 0 < len(engine.bits) <= 32
@@ -0,0 +1,183 @@
+# Jakob Balkovec
+# request_test.py
+
+# RequestPipe tests against the local NOAA stand-in (tests/fakes/noaa_server.py)
+
+import time
+import pytest # type: ignore
+
+from pipes.request_pipe import RequestPipe
+from tests.fakes.noaa_server import FakeNOAAServer, RAW_DIR
+
+STATION = "WA_Spokane_17_SSW"
+YEARS = (2016, 2023)
+
+
+def make_config(base_url, out_dir, workers=1):
+    return {
+        "base_url": base_url,
+        "station": STATION,
+        "start_year": YEARS[0],
+        "end_year": YEARS[1],
+        "timeout": 5,
+        "min_bytes": 500,
+        "workers": workers,
+        "out_dir": str(out_dir),
+    }
+
+@pytest.fixture()
+def server():
+    with FakeNOAAServer(latency=0.1) as srv:
+        yield srv
+
+# ---------------------------------------------------------------------
+# Concurrent Downloads
+# ---------------------------------------------------------------------
+
+def test_concurrent_matches_serial(server, tmp_path):
+    serial = RequestPipe(make_config(server.base_url, tmp_path / "serial")).run()
+    concurrent = RequestPipe(make_config(server.base_url, tmp_path / "concurrent", workers=8)).run()
+
+    assert [p.name for p in serial] == [p.name for p in concurrent]
+    assert len(serial) == YEARS[1] - YEARS[0] + 1
+    for a, b in zip(serial, concurrent):
+        assert a.read_bytes() == b.read_bytes()
+
+def test_concurrent_is_faster(server, tmp_path):
+    t0 = time.perf_counter()
+    RequestPipe(make_config(server.base_url, tmp_path / "serial")).run()
+    serial_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    RequestPipe(make_config(server.base_url, tmp_path / "concurrent", workers=8)).run()
+    concurrent_s = time.perf_counter() - t0
+
+    assert concurrent_s < serial_s / 2, f"serial={serial_s:.2f}s concurrent={concurrent_s:.2f}s"
+
+def test_missing_years_are_skipped(server, tmp_path):
+    cfg = make_config(server.base_url, tmp_path, workers=4)
+    cfg["station"] = "WA_Nowhere_1_N"
+    assert RequestPipe(cfg).run() == []
+
+# ---------------------------------------------------------------------
+# Incremental Refresh (manifest + conditional GET)
+# ---------------------------------------------------------------------
+
+@pytest.fixture()
+def raw_copy(tmp_path):
+    # writable copy of a few spokane years so tests can "publish" a new version
+    dst = tmp_path / "upstream"
+    dst.mkdir()
+    for year in range(YEARS[0], YEARS[1] + 1):
+        name = f"uscrn_{STATION}_{year}.txt"
+        (dst / name).write_bytes((RAW_DIR / "spokane" / name).read_bytes())
+    return dst
+
+def test_second_run_is_all_not_modified(raw_copy, tmp_path):
+    with FakeNOAAServer(raw_dir=raw_copy) as srv:
+        cfg = make_config(srv.base_url, tmp_path / "out", workers=4)
+        first = RequestPipe(cfg)
+        assert len(first.run()) == 8 and first.changed
+
+        mtimes = {p: p.stat().st_mtime_ns for p in (tmp_path / "out").glob("uscrn_*.txt")}
+        second = RequestPipe(cfg)
+        assert second.run() == [] and not second.changed
+        assert srv.status_counts.get(304) == 8
+        assert mtimes == {p: p.stat().st_mtime_ns for p in (tmp_path / "out").glob("uscrn_*.txt")}
+
+        entry = second.manifest.get(YEARS[1])
+        assert {"etag", "last_modified", "size", "sha256"} <= set(entry)
+
+def test_changed_year_is_rewritten(raw_copy, tmp_path):
+    with FakeNOAAServer(raw_dir=raw_copy) as srv:
+        cfg = make_config(srv.base_url, tmp_path / "out", workers=4)
+        RequestPipe(cfg).run()
+
+        latest = raw_copy / f"uscrn_{STATION}_{YEARS[1]}.txt"
+        latest.write_bytes(latest.read_bytes() + latest.read_bytes().splitlines(keepends=True)[-1])
+
+        saved = RequestPipe(cfg).run()
+        assert [p.name for p in saved] == [latest.name]
+        assert (tmp_path / "out" / latest.name).read_bytes() == latest.read_bytes()
+
+def test_existing_files_without_manifest_are_not_rewritten(raw_copy, tmp_path):
+    out = tmp_path / "out"
+    out.mkdir()
+    for p in raw_copy.iterdir():
+        (out / p.name).write_bytes(p.read_bytes())
+
+    with FakeNOAAServer(raw_dir=raw_copy) as srv:
+        assert RequestPipe(make_config(srv.base_url, out)).run() == []
+
+def test_frozen_completed_years_are_not_requested(raw_copy, tmp_path):
+    with FakeNOAAServer(raw_dir=raw_copy) as srv:
+        cfg = make_config(srv.base_url, tmp_path / "out")
+        RequestPipe(cfg).run()
+        before = srv.request_count
+
+        cfg["frozen_years"] = "completed"
+        RequestPipe(cfg).run()
+        assert srv.request_count == before
+
+# ---------------------------------------------------------------------
+# Streaming / Atomic Writes
+# ---------------------------------------------------------------------
+
+def test_interrupted_download_keeps_previous_file(raw_copy, tmp_path, monkeypatch):
+    import requests
+
+    out = tmp_path / "out"
+    out.mkdir()
+    name = f"uscrn_{STATION}_{YEARS[1]}.txt"
+    (out / name).write_bytes(b"previous contents\n" * 100)
+
+    def broken_iter_content(self, chunk_size=1, decode_unicode=False):
+        yield b"partial"
+        raise requests.ConnectionError("connection reset mid-stream")
+
+    monkeypatch.setattr(requests.Response, "iter_content", broken_iter_content)
+    with FakeNOAAServer(raw_dir=raw_copy) as srv:
+        cfg = make_config(srv.base_url, out)
+        cfg["start_year"] = YEARS[1]
+        assert RequestPipe(cfg).run() == []
+
+    assert (out / name).read_bytes() == b"previous contents\n" * 100
+    assert not list(out.glob("*.part"))
+
+def test_small_chunks_produce_identical_files(raw_copy, tmp_path):
+    with FakeNOAAServer(raw_dir=raw_copy) as srv:
+        cfg = make_config(srv.base_url, tmp_path / "out")
+        cfg["chunk_bytes"] = 1024
+        saved = RequestPipe(cfg).run()
+
+    assert len(saved) == 8
+    for p in saved:
+        assert p.read_bytes() == (raw_copy / p.name).read_bytes()
+
+# ---------------------------------------------------------------------
+# Directory-Index Discovery
+# ---------------------------------------------------------------------
+
+def test_discovery_requests_only_listed_years(raw_copy, tmp_path):
+    with FakeNOAAServer(raw_dir=raw_copy) as srv:
+        cfg = make_config(srv.base_url, tmp_path / "out", workers=4)
+        cfg.update(start_year=2010, end_year=2025, discover=True, index_cache_dir=str(tmp_path / "index"))
+
+        saved = RequestPipe(cfg).run()
+        assert len(saved) == 8
+        assert srv.status_counts.get(404, 0) == 16 - 8  # only the unpublished year listings
+
+        # listings are cached -> a second run only issues the 8 conditional file GETs
+        before = srv.request_count
+        RequestPipe(cfg).run()
+        assert srv.request_count - before == 8
+
+def test_index_lists_stations(tmp_path):
+    from utils.uscrn_index import USCRNIndex
+
+    with FakeNOAAServer() as srv:
+        index = USCRNIndex(srv.base_url, cache_dir=tmp_path)
+        found = index.stations(range(2007, 2026), prefix="WA_")
+
+    assert set(found) == {"WA_Spokane_17_SSW", "WA_Quinault_4_NE", "WA_Darrington_21_NNE"}
+    assert found["WA_Spokane_17_SSW"][0] == 2007
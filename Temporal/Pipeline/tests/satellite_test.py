@@ -0,0 +1,331 @@
+# Jakob Balkovec
+# satellite_test.py
+
+# SatellitePipe tests against the local Earth Engine stand-in (tests/fakes/fake_ee.py)
+
+import sys
+import numpy as np
+import pandas as pd
+import pytest # type: ignore
+
+from tests.fakes.fake_ee import FakeEarthEngine
+
+STATION = "spokane_17_ssw"
+LAT, LON = 47.4184, -117.5269
+
+
+def ground(start="2020-01-01", end="2020-03-31", lat=LAT, lon=LON, station_id=4136):
+    dates = pd.date_range(start, end, freq="D")
+    return pd.DataFrame({
+        "station_id": station_id, "date": dates, "latitude": lat, "longitude": lon,
+        "soil_moisture_5cm": np.linspace(0.1, 0.3, len(dates)),
+    })
+
+@pytest.fixture()
+def fake_ee(monkeypatch):
+    fake = FakeEarthEngine()
+    monkeypatch.setitem(sys.modules, "ee", fake)
+    import pipes.satellite_pipe as satellite_pipe
+    monkeypatch.setattr(satellite_pipe, "ee", fake)
+    return fake
+
+def make_pipe(tmp_path, station=STATION, **satellite_cfg):
+    from pipes.satellite_pipe import SatellitePipe
+    cfg = {"satellite": {"cache_path": str(tmp_path / "{station}_satellite_cache.json"), **satellite_cfg}}
+    return SatellitePipe(config=cfg, station_name=station)
+
+# ---------------------------------------------------------------------
+# series retrieval
+# ---------------------------------------------------------------------
+
+def test_series_mode_matches_weekly_with_fewer_calls(fake_ee, tmp_path):
+    weekly = make_pipe(tmp_path / "weekly", mode="weekly").run(ground())
+    weekly_calls = fake_ee.getinfo_calls
+
+    fake_ee.getinfo_calls = 0
+    series = make_pipe(tmp_path / "series", mode="series").run(ground())
+
+    assert fake_ee.getinfo_calls == 3 * 2  # one per product per year (padding reaches into 2019)
+    # LST / Rain_sat: one per calendar week touched by the padded windows; NDVI: one per composite
+    assert weekly_calls == 2 * 15 + 7
+    for col in ("LST", "NDVI", "Rain_sat"):
+        np.testing.assert_allclose(series[col].to_numpy(dtype=float), weekly[col].to_numpy(dtype=float), rtol=1e-9)
+
+def test_series_spans_years(fake_ee, tmp_path):
+    df = make_pipe(tmp_path, mode="series").run(ground("2019-11-01", "2021-02-28"))
+    assert fake_ee.getinfo_calls == 3 * 3  # 2019, 2020, 2021
+    assert df["LST"].notna().sum() > 0
+
+def test_series_cache_is_reused(fake_ee, tmp_path):
+    make_pipe(tmp_path, mode="series").run(ground())
+    fake_ee.getinfo_calls = 0
+    make_pipe(tmp_path, mode="series").run(ground())
+    assert fake_ee.getinfo_calls == 0
+
+# ---------------------------------------------------------------------
+# multi-station batching
+# ---------------------------------------------------------------------
+
+STATIONS = {
+    "spokane_17_ssw": (47.4184, -117.5269, 4136),
+    "darrington_21_nne": (48.5408, -121.4456, 4137),
+    "quinault_4_ne": (47.5127, -123.8120, 4138),
+}
+
+@pytest.mark.parametrize("mode,cadence", [("series", "weekly"), ("weekly", "weekly"), ("series", "native")])
+def test_multi_station_matches_per_station(fake_ee, tmp_path, mode, cadence):
+    frames = {name: ground(lat=lat, lon=lon, station_id=sid) for name, (lat, lon, sid) in STATIONS.items()}
+
+    expected = {name: make_pipe(tmp_path / "single", name, mode=mode, cadence=cadence).run(df.copy()) for name, df in frames.items()}
+
+    make_pipe(tmp_path / "multi", "global", mode=mode, cadence=cadence).prefetch_stations({n: df.copy() for n, df in frames.items()})
+    fake_ee.getinfo_calls = 0
+    for name, df in frames.items():
+        got = make_pipe(tmp_path / "multi", name, mode=mode, cadence=cadence).run(df.copy())
+        for col in ("LST", "NDVI", "Rain_sat"):
+            np.testing.assert_allclose(got[col].to_numpy(dtype=float), expected[name][col].to_numpy(dtype=float), rtol=1e-9)
+    assert fake_ee.getinfo_calls == 0  # every station served from its prefetched cache
+
+def test_multi_station_calls_independent_of_station_count(fake_ee, tmp_path):
+    calls = []
+    for n in (1, 3):
+        fake_ee.getinfo_calls = 0
+        frames = {name: ground(lat=lat, lon=lon, station_id=sid)
+                  for name, (lat, lon, sid) in list(STATIONS.items())[:n]}
+        make_pipe(tmp_path / str(n), "global", mode="series").prefetch_stations(frames)
+        calls.append(fake_ee.getinfo_calls)
+    assert calls == [3 * 2, 3 * 2]
+
+# ---------------------------------------------------------------------
+# native cadence
+# ---------------------------------------------------------------------
+
+def test_native_cadence_fills_every_day(fake_ee, tmp_path):
+    weekly = make_pipe(tmp_path / "weekly", mode="series").run(ground())
+    native = make_pipe(tmp_path / "native", mode="series", cadence="native").run(ground())
+
+    assert len(native) == len(weekly)
+    assert native["NDVI"].notna().all() and native["Rain_sat"].notna().all()
+    assert native["LST"].notna().mean() > 0.7  # only cloud-masked days are missing
+    assert weekly["LST"].notna().mean() < 0.2  # one midpoint per week
+
+def test_native_values_follow_product_periods(fake_ee, tmp_path):
+    df = make_pipe(tmp_path, mode="series", cadence="native").run(ground()).set_index("date")
+
+    # NDVI is constant within a 16-day composite and changes at DOY 17
+    assert df.loc["2020-01-01":"2020-01-16", "NDVI"].nunique() == 1
+    assert df.loc["2020-01-16", "NDVI"] != df.loc["2020-01-17", "NDVI"]
+
+    # IMERG: the day's mean over 48 half-hourly images (slot pattern averages to +0.00075)
+    day = pd.Timestamp("2020-02-10").date()
+    expected = ((day.toordinal() + int(abs(LAT) * 10)) % 7) * 0.02 + 0.00075
+    assert df.loc["2020-02-10", "Rain_sat"] == pytest.approx(expected)
+
+def test_native_retrieval_requests_and_transfer(fake_ee, tmp_path):
+    make_pipe(tmp_path, mode="weekly", cadence="native").run(ground())
+    assert fake_ee.getinfo_calls == 14 + 14 + 6  # weeks for LST / Rain_sat, composites for NDVI
+
+    # sub-daily IMERG is reduced to daily images server-side: <= one row per day and product
+    n_days = len(ground())
+    assert fake_ee.rows_transferred <= 2 * n_days + 6
+
+# ---------------------------------------------------------------------
+# interval join
+# ---------------------------------------------------------------------
+
+def test_weekly_window_join_covers_every_day(fake_ee, tmp_path):
+    # the ground data ends on Tuesday 2020-03-31: the last week spans 2 days, so its
+    # midpoint falls at 12:00 and matches no row
+    midpoint = make_pipe(tmp_path, mode="series").run(ground())
+    window = make_pipe(tmp_path, mode="series", join="window").run(ground())
+
+    assert window["Rain_sat"].notna().all()
+    assert window["Rain_sat"].notna().sum() > 5 * midpoint["Rain_sat"].notna().sum()
+    assert midpoint["Rain_sat"].iloc[-2:].isna().all()
+    assert window.groupby(window["date"].dt.to_period("W"))["Rain_sat"].nunique().eq(1).all()
+
+    # every value the midpoint join produced is still there, on the same day
+    for col in ("LST", "NDVI", "Rain_sat"):
+        hit = midpoint[col].notna()
+        np.testing.assert_allclose(window.loc[hit, col], midpoint.loc[hit, col], rtol=1e-9)
+
+def test_native_join_policies(fake_ee, tmp_path):
+    window = make_pipe(tmp_path, mode="series", cadence="native", join="window").run(ground())
+    nearest = make_pipe(tmp_path, mode="series", cadence="native", join="nearest", join_tolerance_days=3).run(ground())
+    linear = make_pipe(tmp_path, mode="series", cadence="native", join="linear", join_tolerance_days=3).run(ground())
+
+    # cloud-masked LST days are filled from neighbouring days; valid days are untouched
+    for df in (nearest, linear):
+        assert df["LST"].notna().sum() > window["LST"].notna().sum()
+        ok = window["LST"].notna()
+        np.testing.assert_allclose(df.loc[ok, "LST"], window.loc[ok, "LST"], rtol=1e-9)
+
+    # linear NDVI varies inside a composite, window NDVI does not
+    assert window.set_index("date").loc["2020-01-17":"2020-02-01", "NDVI"].nunique() == 1
+    assert linear.set_index("date").loc["2020-01-17":"2020-02-01", "NDVI"].nunique() > 1
+
+def test_unknown_join_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        make_pipe(tmp_path, join="spline")
+
+# ---------------------------------------------------------------------
+# canonical store
+# ---------------------------------------------------------------------
+
+def test_shifted_and_overlapping_runs_hit_the_store(fake_ee, tmp_path):
+    make_pipe(tmp_path, mode="series").run(ground("2020-01-01", "2020-03-31"))
+
+    # week edges move (different first/last day) -> still fully covered
+    fake_ee.getinfo_calls = 0
+    make_pipe(tmp_path, mode="series").run(ground("2020-01-04", "2020-03-20"))
+    assert fake_ee.getinfo_calls == 0
+
+    # extension -> only the uncovered tail is requested (one range per product)
+    extended = make_pipe(tmp_path, mode="series").run(ground("2020-01-01", "2020-04-30"))
+    assert fake_ee.getinfo_calls == 3
+    fresh = make_pipe(tmp_path / "fresh", mode="series").run(ground("2020-01-01", "2020-04-30"))
+    for col in ("LST", "NDVI", "Rain_sat"):
+        np.testing.assert_allclose(extended[col].to_numpy(dtype=float), fresh[col].to_numpy(dtype=float))
+
+def test_store_is_keyed_by_coordinates_not_station(fake_ee, tmp_path):
+    make_pipe(tmp_path, "a_1", mode="series").run(ground())
+    fake_ee.getinfo_calls = 0
+    make_pipe(tmp_path, "b_2", mode="series").run(ground())  # same point, other name
+    assert fake_ee.getinfo_calls == 0
+    make_pipe(tmp_path, "c_3", mode="series").run(ground(lat=48.0))
+    assert fake_ee.getinfo_calls == 3 * 2
+
+def test_store_commits_each_result_as_it_arrives(fake_ee, tmp_path):
+    pipe = make_pipe(tmp_path, mode="weekly")
+
+    # interrupt the run after five ranges came back -> those five are already durable
+    put, seen = pipe.store.put_series, []
+    def interrupted(*args):
+        if len(seen) == 5:
+            raise KeyboardInterrupt()
+        seen.append(args)
+        return put(*args)
+    pipe.store.put_series = interrupted
+
+    with pytest.raises(KeyboardInterrupt):
+        pipe.run(ground())
+
+    fake_ee.getinfo_calls = 0
+    make_pipe(tmp_path, mode="weekly").run(ground())
+    assert fake_ee.getinfo_calls == 2 * 15 + 7 - 5
+
+def test_failed_ranges_are_not_covered(fake_ee, tmp_path):
+    # not transient -> no retry, the range stays uncovered
+    fake_ee.failures = lambda call: fake_ee.EEException("User memory limit exceeded.") if call == 1 else None
+    first = make_pipe(tmp_path, mode="series").run(ground())
+
+    fake_ee.failures, fake_ee.getinfo_calls = None, 0
+    second = make_pipe(tmp_path, mode="series").run(ground())
+    assert fake_ee.getinfo_calls == 1  # only the failed range is requested again
+    assert first["LST"].notna().sum() < second["LST"].notna().sum()  # its week was left empty, not cached
+
+def test_legacy_json_cache_is_imported_once(fake_ee, tmp_path):
+    import json
+    from pipes.satellite_pipe import SatellitePipe
+
+    _, weeks = SatellitePipe._weeks(ground())
+    legacy = {key: {"LST": 290.0, "NDVI": 0.5, "Rain_sat": 0.1} for key in weeks}
+    cache_file = tmp_path / f"{STATION}_satellite_cache.json"
+    cache_file.write_text(json.dumps(legacy))
+
+    df = make_pipe(tmp_path, mode="series").run(ground())
+    assert fake_ee.getinfo_calls == 0  # every week matched a legacy record
+    assert set(df["LST"].dropna()) == {290.0}
+
+    # the import is one-time: a changed JSON file is not re-read
+    cache_file.write_text("{}")
+    make_pipe(tmp_path, mode="series").run(ground())
+    assert fake_ee.getinfo_calls == 0
+
+def test_store_is_shared_by_concurrent_stations(fake_ee, tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    stations = {"a_1": (47.4, -117.5), "b_2": (48.5, -121.4), "c_3": (47.5, -123.8)}
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        list(executor.map(
+            lambda item: make_pipe(tmp_path, item[0], mode="series").run(ground(lat=item[1][0], lon=item[1][1])),
+            stations.items(),
+        ))
+
+    fake_ee.getinfo_calls = 0
+    for name, (lat, lon) in stations.items():
+        make_pipe(tmp_path, name, mode="series").run(ground(lat=lat, lon=lon))
+    assert fake_ee.getinfo_calls == 0
+
+# ---------------------------------------------------------------------
+# adaptive scheduler
+# ---------------------------------------------------------------------
+
+def test_throttling_and_timeouts_are_retried(fake_ee, tmp_path):
+    clean = make_pipe(tmp_path / "clean", mode="weekly").run(ground())
+
+    def flaky(call):
+        if call % 5 == 0:
+            return fake_ee.EEException("Too many requests, please retry (429).")
+        if call % 7 == 0:
+            return fake_ee.EEException("Computation timed out.")
+        return None
+
+    fake_ee.failures, fake_ee.latency = flaky, 0.002
+    pipe = make_pipe(tmp_path / "flaky", mode="weekly", scheduler={"backoff_base": 0.001, "max_retries": 6, "seed": 1})
+    flaky_df = pipe.run(ground())
+
+    stats = pipe.fetch_stats
+    assert stats["completed"] == 2 * 15 + 7 and stats["failed"] == 0
+    assert stats["retries"] > 0 and stats["throttled"] > 0
+    assert stats["queue_depth"] == 0 and stats["throughput"] > 0
+    for col in ("LST", "NDVI", "Rain_sat"):
+        np.testing.assert_allclose(flaky_df[col].to_numpy(dtype=float), clean[col].to_numpy(dtype=float))
+
+# ---------------------------------------------------------------------
+# lazy initialization / offline
+# ---------------------------------------------------------------------
+
+def test_earth_engine_is_initialized_only_on_a_miss(fake_ee, tmp_path):
+    make_pipe(tmp_path, mode="series", cadence="native")  # constructing never connects
+    assert fake_ee.initialize_calls == 0
+
+    make_pipe(tmp_path, mode="series", cadence="native").run(ground())
+    make_pipe(tmp_path, mode="series", cadence="native").run(ground("2020-04-01", "2020-04-30"))
+    assert fake_ee.initialize_calls == 1  # once per process, not per pipe
+
+def test_fully_cached_run_never_connects(fake_ee, tmp_path, monkeypatch):
+    make_pipe(tmp_path, mode="series", cadence="native").run(ground())
+
+    import pipes.satellite_pipe as satellite_pipe
+    fresh = FakeEarthEngine()
+    monkeypatch.setattr(satellite_pipe, "ee", fresh)
+    make_pipe(tmp_path, mode="series", cadence="native").run(ground())
+    assert fresh.initialize_calls == 0 and fresh.getinfo_calls == 0
+
+def test_headless_init_failure_does_not_prompt(fake_ee, tmp_path, monkeypatch):
+    import io
+    monkeypatch.setattr(sys, "stdin", io.StringIO())
+    fake_ee.initialize_error = fake_ee.EEException("Please authorize access to your Earth Engine account.")
+
+    with pytest.raises(RuntimeError, match="offline"):
+        make_pipe(tmp_path, mode="series").run(ground())
+    assert fake_ee.authenticate_calls == 0
+
+def test_offline_serves_cache_and_reports_missing(fake_ee, tmp_path, monkeypatch):
+    online = make_pipe(tmp_path, mode="series", cadence="native").run(ground("2020-01-01", "2020-02-29"))
+
+    # no earthengine-api at all: importing it would fail
+    import pipes.satellite_pipe as satellite_pipe
+    monkeypatch.setattr(satellite_pipe, "ee", None)
+    monkeypatch.setitem(sys.modules, "ee", None)
+
+    pipe = make_pipe(tmp_path, mode="series", cadence="native", offline=True)
+    df = pipe.run(ground("2020-01-01", "2020-03-31"))
+
+    cached = df[df["date"] < "2020-03-01"].reset_index(drop=True)
+    pd.testing.assert_frame_equal(cached[["LST", "NDVI", "Rain_sat"]], online[["LST", "NDVI", "Rain_sat"]])
+    assert df.loc[df["date"] >= "2020-03-05", ["LST", "NDVI", "Rain_sat"]].isna().all().all()
+
+    assert {w["product"] for w in pipe.missing_windows} == {"LST", "NDVI", "Rain_sat"}
+    assert all(w["start"] >= "2020-02-18" for w in pipe.missing_windows)
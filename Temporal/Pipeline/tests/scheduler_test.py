@@ -0,0 +1,77 @@
+# Jakob Balkovec
+# scheduler_test.py
+
+# FetchScheduler tests: AIMD concurrency, retries with jittered backoff, stats
+
+import threading
+import time
+import pytest # type: ignore
+
+from utils.fetch_scheduler import FetchScheduler, is_throttle, is_transient
+from tests.fakes.fake_ee import EEException
+
+
+def run_all(scheduler, fn, n):
+    return {key: (result, error) for key, result, error in scheduler.run(fn, {i: (i,) for i in range(n)})}
+
+
+def test_classifies_errors():
+    assert is_throttle(EEException("Too many concurrent aggregations."))
+    assert is_transient(EEException("Computation timed out."))
+    assert is_transient(TimeoutError())
+    assert not is_transient(EEException("Image.select: Pattern 'X' did not match any bands."))
+
+
+def test_additive_increase_up_to_max():
+    scheduler = FetchScheduler(max_workers=6, initial_workers=1)
+    results = run_all(scheduler, lambda i: i * 2, 60)
+    assert all(results[i] == (i * 2, None) for i in range(60))
+    assert scheduler.limit == 6 and scheduler.peak_limit == 6
+
+
+def test_throttling_halves_concurrency_and_retries():
+    calls = {"n": 0}
+    lock = threading.Lock()
+
+    def fetch(i):
+        with lock:
+            calls["n"] += 1
+            n = calls["n"]
+        time.sleep(0.001)
+        if n in (3, 4, 5):
+            raise EEException("429 Too Many Requests")
+        return i
+
+    scheduler = FetchScheduler(max_workers=8, initial_workers=8, backoff_base=0.001, seed=0)
+    results = run_all(scheduler, fetch, 20)
+    assert all(results[i] == (i, None) for i in range(20))
+    assert scheduler.throttled == 3 and scheduler.retries == 3
+    assert scheduler.limit < 8  # backed off (and only partly recovered)
+
+
+def test_non_transient_and_exhausted_jobs_fail():
+    def fetch(i):
+        if i == 0:
+            raise EEException("User memory limit exceeded.")
+        if i == 1:
+            raise EEException("Computation timed out.")
+        return i
+
+    scheduler = FetchScheduler(max_retries=2, backoff_base=0.001)
+    results = run_all(scheduler, fetch, 3)
+    assert isinstance(results[0][1], EEException) and isinstance(results[1][1], EEException)
+    assert results[2] == (2, None)
+    assert scheduler.retries == 2 and scheduler.failed == 2 and scheduler.completed == 1
+
+
+def test_slow_responses_reduce_concurrency():
+    scheduler = FetchScheduler(max_workers=8, initial_workers=6, target_latency=0.001)
+    run_all(scheduler, lambda i: time.sleep(0.005), 10)
+    assert scheduler.limit == 1
+
+
+def test_backoff_is_jittered_and_capped():
+    scheduler = FetchScheduler(backoff_base=1.0, backoff_max=5.0, seed=3)
+    delays = [scheduler.backoff(attempt) for attempt in range(10) for _ in range(20)]
+    assert all(0.0 <= d <= 5.0 for d in delays)
+    assert len(set(delays)) > 100
@@ -0,0 +1,86 @@
+# Jakob Balkovec
+# snotel_test.py
+
+# SNOTELPipe / ParsePipe(snotel_mode) tests on small synthetic ISMN .stm files
+
+import numpy as np
+import pandas as pd
+import pytest # type: ignore
+
+from pipes.parse_pipe import ParsePipe
+from pipes.snotel_pipe import stm_column, read_stm
+
+STATION = "SourdoughGulch_WA_985"
+HEADER = "SNOTEL SNOTEL Sourdough_Gulch 46.23333 -117.40000 1210.00 {depth:.4f} {depth:.4f} Sensor"
+
+
+def write_stm(path, depth, values, start="2020-01-01", flags=None, freq="h"):
+    # values: one record per freq step from start; flags default to "G"
+    times = pd.date_range(start, periods=len(values), freq=freq)
+    flags = flags or ["G"] * len(values)
+    lines = [HEADER.format(depth=depth)]
+    lines += [f"{t:%Y/%m/%d %H:%M} {v:.4f} {f} M" for t, v, f in zip(times, values, flags)]
+    path.write_text("\n".join(lines) + "\n")
+
+def stm_name(var, depth):
+    return f"SNOTEL_SNOTEL_Sourdough-Gulch_{var}_{depth:.6f}_{depth:.6f}_Sensor_20200101_20200102.stm"
+
+@pytest.fixture()
+def stm_dir(tmp_path):
+    d = tmp_path / "stm"
+    d.mkdir()
+    write_stm(d / stm_name("sm", 0.0508), 0.0508, [0.2] * 24 + [0.3] * 24)
+    write_stm(d / stm_name("ts", 0.2032), 0.2032, [4.0] * 48)
+    write_stm(d / stm_name("ta", 0.0), 0.0, list(range(24)) + [-9999.0] * 23 + [5.0])
+    write_stm(d / stm_name("p", 0.0), 0.0, [0.5] * 48, flags=["G"] * 47 + ["C01"])
+    write_stm(d / stm_name("sd", 0.0), 0.0, [10.0] * 48)  # unsupported variable, skipped
+    return d
+
+def parse(in_dir, tmp_path, **cfg):
+    return ParsePipe({
+        "in_dir": str(in_dir), "out_dir": str(tmp_path / "processed"), "station": STATION,
+        "snotel_mode": True, "latitude": 46.233333, "longitude": -117.4, "elevation": 1210, **cfg,
+    }).run()
+
+def test_stm_column_depths():
+    assert stm_column("sm", 0.0508) == "soil_moisture_5cm"
+    assert stm_column("ts", 1.016) == "soil_temp_100cm"
+    assert stm_column("p", 0.0) == "precipitation"
+    assert stm_column("sd", 0.0) is None
+
+def test_snotel_daily_schema(stm_dir, tmp_path):
+    df = parse(stm_dir, tmp_path, add_rolling_rain=True)
+
+    assert list(df["date"]) == [pd.Timestamp("2020-01-01"), pd.Timestamp("2020-01-02")]
+    assert (df["station_id"] == 985).all()
+    assert df["latitude"].iloc[0] == pytest.approx(46.233333)
+    assert df.attrs["elevation"] == 1210
+    assert df["soil_moisture_5cm"].to_numpy() == pytest.approx([0.2, 0.3])
+    assert df["soil_temp_20cm"].to_numpy() == pytest.approx([4.0, 4.0])
+
+    day1, day2 = df.iloc[0], df.iloc[1]
+    assert day1["air_temp_max"] == 23 and day1["air_temp_min"] == 0
+    assert day1["air_temp_mean"] == pytest.approx(11.5)
+    assert day2["air_temp_max"] == 5.0  # -9999 sentinels dropped
+    assert day2["precipitation"] == pytest.approx(0.5 * 23)  # C01-flagged hour excluded
+    assert df["Rain_3d"].to_numpy() == pytest.approx([12.0, 23.5])
+    assert "snow_depth" not in df.columns
+
+def test_snotel_cache_reuse(stm_dir, tmp_path, caplog):
+    cache_dir = str(tmp_path / "cache")
+    first = parse(stm_dir, tmp_path, cache_dir=cache_dir)
+    caplog.clear()
+    with caplog.at_level("INFO"):
+        second = parse(stm_dir, tmp_path, cache_dir=cache_dir)
+    assert "Parse cache: 4/5 files reused" in caplog.text
+    pd.testing.assert_frame_equal(first, second)
+
+def test_read_stm_long_history(tmp_path):
+    # 1979-2025 in a single pass (daily records keep the fixture small)
+    days = pd.date_range("1979-01-01", "2025-12-31", freq="D")
+    path = tmp_path / stm_name("sm", 0.0508)
+    write_stm(path, 0.0508, np.full(len(days), 0.25), start="1979-01-01", freq="D")
+    df = read_stm(path)
+    assert len(df) == len(days)
+    assert df["day"].iloc[-1] == pd.Timestamp("2025-12-31")
+    assert df["value"].dtype == "float64"
@@ -0,0 +1,191 @@
+# Jakob Balkovec
+# temporal_fill_test.py
+
+# TemporalFillPipe tests (XGBoost imputation and the fitted-model cache)
+
+import numpy as np
+import pandas as pd
+import pytest # type: ignore
+
+pytest.importorskip("xgboost")
+
+from pipes.temporal_fill_pipe import TemporalFillPipe
+
+STATION = "spokane_17_ssw"
+COLUMNS = ["LST", "NDVI", "Rain_sat"]
+
+
+def satellite_frame(days=400, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2020-01-01", periods=days, freq="D")
+    season = np.sin(2 * np.pi * dates.dayofyear / 365)
+    df = pd.DataFrame({
+        "date": dates,
+        "LST": 285 + 12 * season + rng.normal(0, 1, days),
+        "NDVI": 0.45 + 0.2 * season + rng.normal(0, 0.02, days),
+        "Rain_sat": np.abs(rng.normal(0.1, 0.05, days)),
+    })
+    for col in COLUMNS:
+        df.loc[rng.random(days) < 0.3, col] = np.nan
+    return df
+
+def make_pipe(tmp_path, **fill_cfg):
+    cfg = {"target_columns": COLUMNS, "model_cache_dir": str(tmp_path / "models"), **fill_cfg}
+    return TemporalFillPipe(config=cfg, station_name=STATION)
+
+def test_fills_satellite_columns():
+    df = TemporalFillPipe(config={"target_columns": COLUMNS}).run(satellite_frame())
+    assert df[COLUMNS].notna().all().all()
+
+def test_unchanged_inputs_reuse_models(tmp_path):
+    first = make_pipe(tmp_path)
+    expected = first.run(satellite_frame())
+    assert (first.model_cache.hits, first.model_cache.misses) == (0, 3)
+    assert len(list((tmp_path / "models").glob("*.ubj"))) == 3
+
+    second = make_pipe(tmp_path)
+    got = second.run(satellite_frame())
+    assert (second.model_cache.hits, second.model_cache.misses) == (3, 0)
+    np.testing.assert_allclose(got[COLUMNS].to_numpy(), expected[COLUMNS].to_numpy(), rtol=1e-6)
+
+def test_changed_training_rows_refit(tmp_path):
+    make_pipe(tmp_path).run(satellite_frame())
+
+    df = satellite_frame()
+    df.loc[10, "NDVI"] = 0.9  # one changed observation -> only the NDVI model is refit
+    pipe = make_pipe(tmp_path)
+    pipe.run(df)
+    assert (pipe.model_cache.hits, pipe.model_cache.misses) == (2, 1)
+
+def test_retrain_ignores_the_cache(tmp_path):
+    make_pipe(tmp_path).run(satellite_frame())
+    pipe = make_pipe(tmp_path, retrain=True)
+    pipe.run(satellite_frame())
+    assert pipe.model_cache.hits == 0
+
+def test_least_recently_used_models_are_evicted(tmp_path):
+    for seed in range(3):
+        make_pipe(tmp_path, model_cache_max_entries=4).run(satellite_frame(seed=seed))
+    assert len(list((tmp_path / "models").glob("*.ubj"))) == 4
+
+# ---------------------------------------------------------------------
+# parallel imputation
+# ---------------------------------------------------------------------
+
+def test_parallel_matches_sequential(tmp_path):
+    sequential = TemporalFillPipe(config={"target_columns": COLUMNS, "cpu_budget": 2})
+    parallel = TemporalFillPipe(config={"target_columns": COLUMNS, "workers": 3, "cpu_budget": 6})
+    expected = sequential.run(satellite_frame())
+    got = parallel.run(satellite_frame())
+
+    np.testing.assert_allclose(got[COLUMNS].to_numpy(), expected[COLUMNS].to_numpy(), rtol=1e-5)
+    assert set(parallel.timings) == set(COLUMNS) and all(t > 0 for t in parallel.timings.values())
+
+def test_cpu_budget_is_split():
+    pipe = TemporalFillPipe(config={"workers": 3, "cpu_budget": 8})
+    assert pipe._plan(3) == (3, 2)
+    assert pipe._plan(1) == (1, 8)
+    assert TemporalFillPipe(config={"workers": 4, "cpu_budget": 2})._plan(3) == (2, 1)
+
+def test_writeback_is_index_aligned():
+    df = satellite_frame(60)
+    shuffled = df.sample(frac=1, random_state=1)
+    known = shuffled.dropna(subset=["LST"]).set_index("date")["LST"]
+
+    out = TemporalFillPipe(config={"workers": 3, "cpu_budget": 3}).run(shuffled)
+    assert out["date"].is_monotonic_increasing and out["LST"].notna().all()
+    # observed values are kept on their own dates
+    np.testing.assert_array_equal(out.set_index("date").loc[known.index, "LST"], known)
+
+# ---------------------------------------------------------------------
+# hybrid engine
+# ---------------------------------------------------------------------
+
+def test_hybrid_engine_flags_long_gaps(tmp_path):
+    df = satellite_frame()
+    df.loc[100:149, "LST"] = np.nan  # 50-day outage
+
+    pipe = make_pipe(tmp_path, engine="hybrid", max_gap_days=30)
+    out = pipe.run(df)
+
+    assert out.loc[100:149, "LST"].isna().all() and out.loc[100:149, "LST_gap_flag"].all()
+    assert out["LST_gap_flag"].sum() >= 50  # plus any missing days next to the outage
+    assert out.loc[out["LST_gap_flag"], "LST"].isna().all()
+    assert out.loc[~out["LST_gap_flag"], "LST"].notna().all()
+    assert out[["NDVI", "Rain_sat"]].notna().all().all()
+
+def test_hybrid_engine_keeps_observations(tmp_path):
+    df = satellite_frame()
+    out = make_pipe(tmp_path, engine="hybrid").run(df)
+    for col in COLUMNS:
+        known = df[col].notna()
+        np.testing.assert_array_equal(out.loc[known, col], df.loc[known, col])
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError):
+        TemporalFillPipe(config={"engine": "kriging"})
+
+# ---------------------------------------------------------------------
+# incremental mode
+# ---------------------------------------------------------------------
+
+def incremental_pipe(tmp_path, **fill_cfg):
+    cfg = {"engine": "hybrid", "incremental": True, "state_dir": str(tmp_path / "state"), "model_cache_dir": None}
+    return make_pipe(tmp_path, **{**cfg, **fill_cfg})
+
+@pytest.fixture()
+def fits(monkeypatch):
+    from xgboost import XGBRegressor
+    calls = []
+    original = XGBRegressor.fit
+    monkeypatch.setattr(XGBRegressor, "fit", lambda self, *a, **k: calls.append(1) or original(self, *a, **k))
+    return calls
+
+def test_incremental_append_only_fills_new_rows(tmp_path, fits):
+    df = satellite_frame()
+    df.loc[150:170, "LST"] = np.nan  # a model-filled outage
+    df.loc[398:399, COLUMNS] = np.nan  # new days have no satellite values yet (an edge gap -> model)
+    before = incremental_pipe(tmp_path).run(df.iloc[:399])
+    assert len(fits) == len(COLUMNS)
+
+    after = incremental_pipe(tmp_path).run(df)
+    assert len(fits) == len(COLUMNS)  # predicted with the saved models
+
+    # history is untouched; the new day is filled
+    np.testing.assert_array_equal(after.loc[:398, COLUMNS].to_numpy(), before[COLUMNS].to_numpy())
+    assert after.loc[399, COLUMNS].notna().all()
+
+def test_incremental_changed_observation_refills_its_gap(tmp_path, fits):
+    df = satellite_frame()
+    df.loc[40:42, "NDVI"] = np.nan
+    before = incremental_pipe(tmp_path).run(df)
+    trained = len(fits)
+
+    df.loc[41, "NDVI"] = 0.9  # a late observation inside the gap
+    after = incremental_pipe(tmp_path).run(df)
+
+    assert after.loc[41, "NDVI"] == 0.9
+    assert after.loc[40, "NDVI"] != before.loc[40, "NDVI"]  # interpolated towards the new value
+    far = after.index.difference(range(20, 60))
+    np.testing.assert_array_equal(after.loc[far, COLUMNS].to_numpy(), before.loc[far, COLUMNS].to_numpy())
+    assert len(fits) == trained
+
+def test_incremental_rerun_without_changes_is_a_no_op(tmp_path, fits):
+    df = satellite_frame()
+    first = incremental_pipe(tmp_path).run(df)
+    trained = len(fits)
+    state = next((tmp_path / "state").glob("*state*"))
+    stamp = state.stat().st_mtime_ns
+
+    second = incremental_pipe(tmp_path).run(df)
+    np.testing.assert_array_equal(second[COLUMNS].to_numpy(), first[COLUMNS].to_numpy())
+    assert state.stat().st_mtime_ns == stamp and len(fits) == trained
+
+def test_settings_change_starts_a_full_run(tmp_path):
+    df = satellite_frame()
+    incremental_pipe(tmp_path).run(df)
+    got = incremental_pipe(tmp_path, switch_gap=1).run(df)
+    expected = make_pipe(tmp_path / "fresh", engine="hybrid", switch_gap=1).run(df)
+
+    np.testing.assert_allclose(got[COLUMNS].to_numpy(), expected[COLUMNS].to_numpy(), rtol=1e-6)
+    assert len(list((tmp_path / "state").glob("*state*"))) == 1  # the old entry is evicted
@@ -0,0 +1,49 @@
+# Jakob Balkovec
+# Column Projection & Compact Dtypes
+
+# This module defines which parsed columns the downstream pipes actually consume and
+# how a parsed frame is stored compactly (float32 measurements, categorical labels),
+# so stations can be parsed without carrying all 28 float64/str columns to SavePipe.
+
+import numpy as np
+import pandas as pd
+
+# columns read after CleanPipe regardless of clean.keep_columns
+DOWNSTREAM_COLUMNS = {
+    "satellite": ["date", "latitude", "longitude"],  # SatellitePipe: point + weekly groups
+    "feature": ["date", "precipitation", "soil_moisture_5cm"],  # FeaturePipe: DOY, Rain_3d, SM_prev
+}
+
+# low-cardinality labels repeated on every row
+CATEGORICAL_COLUMNS = ("station_id", "source_file", "crx_vn", "sur_temp_type")
+
+# kept as float64: coordinates feed Earth Engine geometries and cache keys
+FULL_PRECISION_COLUMNS = ("latitude", "longitude")
+
+
+def required_columns(station_cfg):
+    # pre:  station_cfg is one `stations:` block from config.yaml
+    # post: returns the sorted output columns the pipeline needs, or None when
+    #       clean.keep_columns is empty (== keep everything, no projection)
+    keep = station_cfg.get("clean", {}).get("keep_columns") or []
+    if not keep:
+        return None
+
+    needed = set(keep) | set(station_cfg.get("merge", {}).get("on_columns", []))
+    for cols in DOWNSTREAM_COLUMNS.values():
+        needed.update(cols)
+    return sorted(needed)
+
+
+def compact_dtypes(df, float_dtype="float32"):
+    # pre:  df is a parsed station frame
+    # post: returns df with float64 measurements downcast to float_dtype and label
+    #       columns as categoricals; idempotent
+    for col in df.columns:
+        dtype = df[col].dtype
+        if col in CATEGORICAL_COLUMNS:
+            if not isinstance(dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype("category")
+        elif col not in FULL_PRECISION_COLUMNS and dtype == np.float64:
+            df[col] = df[col].astype(float_dtype)
+    return df
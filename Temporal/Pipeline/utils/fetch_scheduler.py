@@ -0,0 +1,186 @@
+# Jakob Balkovec
+# Fetch Scheduler
+
+# This module defines the FetchScheduler utility, which runs blocking fetch calls
+# (Earth Engine getInfo round trips) on a thread pool whose effective concurrency is
+# tuned while it runs (AIMD, as in TCP congestion control):
+#
+#   success within target latency   +1 slot per `limit` successes (additive increase)
+#   success slower than target      -1 slot
+#   throttling error (429, quota)   limit halved, at most once per window of requests
+#
+# Transient errors (throttling, timeouts, 5xx, dropped connections) are retried with
+# full-jitter exponential backoff: sleep ~ U(0, min(backoff_max, backoff_base * 2^n)).
+# Anything else - and a job that is out of retries - is reported to the caller as a
+# failure; callers must not cache failed jobs.
+#
+# usage:
+#   scheduler = FetchScheduler(max_workers=8)
+#   for key, result, error in scheduler.run(fn, {key: args, ...}):
+#       ...
+#   scheduler.stats()  # queue depth, in flight, throughput, retries, concurrency
+
+import heapq
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+THROTTLE_MARKERS = ("429", "too many requests", "too many concurrent", "quota", "rate limit")
+TRANSIENT_MARKERS = THROTTLE_MARKERS + (
+    "timed out", "timeout", "deadline", "500", "502", "503", "504",
+    "service unavailable", "internal error", "connection", "temporarily",
+)
+
+
+def is_throttle(error):
+    return any(marker in str(error).lower() for marker in THROTTLE_MARKERS)
+
+
+def is_transient(error):
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return any(marker in str(error).lower() for marker in TRANSIENT_MARKERS)
+
+
+class FetchScheduler:
+    def __init__(self, max_workers=8, initial_workers=4, min_workers=1, max_retries=4,
+                 backoff_base=1.0, backoff_max=30.0, target_latency=None, seed=None):
+        # pre:  1 <= min_workers <= initial_workers <= max_workers; times in seconds;
+        #       target_latency None disables latency-based decreases
+        # post: scheduler ready; counters at zero
+        self.max_workers = max(1, int(max_workers))
+        self.min_workers = max(1, min(int(min_workers), self.max_workers))
+        self.limit = min(max(int(initial_workers), self.min_workers), self.max_workers)
+        self.max_retries = int(max_retries)
+        self.backoff_base = float(backoff_base)
+        self.backoff_max = float(backoff_max)
+        self.target_latency = target_latency
+        self._rng = random.Random(seed)
+
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+        self.throttled = 0
+        self.peak_limit = self.limit
+        self._credit = 0.0
+        self._last_decrease = float("-inf")
+        self._started = None
+        self._elapsed = 0.0
+
+    @classmethod
+    def from_config(cls, cfg):
+        # post: scheduler from a config block (unknown keys ignored)
+        keys = ("max_workers", "initial_workers", "min_workers", "max_retries",
+                "backoff_base", "backoff_max", "target_latency", "seed")
+        return cls(**{k: cfg[k] for k in keys if cfg.get(k) is not None})
+
+    # ---------------------------------------------------------------------
+    # concurrency control
+    # ---------------------------------------------------------------------
+
+    def _on_success(self, latency):
+        if self.target_latency is not None and latency > self.target_latency:
+            self.limit = max(self.min_workers, self.limit - 1)
+            self._credit = 0.0
+            return
+        self._credit += 1.0 / self.limit
+        if self._credit >= 1.0 and self.limit < self.max_workers:
+            self.limit += 1
+            self._credit = 0.0
+            self.peak_limit = max(self.peak_limit, self.limit)
+
+    def _on_throttle(self, started):
+        # requests already in flight when we backed off would throttle too: only the
+        # first error of a window halves the limit
+        self.throttled += 1
+        if started >= self._last_decrease:
+            self.limit = max(self.min_workers, self.limit // 2)
+            self._credit = 0.0
+            self._last_decrease = time.monotonic()
+
+    def backoff(self, attempt):
+        # post: jittered delay (s) before retry number attempt + 1
+        return self._rng.uniform(0.0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    # ---------------------------------------------------------------------
+    # execution
+    # ---------------------------------------------------------------------
+
+    def run(self, fn, jobs):
+        # pre:  jobs maps key -> tuple of positional args for fn
+        # post: yields (key, result, None) or (key, None, error) once per job as each
+        #       finishes; transient errors are retried before a job is reported failed
+        self._started = time.monotonic()
+        queue = [(0.0, seq, key, tuple(args), 0) for seq, (key, args) in enumerate(jobs.items())]
+        heapq.heapify(queue)
+        seq = len(queue)
+        running = {}
+        self.queue_depth = len(queue)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while queue or running:
+                now = time.monotonic()
+                while queue and len(running) < self.limit and queue[0][0] <= now:
+                    _, _, key, args, attempt = heapq.heappop(queue)
+                    running[executor.submit(fn, *args)] = (key, args, attempt, time.monotonic())
+                self.queue_depth, self.in_flight = len(queue), len(running)
+
+                if not running:
+                    time.sleep(max(0.0, queue[0][0] - now))
+                    continue
+
+                # wake up for the next completion, or when a backed-off job becomes due
+                timeout = None
+                if queue and len(running) < self.limit:
+                    timeout = max(0.0, queue[0][0] - now)
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    key, args, attempt, started = running.pop(future)
+                    latency = time.monotonic() - started
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        if is_throttle(e):
+                            self._on_throttle(started)
+                        if is_transient(e) and attempt < self.max_retries:
+                            self.retries += 1
+                            heapq.heappush(queue, (time.monotonic() + self.backoff(attempt), seq, key, args, attempt + 1))
+                            seq += 1
+                            continue
+                        self.failed += 1
+                        self._update(queue, running)
+                        yield key, None, e
+                        continue
+
+                    self._on_success(latency)
+                    self.completed += 1
+                    self._update(queue, running)
+                    yield key, result, None
+
+        self._update(queue, running)
+
+    def _update(self, queue, running):
+        self.queue_depth, self.in_flight = len(queue), len(running)
+        self._elapsed = time.monotonic() - self._started
+
+    @property
+    def throughput(self):
+        # completed jobs per second since run() started
+        return self.completed / self._elapsed if self._elapsed > 0 else 0.0
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "concurrency": self.limit,
+            "peak_concurrency": self.peak_limit,
+            "throughput": round(self.throughput, 3),
+            "elapsed": round(self._elapsed, 3),
+        }
@@ -0,0 +1,90 @@
+# Jakob Balkovec
+# Fill State
+
+# This module defines the FillState utility, the per-station memory of the last
+# TemporalFillPipe run used by incremental mode: one frame with, per date, each
+# satellite column's raw input ({col}_raw), filled output ({col}) and fill method
+# ({col}_method, utils/gap_fill.py codes), plus the fitted model of each column.
+#
+# Entries are keyed by the fill settings (engine, thresholds, hyperparameters), so a
+# settings change starts from a full run instead of mixing fills from two configurations.
+# Frames are stored as Feather (pickle without pyarrow) and written atomically.
+
+import os
+import json
+import hashlib
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+
+class FillState:
+    # bump when the state layout changes (invalidates every entry)
+    VERSION = 1
+
+    def __init__(self, state_dir, station, settings):
+        # pre:  state_dir is a writable directory path (created on demand);
+        #       settings are the JSON-serializable fill settings
+        # post: state handle ready (nothing read yet)
+        self.state_dir = Path(state_dir)
+        self.station = station
+        digest = hashlib.sha256(json.dumps({"settings": settings, "version": self.VERSION},
+                                           sort_keys=True, default=str).encode())
+        self.key = digest.hexdigest()[:16]
+        self.suffix = ".feather" if feather is not None else ".pkl"
+
+    def _path(self, name):
+        return self.state_dir / f"{self.station}.{self.key}.{name}"
+
+    def load(self):
+        # post: the saved frame, or None (missing or unreadable)
+        path = self._path(f"state{self.suffix}")
+        if not path.exists():
+            return None
+        try:
+            if feather is not None:
+                return feather.read_feather(path)
+            return pd.read_pickle(path)
+        except Exception:
+            return None
+
+    def save(self, frame):
+        # pre:  frame has string column names and a default RangeIndex
+        # post: frame written atomically; entries of other settings are evicted
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(f"state{self.suffix}")
+        tmp = path.with_name(path.name + ".tmp")
+        if feather is not None:
+            feather.write_feather(frame, tmp)
+        else:
+            frame.to_pickle(tmp)
+        os.replace(tmp, path)
+
+        for stale in self.state_dir.glob(f"{self.station}.*"):
+            if not stale.name.startswith(f"{self.station}.{self.key}."):
+                stale.unlink(missing_ok=True)
+
+    def load_model(self, col, model):
+        # pre:  model is an unfitted estimator exposing load_model()
+        # post: model loaded from the saved entry, or None
+        path = self._path(f"{col}.ubj")
+        if not path.exists():
+            return None
+        try:
+            model.load_model(path)
+        except Exception:
+            return None
+        return model
+
+    def save_model(self, col, model):
+        # pre:  model is fitted and exposes save_model()
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(f"{col}.ubj")
+        tmp = path.with_name(f"{path.stem}.tmp.ubj")  # save_model picks the format by suffix
+        model.save_model(tmp)
+        os.replace(tmp, path)
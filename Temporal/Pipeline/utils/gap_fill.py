@@ -0,0 +1,139 @@
+# Jakob Balkovec
+# Gap Fill
+
+# This module defines the gap-length-aware hybrid imputation engine. Missing values are
+# run-length encoded into gaps, each gap is measured in days between the observations
+# that bracket it, and the gap is routed by length:
+#
+#   length <= switch_gap          linear interpolation in time (vectorized, all gaps at once)
+#   length <= regression_window   local linear regression on the observations within
+#                                 regression_window days on either side of the gap
+#   length <= max_gap_days        the tree model (also every gap at the start / end of
+#                                 the series, which has nothing to interpolate towards)
+#   longer                        left NaN and flagged UNFILLED
+#
+# The model is only evaluated when at least one gap is routed to it. update_fill redoes
+# this for new / changed rows only, recomputing just the gaps whose fill depends on them.
+
+import numpy as np
+import pandas as pd
+
+# per-row fill method codes
+OBSERVED, INTERP, REGRESSION, MODEL, UNFILLED = range(5)
+METHOD_NAMES = {OBSERVED: "observed", INTERP: "interp", REGRESSION: "regression", MODEL: "model", UNFILLED: "unfilled"}
+
+
+def gap_runs(missing):
+    # pre:  missing is a bool array
+    # post: (starts, ends) row positions of the runs of True, ends exclusive
+    edges = np.diff(np.concatenate([[0], np.asarray(missing, dtype=np.int8), [0]]))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def gap_lengths(days, missing):
+    # pre:  days are sorted int day numbers aligned with missing
+    # post: (starts, ends, length in days, bracketed) per gap; an edge gap (no observation
+    #       before or after it) is measured from the end of the series instead
+    starts, ends = gap_runs(missing)
+    n = len(days)
+    has_prev, has_next = starts > 0, ends < n
+    prev_day = np.where(has_prev, days[np.clip(starts - 1, 0, None)], days[starts] - 1)
+    next_day = np.where(has_next, days[np.clip(ends, None, n - 1)], days[ends - 1] + 1)
+    return starts, ends, next_day - prev_day - 1, has_prev & has_next
+
+
+def _rows(starts, ends):
+    # post: row positions covered by the runs [start, end), concatenated
+    lengths = ends - starts
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(starts, lengths) + offsets
+
+
+def hybrid_fill(dates, values, switch_gap=4, regression_window=7, max_gap_days=30, model=None):
+    # pre:  dates sorted and unique (datetime-like); values float aligned with dates;
+    #       model is None or a callable () -> predictions aligned with dates
+    # post: (filled float64 array, per-row method code array)
+    days = np.asarray(pd.to_datetime(dates).values, dtype="datetime64[D]").astype(np.int64)
+    values = np.asarray(values, dtype="float64").copy()
+    missing = np.isnan(values)
+    method = np.full(len(values), OBSERVED, dtype=np.int8)
+    if not missing.any() or missing.all():
+        method[missing] = UNFILLED
+        return values, method
+
+    starts, ends, length, bracketed = gap_lengths(days, missing)
+    route = np.full(len(starts), MODEL, dtype=np.int8)
+    route[bracketed & (length <= regression_window)] = REGRESSION
+    route[bracketed & (length <= switch_gap)] = INTERP
+    route[length > max_gap_days] = UNFILLED
+    method[_rows(starts, ends)] = np.repeat(route, ends - starts)
+
+    known = ~missing
+    k_days, k_values = days[known], values[known]
+
+    rows = method == INTERP
+    values[rows] = np.interp(days[rows], k_days, k_values)
+
+    for start, end in zip(starts[route == REGRESSION], ends[route == REGRESSION]):
+        lo = np.searchsorted(k_days, days[start - 1] - regression_window, side="left")
+        hi = np.searchsorted(k_days, days[end] + regression_window, side="right")
+        origin = days[start]
+        slope, intercept = np.polyfit(k_days[lo:hi] - origin, k_values[lo:hi], 1)
+        values[start:end] = slope * (days[start:end] - origin) + intercept
+
+    rows = method == MODEL
+    if rows.any():
+        if model is None:
+            method[rows] = UNFILLED
+        else:
+            values[rows] = np.asarray(model(), dtype="float64")[rows]
+    return values, method
+
+
+def update_fill(dates, values, filled, method, changed, switch_gap=4, regression_window=7, max_gap_days=30, model=None):
+    # pre:  as hybrid_fill; filled / method are the previous output aligned with dates
+    #       (NaN / -1 on new rows); changed marks rows whose input is new or differs;
+    #       model is None or a callable (lo, hi) -> predictions for rows [lo, hi)
+    # post: (filled, method) with only the changed rows and the gaps whose fill depends on
+    #       them recomputed: a gap depends on every day from regression_window days before
+    #       its preceding observation to regression_window days after its next one
+    filled = np.asarray(filled, dtype="float64").copy()
+    method = np.asarray(method, dtype=np.int8).copy()
+    changed = np.flatnonzero(changed)
+    if not len(changed):
+        return filled, method
+
+    dates = pd.DatetimeIndex(pd.to_datetime(dates))
+    days = np.asarray(dates.values, dtype="datetime64[D]").astype(np.int64)
+    values = np.asarray(values, dtype="float64")
+    observed = np.flatnonzero(~np.isnan(values))
+    reach = max(int(regression_window), 0)
+    n = len(days)
+
+    # recompute on a region that holds every affected gap plus its regression context
+    first, last = days[changed[0]], days[changed[-1]]
+    k = np.searchsorted(days[observed], first - reach, side="left") - 1  # observation before the leftmost affected gap
+    lo = np.searchsorted(days, days[observed[k]] - reach, side="left") if k >= 0 else 0
+    k = np.searchsorted(days[observed], last + reach, side="right")  # observation after the rightmost one
+    hi = np.searchsorted(days, days[observed[k]] + reach, side="right") if k < len(observed) else n
+
+    region = slice(lo, hi)
+    r_values, r_method = hybrid_fill(
+        dates[region], values[region], switch_gap, regression_window, max_gap_days,
+        None if model is None else (lambda: model(lo, hi)),
+    )
+
+    # gaps of the region that depend on a changed day
+    r_days = days[region]
+    starts, ends = gap_runs(np.isnan(values[region]))
+    prev_day = np.where(starts > 0, r_days[np.clip(starts - 1, 0, None)], np.iinfo(np.int64).min // 2)
+    next_day = np.where(ends < len(r_days), r_days[np.clip(ends, None, len(r_days) - 1)], np.iinfo(np.int64).max // 2)
+    changed_days = days[changed]
+    hits = (np.searchsorted(changed_days, next_day + reach, side="right")
+            - np.searchsorted(changed_days, prev_day - reach, side="left"))
+    affected = hits > 0
+
+    rows = np.concatenate([_rows(starts[affected], ends[affected]), changed - lo])
+    filled[lo + rows] = r_values[rows]
+    method[lo + rows] = r_method[rows]
+    return filled, method
@@ -9,16 +9,22 @@ from sklearn.metrics import mean_squared_error, mean_absolute_error
 from xgboost import XGBRegressor
 import pandas as pd
 import numpy as np
+import time
+
+def fit_linear(df, col):
+    # pre: as run_linear
+    # post: LinearRegression of the known values on their position among the known rows
+    known = df.dropna(subset=[col])
+    X = np.arange(len(known)).reshape(-1, 1)
+    y = known[col].values
+    return LinearRegression().fit(X, y)
 
 def run_linear(df, col):
     # pre: the df has a datetime index and a column 'col' with missing values
     # post: the df with an additional column 'col_interp' with imputed values
     # desc: Imputes missing values in 'col' using linear regression based on the index position.
 
-    known = df.dropna(subset=[col])
-    X = np.arange(len(known)).reshape(-1, 1)
-    y = known[col].values
-    model = LinearRegression().fit(X, y)
+    model = fit_linear(df, col)
     full_pred = model.predict(np.arange(len(df)).reshape(-1, 1))
     df[col + "_interp"] = full_pred
     return df
@@ -31,11 +37,19 @@ def run_rolling(df, col, window=7):
     df[col + "_interp"] = df[col].ffill().rolling(window, min_periods=1).mean()
     return df
 
-def run_xgboost(df, col):
-    # pre: df has a 'date' column and numeric features including the target col
-    # post: adds col_interp (model predictions) to df
-    # desc: XGBoost-based imputation leveraging temporal and cross-satellite context.
+# hyperparameters of the XGBoost imputer (part of the model cache key)
+XGB_PARAMS = {
+    "n_estimators": 300,
+    "learning_rate": 0.05,
+    "max_depth": 4,
+    "subsample": 0.8,
+    "colsample_bytree": 0.8,
+    "random_state": 42,
+}
 
+def xgb_features(df, col):
+    # pre: df has a 'date' column and the target col
+    # post: (date-sorted copy of df with the temporal features added, predictor names)
     df = df.copy().sort_values("date").reset_index(drop=True)
     df["day_of_year"] = df["date"].dt.dayofyear
     df["year"] = df["date"].dt.year
@@ -48,27 +62,49 @@ def run_xgboost(df, col):
     features = ["DOY_sin", "DOY_cos", "year"]
     aux = [c for c in ["LST", "NDVI", "Rain_sat"] if c != col and c in df.columns]
     features += aux
+    return df, features
+
+def fit_xgboost(df, col, cache=None, station="global", retrain=False, n_jobs=None):
+    # pre: as run_xgboost
+    # post: (fitted model, or None with fewer than 5 known values; featured df; predictors)
+    df, features = xgb_features(df, col)
 
     # fallback if too few known values
     known = df.dropna(subset=[col])
     if len(known) < 5:
-        df[col + "_interp"] = df[col]
-        return df
+        return None, df, features
 
-    X_train = known[features].fillna(method="ffill").fillna(method="bfill")
+    X_train = known[features].ffill().bfill()
     y_train = known[col]
 
-    model = XGBRegressor(
-        n_estimators=300,
-        learning_rate=0.05,
-        max_depth=4,
-        subsample=0.8,
-        colsample_bytree=0.8,
-        random_state=42
-    )
-    model.fit(X_train, y_train)
-
-    X_pred = df[features].fillna(method="ffill").fillna(method="bfill")
+    model = None
+    if cache is not None:
+        key = cache.key(station, col, features, XGB_PARAMS, X_train, y_train)
+        if not retrain:
+            model = cache.load(station, col, key, XGBRegressor(n_jobs=n_jobs))
+
+    if model is None:
+        model = XGBRegressor(**XGB_PARAMS, n_jobs=n_jobs)
+        model.fit(X_train, y_train)
+        if cache is not None:
+            cache.store(station, col, key, model)
+    return model, df, features
+
+def run_xgboost(df, col, cache=None, station="global", retrain=False, n_jobs=None):
+    # pre: df has a 'date' column and numeric features including the target col;
+    #      cache is an optional ModelCache, retrain=True refits even on a cache hit;
+    #      n_jobs = XGBoost threads (None = library default)
+    # post: adds col_interp (model predictions) to df
+    # desc: XGBoost-based imputation leveraging temporal and cross-satellite context.
+    #       With a cache, a model fitted on identical training rows is loaded instead
+    #       of refit.
+
+    model, df, features = fit_xgboost(df, col, cache, station, retrain, n_jobs)
+    if model is None:
+        df[col + "_interp"] = df[col]
+        return df
+
+    X_pred = df[features].ffill().bfill()
     df[col + "_interp"] = model.predict(X_pred)
 
     return df
@@ -150,3 +186,98 @@ def bridge_test(df, col, model_fn, model_type=None, start_date=None, end_date=No
         "interp_segment": bridge_df_interp,
         "model": model_type or model_fn.__name__
     }
+
+
+# ---------------------------------------------------------------------
+# batched bridge tests (experiments/benchmarks/impute_bench.py)
+# ---------------------------------------------------------------------
+
+IMPUTERS = {"linear": run_linear, "rolling": run_rolling, "xgboost": run_xgboost}
+
+
+def impute_timed(model, df, col, n_jobs=1):
+    # pre: model is a key of IMPUTERS; df is a date-sorted frame with 'date' and col
+    # post: (predictions aligned with df rows - the same values IMPUTERS[model] writes to
+    #       col_interp -, fit seconds, predict seconds)
+    t0 = time.perf_counter()
+    if model == "linear":
+        fitted = fit_linear(df, col)
+        t1 = time.perf_counter()
+        pred = fitted.predict(np.arange(len(df)).reshape(-1, 1))
+    elif model == "rolling":
+        t1 = time.perf_counter()  # nothing to fit
+        pred = run_rolling(df.copy(), col)[col + "_interp"].to_numpy()
+    elif model == "xgboost":
+        fitted, featured, features = fit_xgboost(df, col, n_jobs=n_jobs)
+        t1 = time.perf_counter()
+        pred = featured[col].to_numpy() if fitted is None else fitted.predict(featured[features].ffill().bfill())
+    else:
+        raise ValueError(f"Unknown imputer: {model} (expected one of {sorted(IMPUTERS)})")
+    return np.asarray(pred, dtype="float64"), t1 - t0, time.perf_counter() - t1
+
+
+def sample_bridges(values, gap, n, rng):
+    # pre: values is a daily float array (NaN = missing); rng a numpy Generator
+    # post: sorted start positions of up to n windows [start, start + gap) that hold at
+    #       least one observation (the truth) and have observations on both sides
+    known = np.concatenate([[0], np.cumsum(~np.isnan(values))])
+    starts = np.arange(1, len(values) - gap)
+    inside = known[starts + gap] - known[starts]
+    after = known[-1] - known[starts + gap]
+    candidates = starts[(inside > 0) & (known[starts] > 0) & (after > 0)]
+    if len(candidates) <= n:
+        return candidates
+    return np.sort(rng.choice(candidates, size=n, replace=False))
+
+
+def batch_bridges(starts, gap, per_fit):
+    # post: starts grouped into fits of at most per_fit windows that are at least one gap
+    #       apart from each other (so masking them together does not merge them)
+    batches = []
+    for start in starts:
+        for batch in batches:
+            if len(batch) < per_fit and start - batch[-1] >= 2 * gap:
+                batch.append(start)
+                break
+        else:
+            batches.append([start])
+    return batches
+
+
+def bridge_batch(df, col, model, starts, gap, n_jobs=1):
+    # pre: df is a daily, date-sorted frame with 'date' and col; starts are row
+    #      positions of non-overlapping windows
+    # post: one record per window: the observations inside it are masked together, the
+    #       model is fit once, and the masked observations are scored
+    # desc: Batched form of bridge_test - one fit serves every window of the batch.
+    values = df[col].to_numpy(dtype="float64")
+    masked = values.copy()
+    for start in starts:
+        masked[start:start + gap] = np.nan
+
+    work = pd.DataFrame({"date": df["date"].to_numpy(), col: masked})
+    pred, fit_s, predict_s = impute_timed(model, work, col, n_jobs)
+
+    records = []
+    observed = np.flatnonzero(~np.isnan(masked))
+    for start in starts:
+        rows = start + np.flatnonzero(~np.isnan(values[start:start + gap]))
+        error = pred[rows] - values[rows]
+        # realized bridge: from the last observation before the window to the first after
+        i, j = np.searchsorted(observed, start), np.searchsorted(observed, start + gap)
+        before = observed[i - 1] if i > 0 else -1
+        after = observed[j] if j < len(observed) else len(values)
+        records.append({
+            "feature": col,
+            "model": model,
+            "gap": gap,
+            "start_date": str(pd.Timestamp(df["date"].iloc[start]).date()),
+            "span_days": int(after - before),
+            "points": len(rows),
+            "RMSE": float(np.sqrt(np.mean(error ** 2))) if len(rows) else float("nan"),
+            "MAE": float(np.mean(np.abs(error))) if len(rows) else float("nan"),
+            "fit_s": fit_s,
+            "predict_s": predict_s,
+            "windows_per_fit": len(starts),
+        })
+    return records
@@ -0,0 +1,83 @@
+# Jakob Balkovec
+# Interval Join
+
+# This module defines interval_join, a vectorized as-of / interval join of windowed
+# values (weekly satellite means, 16-day composites, single days) onto daily rows.
+# Windows are [start, end) and must not overlap; days are assigned by policy:
+#
+#   window   a day inside a window takes that window's value (window-constant)
+#   nearest  inside a window as above; otherwise the closest valued window, if it is
+#            at most tolerance_days away (measured to the window edge)
+#   linear   linear interpolation between the midpoints of neighbouring valued
+#            windows whose uncovered gap is at most tolerance_days; days before the
+#            first / after the last midpoint keep their window's value
+#
+# Windows with a NaN value are treated as absent (nothing to assign or interpolate).
+
+import numpy as np
+
+JOIN_POLICIES = {"window", "nearest", "linear"}
+DAY = np.timedelta64(1, "D")
+
+
+def _as_days(values):
+    return np.asarray(values, dtype="datetime64[ns]").astype("datetime64[D]")
+
+
+def interval_join(days, starts, ends, values, how="window", tolerance_days=0):
+    # pre:  days, starts, ends are datetime-like arrays; values is numeric (NaN = none);
+    #       windows do not overlap
+    # post: float64 array aligned with days (NaN where no value is assigned)
+    if how not in JOIN_POLICIES:
+        raise ValueError(f"Unsupported join policy: {how} (expected one of {sorted(JOIN_POLICIES)})")
+
+    days = _as_days(days)
+    out = np.full(len(days), np.nan)
+    values = np.asarray(values, dtype="float64")
+    valid = ~np.isnan(values)
+    if len(days) == 0 or not valid.any():
+        return out
+
+    starts, ends, values = _as_days(starts)[valid], _as_days(ends)[valid], values[valid]
+    order = np.argsort(starts, kind="stable")
+    starts, ends, values = starts[order], ends[order], values[order]
+    tolerance = np.timedelta64(int(tolerance_days or 0), "D")
+
+    # window containing each day (prev = last window starting on or before it)
+    prev = np.searchsorted(starts, days, side="right") - 1
+    has_prev = prev >= 0
+    prev_c = np.clip(prev, 0, None)
+    inside = has_prev & (days < ends[prev_c])
+    out[inside] = values[prev_c[inside]]
+
+    if how == "window":
+        return out
+
+    if how == "nearest":
+        nxt = prev + 1
+        has_next = nxt < len(starts)
+        nxt_c = np.clip(nxt, 0, len(starts) - 1)
+        # distance to the edge of the previous / next window (days outside both = gap)
+        far = np.timedelta64(np.iinfo(np.int64).max, "D")
+        d_prev = np.where(has_prev, days - (ends[prev_c] - DAY), far)
+        d_next = np.where(has_next, starts[nxt_c] - days, far)
+        use_next = d_next < d_prev
+        best = np.where(use_next, d_next, d_prev)
+        pick = np.where(use_next, nxt_c, prev_c)
+        fill = ~inside & (best <= tolerance) & (has_prev | has_next)
+        out[fill] = values[pick[fill]]
+        return out
+
+    # linear: interpolate between window midpoints (in days), bridging short gaps only
+    # midpoint of the days a window covers: [s, e) -> (s + e - 1) / 2
+    x = days.astype("int64").astype("float64")
+    xm = (starts.astype("int64") + ends.astype("int64") - 1) / 2.0
+    right = np.searchsorted(xm, x, side="right")
+    between = (right > 0) & (right < len(xm))
+    lo = np.clip(right - 1, 0, len(xm) - 1)
+    hi = np.clip(right, 0, len(xm) - 1)
+    gap = starts[hi] - ends[lo]
+    bridge = between & (gap <= tolerance)
+    interp = np.interp(x, xm, values)
+    out[bridge] = interp[bridge]
+    return out
@@ -0,0 +1,71 @@
+# Jakob Balkovec
+# Download Manifest
+
+# This module defines the DownloadManifest utility, a small per-station JSON record
+# of what RequestPipe last fetched for each year (ETag, Last-Modified, size and
+# content hash). It drives conditional GETs and lets unchanged years skip writes.
+
+import json
+import os
+import hashlib
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+def sha256_file(path, chunk_size=1 << 20):
+    # pre:  path points to an existing file
+    # post: returns the hex sha256 of the file contents
+    # desc: chunked so large raw files are never held in memory.
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DownloadManifest:
+    VERSION = 1
+
+    def __init__(self, path, station=None):
+        # pre:  path is where the manifest lives (may not exist yet)
+        # post: manifest loaded into memory (empty if missing or unreadable)
+        # desc: entries are keyed by year (as a string, JSON keys are strings).
+
+        self.path = Path(path)
+        self.station = station
+        self.entries = {}
+
+        if self.path.exists():
+            try:
+                with open(self.path) as f:
+                    data = json.load(f)
+                self.entries = data.get("years", {})
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def get(self, year):
+        # pre:  year is an int or str
+        # post: returns the manifest entry for year or None
+        return self.entries.get(str(year))
+
+    def update(self, year, **fields):
+        # pre:  fields are JSON-serializable (etag, last_modified, size, sha256, ...)
+        # post: entry for year is created/updated and stamped with checked_at
+        entry = self.entries.setdefault(str(year), {})
+        entry.update({k: v for k, v in fields.items() if v is not None})
+        entry["checked_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        return entry
+
+    def save(self):
+        # pre:  None
+        # post: manifest written to disk via temp file + rename (never half-written)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(
+                {"version": self.VERSION, "station": self.station,
+                 "years": dict(sorted(self.entries.items()))},
+                f, indent=2,
+            )
+        os.replace(tmp, self.path)
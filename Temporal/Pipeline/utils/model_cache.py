@@ -0,0 +1,107 @@
+# Jakob Balkovec
+# Model Cache
+
+# This module defines the ModelCache utility, an on-disk store of fitted imputation
+# models. Entries are keyed by a fingerprint of everything that determines the fit:
+# station, target column, feature list, hyperparameters, model library version and a
+# hash of the training rows. An unchanged input loads the saved model and only runs
+# prediction; any change to the data or the settings produces a new key (a refit).
+#
+# Models are saved in XGBoost's own format (portable across library versions), written
+# atomically, and evicted least-recently-used beyond max_entries.
+
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+
+def frame_digest(*frames):
+    # pre:  frames are DataFrames / Series
+    # post: hex sha256 of their values (row order matters, the index does not)
+    digest = hashlib.sha256()
+    for frame in frames:
+        if isinstance(frame, pd.Series):
+            frame = frame.to_frame()
+        digest.update(json.dumps([str(c) for c in frame.columns]).encode())
+        digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class ModelCache:
+    # bump when the training procedure changes for the same inputs (invalidates every entry)
+    VERSION = 1
+    SUFFIX = ".ubj"
+
+    def __init__(self, cache_dir, max_entries=64):
+        # pre:  cache_dir is a writable directory path (created on demand);
+        #       max_entries None = never evict
+        # post: cache ready
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()  # columns may be imputed concurrently
+
+    def key(self, station, column, features, params, X, y):
+        # pre:  params are JSON-serializable hyperparameters; X / y the training rows
+        # post: hex key that changes whenever the inputs or the settings change
+        try:
+            import xgboost
+            library = xgboost.__version__
+        except ImportError:
+            library = None
+
+        digest = hashlib.sha256()
+        digest.update(json.dumps(
+            {"station": station, "column": column, "features": list(features), "params": params,
+             "library": library, "version": self.VERSION},
+            sort_keys=True, default=str,
+        ).encode())
+        digest.update(frame_digest(X, y).encode())
+        return digest.hexdigest()[:24]
+
+    def _entry(self, station, column, key):
+        return self.cache_dir / f"{station}.{column}.{key}{self.SUFFIX}"
+
+    def load(self, station, column, key, model):
+        # pre:  model is an unfitted estimator exposing load_model()
+        # post: returns model loaded from the entry, or None (missing or unreadable)
+        entry = self._entry(station, column, key)
+        with self._lock:
+            try:
+                if not entry.exists():
+                    raise FileNotFoundError(entry)
+                model.load_model(entry)
+                os.utime(entry)  # recency for LRU eviction
+            except Exception:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return model
+
+    def store(self, station, column, key, model):
+        # pre:  model is fitted and exposes save_model()
+        # post: entry written atomically; least recently used entries beyond
+        #       max_entries are evicted
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entry = self._entry(station, column, key)
+        tmp = entry.with_name(f"{entry.stem}.tmp{self.SUFFIX}")  # save_model picks the format by suffix
+        model.save_model(tmp)
+        with self._lock:
+            os.replace(tmp, entry)
+            self.evict()
+
+    def evict(self):
+        # post: at most max_entries entries remain (newest by last use); returns removed count
+        if self.max_entries is None:
+            return 0
+        entries = [p for p in self.cache_dir.glob(f"*{self.SUFFIX}") if not p.stem.endswith(".tmp")]
+        entries.sort(key=lambda p: p.stat().st_mtime, reverse=True)
+        stale = entries[max(int(self.max_entries), 0):]
+        for path in stale:
+            path.unlink(missing_ok=True)
+        return len(stale)
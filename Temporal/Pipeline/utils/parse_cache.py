@@ -0,0 +1,74 @@
+# Jakob Balkovec
+# Parse Cache
+
+# This module defines the ParseCache utility, a content-addressed per-file cache of
+# parsed raw files. Entries are keyed by the raw file's sha256 plus the parse settings
+# that shape the output (product, col_indices, ...), and stored as Feather (Arrow IPC)
+# so an unchanged year loads with near-zero CPU instead of being re-tokenized.
+
+import json
+import os
+import hashlib
+from pathlib import Path
+
+import pandas as pd
+
+from utils.manifest import sha256_file
+
+# Feather needs pyarrow; fall back to pickle so the cache still works without it
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+
+class ParseCache:
+    # bump when parser output changes for the same inputs (invalidates every entry)
+    VERSION = 1
+
+    def __init__(self, cache_dir):
+        # pre:  cache_dir is a writable directory path (created on demand)
+        # post: cache ready
+        self.cache_dir = Path(cache_dir)
+        self.suffix = ".feather" if feather is not None else ".pkl"
+
+    def key(self, file_path, **params):
+        # pre:  file_path exists, params are JSON-serializable parse settings
+        # post: returns a hex key that changes whenever the bytes or the settings change
+        digest = hashlib.sha256()
+        digest.update(sha256_file(file_path).encode())
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+        digest.update(str(self.VERSION).encode())
+        return digest.hexdigest()[:24]
+
+    def _entry(self, file_path, key):
+        return self.cache_dir / f"{Path(file_path).stem}.{key}{self.suffix}"
+
+    def load(self, file_path, key):
+        # post: returns the cached DataFrame or None (missing or unreadable entry)
+        entry = self._entry(file_path, key)
+        if not entry.exists():
+            return None
+        try:
+            if feather is not None:
+                return feather.read_feather(entry)
+            return pd.read_pickle(entry)
+        except Exception:
+            return None
+
+    def store(self, file_path, key, df):
+        # pre:  df has string column names and a default RangeIndex
+        # post: entry written atomically; older entries for the same raw file are evicted
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entry = self._entry(file_path, key)
+        tmp = entry.with_name(entry.name + ".tmp")
+
+        if feather is not None:
+            feather.write_feather(df, tmp)
+        else:
+            df.to_pickle(tmp)
+        os.replace(tmp, entry)
+
+        for stale in self.cache_dir.glob(f"{Path(file_path).stem}.*{self.suffix}"):
+            if stale != entry:
+                stale.unlink(missing_ok=True)
@@ -0,0 +1,190 @@
+# Jakob Balkovec
+# QC Engine
+
+# This module defines the QCEngine utility, which evaluates rule-driven quality checks
+# (physical ranges, step/spike tests, flatlines, cross-column consistency) over a whole
+# station frame with vectorized numpy operations and packs the outcome into one uint32
+# bitmask per row. Rows are never dropped: bit i set == rule i failed on that row.
+#
+# Rules live in a YAML file (see qc_rules.yaml):
+#
+#   rules:
+#     - name: air_temp_range
+#       type: range            # value outside [min, max]
+#       columns: [air_temp_max, air_temp_min]
+#       min: -60
+#       max: 60
+#     - name: sm_step
+#       type: step             # |x[t] - x[t-1]| > max_step
+#       columns: [soil_moisture_5cm]
+#       max_step: 0.25
+#     - name: sm_spike
+#       type: spike            # x[t] jumps away from both neighbours by > threshold
+#       columns: [soil_moisture_5cm]
+#       threshold: 0.1
+#     - name: sm_flatline
+#       type: flatline         # >= window consecutive values within tolerance
+#       columns: [soil_moisture_5cm]
+#       window: 10
+#       tolerance: 0.0
+#     - name: air_temp_order
+#       type: consistency      # greater column < lesser column
+#       greater: air_temp_max
+#       lesser: air_temp_min
+#
+# Temporal rules compare consecutive rows of the same station (frame order by station, date).
+
+import numpy as np
+import pandas as pd
+import yaml
+from pathlib import Path
+
+RULE_TYPES = {"range", "step", "spike", "flatline", "consistency"}
+MAX_RULES = 32
+
+
+def load_rules(path):
+    # pre:  path is a YAML file with a top-level `rules:` list
+    # post: returns the list of rule dicts
+    with open(Path(path)) as f:
+        return (yaml.safe_load(f) or {}).get("rules", [])
+
+
+class QCEngine:
+    MASK_COLUMN = "qc_mask"
+
+    def __init__(self, rules):
+        # pre:  rules is a list of rule dicts (see module header), at most 32
+        # post: engine ready; self.bits maps rule name -> bit index
+        if len(rules) > MAX_RULES:
+            raise ValueError(f"QC supports at most {MAX_RULES} rules (got {len(rules)})")
+
+        self.rules = []
+        self.bits = {}
+        for bit, rule in enumerate(rules):
+            kind = rule.get("type")
+            name = rule.get("name", f"{kind}_{bit}")
+            if kind not in RULE_TYPES:
+                raise ValueError(f"Unknown QC rule type for '{name}': {kind} (expected one of {sorted(RULE_TYPES)})")
+            if name in self.bits:
+                raise ValueError(f"Duplicate QC rule name: {name}")
+            self.rules.append({**rule, "name": name, "bit": bit})
+            self.bits[name] = bit
+
+    @classmethod
+    def from_yaml(cls, path):
+        return cls(load_rules(path))
+
+    # ---------------------------------------------------------------------
+    # rule kernels: each returns a bool array (True = failed) over the rows
+    # ---------------------------------------------------------------------
+
+    @staticmethod
+    def _values(df, col):
+        return pd.to_numeric(df[col], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+    def _range(self, df, col, rule):
+        x = self._values(df, col)
+        lo, hi = rule.get("min", -np.inf), rule.get("max", np.inf)
+        with np.errstate(invalid="ignore"):
+            return (x < lo) | (x > hi)
+
+    def _step(self, df, col, rule, same):
+        x = self._values(df, col)
+        d = np.abs(np.diff(x, prepend=np.nan))
+        with np.errstate(invalid="ignore"):
+            return same & (d > rule["max_step"])
+
+    def _spike(self, df, col, rule, same):
+        x = self._values(df, col)
+        prev_d = x - np.roll(x, 1)
+        next_d = x - np.roll(x, -1)
+        has_next = np.roll(same, -1)
+        has_next[-1] = False
+        t = rule["threshold"]
+        with np.errstate(invalid="ignore"):
+            # away from both neighbours in the same direction
+            up = (prev_d > t) & (next_d > t)
+            down = (prev_d < -t) & (next_d < -t)
+        return same & has_next & (up | down)
+
+    def _flatline(self, df, col, rule, same):
+        x = self._values(df, col)
+        d = np.abs(np.diff(x, prepend=np.nan))
+        with np.errstate(invalid="ignore"):
+            flat = same & (d <= rule.get("tolerance", 0.0))
+        # run-length encode stretches of "equal to previous" and flag every row of runs
+        # that span >= window values (window - 1 flat steps)
+        run_id = np.cumsum(~flat)
+        run_len = np.bincount(run_id)
+        return run_len[run_id] >= rule["window"]
+
+    def _consistency(self, df, rule):
+        greater, lesser = self._values(df, rule["greater"]), self._values(df, rule["lesser"])
+        with np.errstate(invalid="ignore"):
+            return greater < lesser
+
+    def evaluate(self, df):
+        # pre:  df sorted by (station_id, date) when temporal rules are used
+        # post: returns (uint32 mask array, {rule name: failed row count}); rules whose
+        #       columns are missing are skipped (count None)
+        n = len(df)
+        mask = np.zeros(n, dtype=np.uint32)
+        counts = {}
+        if n == 0:
+            return mask, counts
+
+        # row i continues the series of row i-1 (same station)
+        same = np.ones(n, dtype=bool)
+        same[0] = False
+        if "station_id" in df.columns:
+            sid = df["station_id"].to_numpy()
+            same[1:] = sid[1:] == sid[:-1]
+
+        for rule in self.rules:
+            kind = rule["type"]
+            if kind == "consistency":
+                if not {rule["greater"], rule["lesser"]} <= set(df.columns):
+                    counts[rule["name"]] = None
+                    continue
+                failed = self._consistency(df, rule)
+            else:
+                cols = [c for c in rule.get("columns", []) if c in df.columns]
+                if not cols:
+                    counts[rule["name"]] = None
+                    continue
+                failed = np.zeros(n, dtype=bool)
+                for col in cols:
+                    if kind == "range":
+                        failed |= self._range(df, col, rule)
+                    else:
+                        failed |= getattr(self, f"_{kind}")(df, col, rule, same)
+
+            mask |= failed.astype(np.uint32) << np.uint32(rule["bit"])
+            counts[rule["name"]] = int(failed.sum())
+
+        return mask, counts
+
+    def apply(self, df):
+        # post: returns df with the uint32 qc_mask column added (rows untouched);
+        #       the bit legend is kept in df.attrs["qc_bits"]
+        mask, counts = self.evaluate(df)
+        df[self.MASK_COLUMN] = mask
+        df.attrs["qc_bits"] = dict(self.bits)
+        return df, counts
+
+    def mask_for(self, names=None):
+        # post: uint32 with the bits of the named rules set (None = every rule)
+        names = self.bits if names is None else names
+        out = 0
+        for name in names:
+            out |= 1 << self.bits[name]
+        return np.uint32(out)
+
+
+def passes(df, bits=None):
+    # pre:  df carries qc_mask; bits is a uint32 from QCEngine.mask_for (None = all bits)
+    # post: boolean Series, True where none of the selected rules failed
+    mask = df[QCEngine.MASK_COLUMN].to_numpy(dtype=np.uint32)
+    selected = np.uint32(0xFFFFFFFF) if bits is None else np.uint32(bits)
+    return pd.Series((mask & selected) == 0, index=df.index)
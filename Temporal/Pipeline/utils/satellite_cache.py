@@ -0,0 +1,264 @@
+# Jakob Balkovec
+# Satellite Cache
+
+# This module defines the SatelliteCache utility, an embedded SQLite store (WAL mode)
+# for SatellitePipe results. Values live on a canonical calendar grid, independent of
+# how the ground data happens to be grouped into weeks:
+#
+#   series    one row per (product, lat, lon, buffer_m, day): the scaled value of the
+#             product's native period starting that day (a day for MOD11A1 / IMERG, the
+#             16-day composite start for MOD13Q1)
+#   coverage  day ranges [start, end) already fetched per (product, lat, lon, buffer_m);
+#             a covered day without a series row had no valid pixels
+#   windows   legacy per-station week records ({start}_{end} keys) imported once from
+#             the old JSON caches, served only on an exact key match
+#
+# Results are committed as each fetch completes, and WAL + a busy timeout lets
+# concurrent runs for different stations write to the same file safely.
+
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    product  TEXT NOT NULL,
+    lat      REAL NOT NULL,
+    lon      REAL NOT NULL,
+    buffer_m REAL NOT NULL,
+    day      TEXT NOT NULL,
+    value    REAL,
+    PRIMARY KEY (product, lat, lon, buffer_m, day)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS coverage (
+    product    TEXT NOT NULL,
+    lat        REAL NOT NULL,
+    lon        REAL NOT NULL,
+    buffer_m   REAL NOT NULL,
+    start      TEXT NOT NULL,
+    end        TEXT NOT NULL,
+    fetched_at TEXT NOT NULL,
+    PRIMARY KEY (product, lat, lon, buffer_m, start, end)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS windows (
+    station  TEXT NOT NULL,
+    product  TEXT NOT NULL,
+    period   TEXT NOT NULL,
+    buffer_m REAL NOT NULL,
+    value    REAL,
+    PRIMARY KEY (station, product, period, buffer_m)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS imports (
+    path        TEXT PRIMARY KEY,
+    station     TEXT NOT NULL,
+    rows        INTEGER NOT NULL,
+    imported_at TEXT NOT NULL
+);
+"""
+
+COORD_DECIMALS = 5  # ~1 m; station coordinates are rounded onto this grid for keys
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _day(value):
+    return pd.Timestamp(value).strftime("%Y-%m-%d")
+
+
+def location_key(lat, lon):
+    # post: (lat, lon) rounded onto the key grid
+    return round(float(lat), COORD_DECIMALS), round(float(lon), COORD_DECIMALS)
+
+
+# ---------------------------------------------------------------------
+# day-range arithmetic (ranges are [start, end) with day resolution)
+# ---------------------------------------------------------------------
+
+def merge_ranges(ranges):
+    # post: sorted, non-overlapping, non-adjacent [(start, end)] as Timestamps
+    out = []
+    for start, end in sorted((pd.Timestamp(s), pd.Timestamp(e)) for s, e in ranges):
+        if start >= end:
+            continue
+        if out and start <= out[-1][1]:
+            out[-1] = (out[-1][0], max(out[-1][1], end))
+        else:
+            out.append((start, end))
+    return out
+
+
+def subtract_ranges(needed, covered):
+    # post: the parts of `needed` not inside any `covered` range (merged, sorted)
+    out = []
+    covered = merge_ranges(covered)
+    for start, end in merge_ranges(needed):
+        cursor = start
+        for c_start, c_end in covered:
+            if c_end <= cursor or c_start >= end:
+                continue
+            if c_start > cursor:
+                out.append((cursor, c_start))
+            cursor = max(cursor, c_end)
+            if cursor >= end:
+                break
+        if cursor < end:
+            out.append((cursor, end))
+    return out
+
+
+def covered_mask(starts, ends, covered):
+    # pre:  starts/ends are datetime-like arrays of the same length
+    # post: bool array, True where [start, end) lies inside one covered range
+    merged = merge_ranges(covered)
+    if not merged:
+        return np.zeros(len(starts), dtype=bool)
+    c_start = np.array([s for s, _ in merged], dtype="datetime64[ns]")
+    c_end = np.array([e for _, e in merged], dtype="datetime64[ns]")
+    starts = np.asarray(starts, dtype="datetime64[ns]")
+    ends = np.asarray(ends, dtype="datetime64[ns]")
+    idx = np.searchsorted(c_start, starts, side="right") - 1
+    ok = idx >= 0
+    idx = np.clip(idx, 0, None)
+    return ok & (c_end[idx] >= ends)
+
+
+def split_ranges(ranges, freq):
+    # post: ranges cut at every boundary of `freq`: a pandas frequency (e.g. "YS",
+    #       "W-MON") or a callable (start, end) -> boundary Timestamps
+    out = []
+    for start, end in merge_ranges(ranges):
+        bounds = freq(start, end) if callable(freq) else pd.date_range(start, end, freq=freq)
+        cuts = [t for t in bounds if start < t < end]
+        edges = [start, *cuts, end]
+        out.extend(zip(edges[:-1], edges[1:]))
+    return out
+
+
+class SatelliteCache:
+    def __init__(self, db_path, timeout=30.0):
+        # pre:  db_path is a writable file path (parent created on demand)
+        # post: schema ready; connections are opened per thread
+        self.db_path = Path(db_path)
+        self.timeout = timeout
+        self._local = threading.local()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self):
+        # one connection per thread (sqlite3 connections are not shareable across threads)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ---------------------------------------------------------------------
+    # canonical series
+    # ---------------------------------------------------------------------
+
+    def coverage(self, product, lat, lon, buffer_m):
+        # post: merged [(start, end)] Timestamps already fetched for the product/location
+        lat, lon = location_key(lat, lon)
+        rows = self._conn().execute(
+            "SELECT start, end FROM coverage WHERE product = ? AND lat = ? AND lon = ? AND buffer_m = ?",
+            (product, lat, lon, float(buffer_m)),
+        ).fetchall()
+        return merge_ranges(rows)
+
+    def series(self, product, lat, lon, buffer_m, start=None, end=None):
+        # post: [(YYYY-MM-DD, value)] sorted by day, within [start, end) when given
+        lat, lon = location_key(lat, lon)
+        sql = "SELECT day, value FROM series WHERE product = ? AND lat = ? AND lon = ? AND buffer_m = ?"
+        params = [product, lat, lon, float(buffer_m)]
+        if start is not None:
+            sql += " AND day >= ?"
+            params.append(_day(start))
+        if end is not None:
+            sql += " AND day < ?"
+            params.append(_day(end))
+        return self._conn().execute(sql + " ORDER BY day", params).fetchall()
+
+    def put_series(self, product, lat, lon, buffer_m, start, end, rows):
+        # pre:  rows is [(YYYY-MM-DD, value)] for native periods starting in [start, end)
+        # post: values and the covered range committed in one transaction
+        lat, lon = location_key(lat, lon)
+        key = (product, lat, lon, float(buffer_m))
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO series (product, lat, lon, buffer_m, day, value) VALUES (?, ?, ?, ?, ?, ?)",
+                [(*key, _day(day), value) for day, value in rows],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO coverage (product, lat, lon, buffer_m, start, end, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (*key, _day(start), _day(end), _now()),
+            )
+        return len(rows)
+
+    # ---------------------------------------------------------------------
+    # legacy week records
+    # ---------------------------------------------------------------------
+
+    def load_windows(self, station, products, buffer_m):
+        # post: {period: {product: value}} legacy records that hold every product
+        rows = self._conn().execute(
+            "SELECT period, product, value FROM windows WHERE station = ? AND buffer_m = ?",
+            (station, float(buffer_m)),
+        ).fetchall()
+
+        out = {}
+        for period, product, value in rows:
+            out.setdefault(period, {})[product] = value
+        return {period: rec for period, rec in out.items() if all(p in rec for p in products)}
+
+    def import_json(self, json_path, station, buffer_m):
+        # pre:  json_path is a legacy {period: {product: value}} cache file
+        # post: its entries are in the windows table; returns the number of rows
+        #       imported, or None when the file was imported before or does not exist
+        json_path = Path(json_path)
+        if not json_path.exists():
+            return None
+
+        key = str(json_path.resolve())
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM imports WHERE path = ?", (key,)).fetchone():
+            return None
+
+        with open(json_path) as f:
+            legacy = json.load(f)
+
+        rows = [
+            (station, product, period, float(buffer_m), value)
+            for period, rec in legacy.items()
+            for product, value in (rec or {}).items()
+        ]
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO windows (station, product, period, buffer_m, value) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.execute(
+                "INSERT INTO imports (path, station, rows, imported_at) VALUES (?, ?, ?, ?)",
+                (key, station, len(rows), _now()),
+            )
+        return len(rows)
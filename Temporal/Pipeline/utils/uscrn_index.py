@@ -0,0 +1,152 @@
+# Jakob Balkovec
+# USCRN Directory Index
+
+# This module defines the USCRNIndex utility, which reads the NCEI per-year directory
+# listings (<base_url>/<year>/) once, caches them locally with a TTL and answers
+# "which station-years actually exist?" so RequestPipe never asks for missing files.
+
+import re
+import json
+import os
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from utils.logger import get_logger
+
+
+class USCRNIndex:
+    FILE_PREFIX = "CRND0103"
+    CACHE_DIR = "data/cache/uscrn_index"
+
+    def __init__(self, base_url, file_prefix=None, cache_dir=None, ttl_hours=24, timeout=20, session=None):
+        # pre:  base_url is a USCRN product root (e.g. .../products/daily01)
+        # post: index ready; listings are fetched lazily and cached as JSON per year
+        # desc: ttl_hours controls how long a cached listing is trusted before re-fetching.
+
+        self.base_url = base_url.rstrip("/")
+        self.file_prefix = file_prefix or self.FILE_PREFIX
+        self.cache_dir = Path(cache_dir or self.CACHE_DIR)
+        self.ttl_s = float(ttl_hours) * 3600
+        self.timeout = timeout
+        self.session = session or requests.Session()
+
+        self.pattern = re.compile(
+            rf'href="(?:[^"]*/)?{re.escape(self.file_prefix)}-(?P<year>\d{{4}})-(?P<station>[A-Za-z0-9_]+)\.txt"'
+        )
+        # cache files are namespaced by product root so daily/hourly listings never collide
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", self.base_url.split("://")[-1]).strip("_")
+        self._slug = slug[-60:]
+        self._listings = {}
+
+        self.logger = get_logger().getChild("uscrn_index")
+
+    def _cache_file(self, year):
+        return self.cache_dir / f"{self._slug}_{year}.json"
+
+    def _read_cache(self, year):
+        # post: returns (stations, age_s) or (None, None) if no usable cache
+        path = self._cache_file(year)
+        if not path.exists():
+            return None, None
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            return data["stations"], time.time() - data["fetched_at"]
+        except (OSError, ValueError, KeyError):
+            return None, None
+
+    def _write_cache(self, year, stations):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._cache_file(year)
+        tmp = path.with_suffix(".json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"base_url": self.base_url, "year": year, "fetched_at": time.time(), "stations": stations}, f)
+        os.replace(tmp, path)
+
+    def listing(self, year):
+        # pre:  year is an int
+        # post: returns sorted list of station names with a file for `year`,
+        #       or None if the listing is unknown (fetch failed and nothing cached)
+        # desc: fresh cache -> no request; stale/missing cache -> one GET of <base_url>/<year>/.
+        #       A 404 listing means the year was not published and is cached as empty.
+
+        if year in self._listings:
+            return self._listings[year]
+
+        cached, age = self._read_cache(year)
+        if cached is not None and age < self.ttl_s:
+            self._listings[year] = cached
+            return cached
+
+        url = f"{self.base_url}/{year}/"
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            if response.status_code == 404:
+                stations = []
+            else:
+                response.raise_for_status()
+                stations = sorted({m["station"] for m in self.pattern.finditer(response.text) if int(m["year"]) == year})
+            self._write_cache(year, stations)
+            self.logger.debug(f"Indexed {url}: {len(stations)} station files")
+        except Exception as e:
+            if cached is not None:
+                self.logger.warning(f"Listing {url} failed ({e}) — using stale cache.")
+                stations = cached
+            else:
+                self.logger.warning(f"Listing {url} failed ({e}) — year {year} left unindexed.")
+                stations = None
+
+        self._listings[year] = stations
+        return stations
+
+    def refresh(self, years, workers=1):
+        # pre:  years is an iterable of ints
+        # post: listings for every year loaded (from cache or network)
+        # desc: fetches stale listings concurrently over the shared session.
+
+        years = list(years)
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(self.listing, years))
+        else:
+            for year in years:
+                self.listing(year)
+        return {year: self._listings.get(year) for year in years}
+
+    def available_years(self, station, years, workers=1):
+        # pre:  station is a USCRN station code (e.g. WA_Spokane_17_SSW)
+        # post: returns the subset of `years` whose listing contains the station;
+        #       years with an unknown listing are kept so they are still attempted
+        listings = self.refresh(years, workers=workers)
+        return [y for y, stations in listings.items() if stations is None or station in stations]
+
+    def stations(self, years, prefix="", workers=1):
+        # pre:  years is an iterable of ints, prefix filters station codes (e.g. "WA_")
+        # post: returns {station: [years available]} across all indexed years
+        found = {}
+        for year, stations in self.refresh(years, workers=workers).items():
+            for station in stations or []:
+                if station.startswith(prefix):
+                    found.setdefault(station, []).append(year)
+        return dict(sorted(found.items()))
+
+
+# [TEST]
+if __name__ == "__main__":
+    # usage: python -m utils.uscrn_index [prefix]   e.g. WA_
+    import sys
+    from utils.config import load_config
+
+    prefix = sys.argv[1] if len(sys.argv) > 1 else "WA_"
+    req_cfg = next(
+        s["request"] for s in load_config()["stations"].values() if s["request"].get("base_url")
+    )
+    index = USCRNIndex(
+        req_cfg["base_url"],
+        cache_dir=req_cfg.get("index_cache_dir"),
+        ttl_hours=req_cfg.get("index_ttl_hours", 24),
+    )
+    years = range(req_cfg["start_year"], req_cfg["end_year"] + 1)
+    for station, found in index.stations(years, prefix=prefix, workers=8).items():
+        print(f"{station:40s} {found[0]}-{found[-1]} ({len(found)} years)")
@@ -0,0 +1,297 @@
+# Jakob Balkovec
+# USCRN Products
+
+# This module defines the registry of supported NOAA USCRN products (daily01,
+# hourly02, subhourly01): their file naming, documented column layouts and the
+# rules used to aggregate sub-daily records to hourly or daily resolution in
+# bounded-memory chunks.
+
+import numpy as np
+import pandas as pd
+
+# Column layouts follow the NCEI product READMEs (0-based field positions).
+DAILY01_COLUMNS = [
+    "station_id", "date", "crx_vn", "longitude", "latitude",
+    "air_temp_max", "air_temp_min", "air_temp_mean", "air_temp_avg",
+    "precipitation", "solar_radiation",
+    "sur_temp_type", "sur_temp_max", "sur_temp_min", "sur_temp_avg",
+    "rh_max", "rh_min", "rh_mean",
+    "soil_moisture_5cm", "soil_moisture_10cm", "soil_moisture_20cm", "soil_moisture_50cm", "soil_moisture_100cm",
+    "soil_temp_5cm", "soil_temp_10cm", "soil_temp_20cm", "soil_temp_50cm", "soil_temp_100cm",
+]
+
+HOURLY02_COLUMNS = [
+    "station_id", "utc_date", "utc_time", "lst_date", "lst_time", "crx_vn", "longitude", "latitude",
+    "air_temp_calc", "air_temp_avg", "air_temp_max", "air_temp_min",
+    "precipitation",
+    "solar_radiation", "solar_radiation_flag",
+    "solar_radiation_max", "solar_radiation_max_flag",
+    "solar_radiation_min", "solar_radiation_min_flag",
+    "sur_temp_type", "sur_temp_avg", "sur_temp_avg_flag",
+    "sur_temp_max", "sur_temp_max_flag", "sur_temp_min", "sur_temp_min_flag",
+    "rh_mean", "rh_mean_flag",
+    "soil_moisture_5cm", "soil_moisture_10cm", "soil_moisture_20cm", "soil_moisture_50cm", "soil_moisture_100cm",
+    "soil_temp_5cm", "soil_temp_10cm", "soil_temp_20cm", "soil_temp_50cm", "soil_temp_100cm",
+]
+
+SUBHOURLY01_COLUMNS = [
+    "station_id", "utc_date", "utc_time", "lst_date", "lst_time", "crx_vn", "longitude", "latitude",
+    "air_temp", "precipitation",
+    "solar_radiation", "solar_radiation_flag",
+    "sur_temp", "sur_temp_type", "sur_temp_flag",
+    "rh", "rh_flag",
+    "soil_moisture_5cm", "soil_temp_5cm",
+    "wetness", "wetness_flag",
+    "wind_1_5", "wind_flag",
+]
+
+# Sub-daily -> coarser resolution: {output column: (source column, reducer)}.
+# reducers: sum | mean | max | min | first
+_HOURLY02_TO_DAILY = {
+    "crx_vn": ("crx_vn", "first"),
+    "longitude": ("longitude", "first"),
+    "latitude": ("latitude", "first"),
+    "air_temp_max": ("air_temp_max", "max"),
+    "air_temp_min": ("air_temp_min", "min"),
+    "air_temp_avg": ("air_temp_avg", "mean"),
+    "precipitation": ("precipitation", "sum"),
+    "solar_radiation": ("solar_radiation", "mean"),
+    "sur_temp_type": ("sur_temp_type", "first"),
+    "sur_temp_max": ("sur_temp_max", "max"),
+    "sur_temp_min": ("sur_temp_min", "min"),
+    "sur_temp_avg": ("sur_temp_avg", "mean"),
+    "rh_max": ("rh_mean", "max"),
+    "rh_min": ("rh_mean", "min"),
+    "rh_mean": ("rh_mean", "mean"),
+    **{f"soil_moisture_{d}cm": (f"soil_moisture_{d}cm", "mean") for d in (5, 10, 20, 50, 100)},
+    **{f"soil_temp_{d}cm": (f"soil_temp_{d}cm", "mean") for d in (5, 10, 20, 50, 100)},
+}
+
+_SUBHOURLY01_TO_COARSE = {
+    "crx_vn": ("crx_vn", "first"),
+    "longitude": ("longitude", "first"),
+    "latitude": ("latitude", "first"),
+    "air_temp_max": ("air_temp", "max"),
+    "air_temp_min": ("air_temp", "min"),
+    "air_temp_avg": ("air_temp", "mean"),
+    "precipitation": ("precipitation", "sum"),
+    "solar_radiation": ("solar_radiation", "mean"),
+    "sur_temp_type": ("sur_temp_type", "first"),
+    "sur_temp_max": ("sur_temp", "max"),
+    "sur_temp_min": ("sur_temp", "min"),
+    "sur_temp_avg": ("sur_temp", "mean"),
+    "rh_max": ("rh", "max"),
+    "rh_min": ("rh", "min"),
+    "rh_mean": ("rh", "mean"),
+    "soil_moisture_5cm": ("soil_moisture_5cm", "mean"),
+    "soil_temp_5cm": ("soil_temp_5cm", "mean"),
+    "wetness": ("wetness", "mean"),
+    "wind_1_5": ("wind_1_5", "mean"),
+}
+
+PRODUCTS = {
+    "daily01": {
+        "file_prefix": "CRND0103",
+        "output_prefix": "uscrn_",
+        "columns": DAILY01_COLUMNS,
+        "interval": None,  # one row per LST day, `date` column is already the day
+        "sentinels": [-9999.0, -99.0],  # soil moisture uses -99.000
+        "aggregations": {},
+    },
+    "hourly02": {
+        "file_prefix": "CRNH0203",
+        "output_prefix": "uscrnh_",
+        "columns": HOURLY02_COLUMNS,
+        "interval": pd.Timedelta(hours=1),
+        "sentinels": [-9999.0, -99.0],  # soil moisture uses -99.000
+        "aggregations": {"daily": _HOURLY02_TO_DAILY},
+    },
+    "subhourly01": {
+        "file_prefix": "CRNS0101-05",
+        "output_prefix": "uscrns_",
+        "columns": SUBHOURLY01_COLUMNS,
+        "interval": pd.Timedelta(minutes=5),
+        "sentinels": [-9999.0, -99.0],
+        "aggregations": {"daily": _SUBHOURLY01_TO_COARSE, "hourly": _SUBHOURLY01_TO_COARSE},
+    },
+}
+
+AGGREGATE_FREQ = {"daily": "D", "hourly": "h"}
+
+# W/m^2 (mean) -> MJ/m^2/day, matching SOLARAD_DAILY in daily01
+SOLAR_W_TO_MJ_DAY = 86400 / 1e6
+
+
+# Raw on-disk types by documented field name; everything not listed is a float measurement.
+RAW_DTYPES = {
+    "station_id": "int64",  # WBANNO
+    "date": "int32",  # YYYYMMDD
+    "utc_date": "int32",
+    "lst_date": "int32",
+    "utc_time": "int16",  # HHMM
+    "lst_time": "int16",
+    "sur_temp_type": "str",  # R / C / U
+}
+DATE_FIELDS = {"date", "utc_date", "lst_date"}
+
+
+def raw_dtype(column):
+    # pre:  column is a documented field name
+    # post: returns the pandas dtype used when reading that field
+    if column in RAW_DTYPES:
+        return RAW_DTYPES[column]
+    if column.endswith("_flag"):
+        return "Int8"
+    return "float64"
+
+
+def get_product(name):
+    # pre:  name is a product key (daily01 | hourly02 | subhourly01)
+    # post: returns the product spec dict
+    if name not in PRODUCTS:
+        raise ValueError(f"Unsupported USCRN product: {name} (expected one of {sorted(PRODUCTS)})")
+    return PRODUCTS[name]
+
+
+def default_col_indices(name):
+    # post: returns {column name: 0-based index} for the full documented layout
+    return {col: idx for idx, col in enumerate(get_product(name)["columns"])}
+
+
+def ymd_to_datetime(values):
+    # pre:  values is array-like of YYYYMMDD integers (NaN allowed)
+    # post: returns datetime64 ndarray (NaT where the value is missing or not a date)
+    # desc: pure integer arithmetic, no per-row string formatting/parsing.
+
+    v = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype="float64")
+    ok = ~np.isnan(v)
+    iv = np.where(ok, v, 19700101).astype("int64")
+    y, md = np.divmod(iv, 10000)
+    m, d = np.divmod(md, 100)
+    ok &= (m >= 1) & (m <= 12) & (d >= 1) & (d <= 31)
+    y, m, d = np.where(ok, y, 1970), np.where(ok, m, 1), np.where(ok, d, 1)
+
+    out = (y - 1970).astype("datetime64[Y]").astype("datetime64[M]") + (m - 1).astype("timedelta64[M]")
+    out = out.astype("datetime64[D]") + (d - 1).astype("timedelta64[D]")
+    out = out.astype("datetime64[ns]")
+    out[~ok] = np.datetime64("NaT")
+    return out
+
+
+def add_timestamp(df, name):
+    # pre:  df holds one chunk of a parsed product file with named columns
+    # post: df["date"] is a datetime; for sub-daily products it is the START of the
+    #       observation interval in local standard time
+    # desc: USCRN stamps sub-daily records with the interval END (LST_TIME, HHMM, where
+    #       0000 closes the previous day). Shifting to the start makes .floor("D"/"h")
+    #       group every interval with the day/hour it was observed in.
+
+    spec = get_product(name)
+    if spec["interval"] is None:
+        return df
+
+    if "lst_date" not in df.columns or "lst_time" not in df.columns:
+        raise ValueError(f"{name} parsing requires lst_date and lst_time columns")
+
+    day = ymd_to_datetime(df["lst_date"])
+    hhmm = pd.to_numeric(df["lst_time"], errors="coerce").to_numpy(dtype="float64")
+    offset = pd.to_timedelta((hhmm // 100) * 60 + hhmm % 100, unit="m")
+    df["date"] = pd.DatetimeIndex(day) + offset - spec["interval"]
+    return df
+
+
+class ChunkAggregator:
+    # Streaming group-by over (station_id, period). Each chunk is reduced to partial
+    # sums/counts/extremes right away, so memory scales with the number of output
+    # periods instead of the number of raw sub-daily rows.
+
+    def __init__(self, product, target):
+        # pre:  product supports aggregation to target ("daily" | "hourly")
+        # post: empty aggregator
+        spec = get_product(product)
+        if target not in spec["aggregations"]:
+            raise ValueError(f"{product} cannot be aggregated to '{target}'")
+
+        self.product = product
+        self.target = target
+        self.freq = AGGREGATE_FREQ[target]
+        self.rules = spec["aggregations"][target]
+        self._partials = []
+
+        # every (source column, primitive reducer) pair needed by the rules
+        self._needed = {}
+        for src, how in self.rules.values():
+            for fn in (("sum", "count") if how == "mean" else (how,)):
+                self._needed.setdefault(fn, set()).add(src)
+
+    @staticmethod
+    def _reduce(grouped, fn, cols):
+        if fn == "sum":
+            return grouped[cols].sum(min_count=1)
+        return getattr(grouped[cols], fn)()
+
+    def add(self, chunk):
+        # pre:  chunk has station_id, date (interval start) and source columns
+        # post: chunk folded into a compact partial aggregate
+        if chunk.empty:
+            return
+        keys = [chunk["station_id"], chunk["date"].dt.floor(self.freq).rename("period")]
+        grouped = chunk.groupby(keys, sort=False)
+        parts = []
+        for fn, srcs in self._needed.items():
+            cols = sorted(c for c in srcs if c in chunk.columns)
+            if cols:
+                parts.append(self._reduce(grouped, fn, cols).add_suffix(f"|{fn}"))
+        if parts:
+            self._partials.append(pd.concat(parts, axis=1))
+
+    def merge(self, other):
+        # pre:  other is a ChunkAggregator for the same product/target
+        # post: other's partial aggregates appended to this one
+        self._partials.extend(other._partials)
+
+    def partial_frame(self):
+        # post: returns all partial aggregates as one flat DataFrame (for caching)
+        if not self._partials:
+            return pd.DataFrame()
+        return pd.concat(self._partials).reset_index()
+
+    def add_partial_frame(self, frame):
+        # pre:  frame was produced by partial_frame() for the same product/target
+        # post: frame's partial aggregates appended
+        if not frame.empty:
+            self._partials.append(frame.set_index(["station_id", "period"]))
+
+    def result(self):
+        # post: returns one row per (station_id, period) with the rule output columns;
+        #       `date` holds the period start
+        if not self._partials:
+            return pd.DataFrame()
+
+        combined = pd.concat(self._partials)
+        grouped = combined.groupby(level=[0, 1], sort=True)
+        merged = {}
+        for col in combined.columns:
+            fn = col.rsplit("|", 1)[1]
+            merge_fn = "sum" if fn in ("sum", "count") else fn
+            merged[col] = self._reduce(grouped, merge_fn, [col])[col]
+        merged = pd.DataFrame(merged)
+
+        out = pd.DataFrame(index=merged.index)
+        for name, (src, how) in self.rules.items():
+            if how == "mean":
+                if f"{src}|sum" in merged:
+                    count = merged[f"{src}|count"]
+                    out[name] = (merged[f"{src}|sum"] / count.where(count > 0)).astype(float)
+            elif f"{src}|{how}" in merged:
+                out[name] = merged[f"{src}|{how}"]
+
+        if self.target == "daily":
+            if "solar_radiation" in out:
+                out["solar_radiation"] = out["solar_radiation"] * SOLAR_W_TO_MJ_DAY
+            if {"air_temp_max", "air_temp_min"} <= set(out.columns):
+                # TEMP_DAILY_MEAN in daily01 is (max + min) / 2
+                out["air_temp_mean"] = (out["air_temp_max"] + out["air_temp_min"]) / 2
+
+        out = out.reset_index().rename(columns={"period": "date"})
+        return out
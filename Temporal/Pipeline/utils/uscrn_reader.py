@@ -0,0 +1,102 @@
+# Jakob Balkovec
+# USCRN Reader
+
+# This module defines the typed reader for USCRN product files. Instead of letting
+# pandas' python engine infer every column and patching -9999 afterwards, the reader
+# builds explicit names/dtypes/NA tokens from the documented layout in
+# utils.uscrn_products, so the C parser emits final dtypes in one pass.
+
+from functools import lru_cache
+
+import pandas as pd
+from pandas.api.types import pandas_dtype
+from utils.uscrn_products import get_product, raw_dtype, ymd_to_datetime, add_timestamp, DATE_FIELDS
+
+
+def _na_tokens(sentinels):
+    # -9999.0 may be written as -9999 / -9999.0 / -9999.00 depending on the field width
+    tokens = set()
+    for value in sentinels:
+        tokens.update({f"{value:.0f}", f"{value:.1f}", f"{value:.2f}", f"{value:.3f}"})
+    return sorted(tokens)
+
+
+def build_schema(product, col_indices=None):
+    # pre:  product is a registered product, col_indices maps output name -> field index
+    # post: returns (names, dtypes, na_values, renames) for pd.read_csv
+    # desc: fields are read under their documented names (which drive dtype/NA rules)
+    #       and renamed to the configured names afterwards; unmapped fields become col_<i>.
+    #       Cached per (product, mapping): resolving dtype strings costs more than
+    #       parsing a 365-row daily file.
+
+    key = None if col_indices is None else tuple(sorted(col_indices.items()))
+    return _build_schema(product, key)
+
+
+@lru_cache(maxsize=32)
+def _build_schema(product, col_indices):
+    col_indices = None if col_indices is None else dict(col_indices)
+    spec = get_product(product)
+    documented = spec["columns"]
+    tokens = _na_tokens(spec["sentinels"])
+
+    by_index = {idx: name for name, idx in (col_indices or {}).items()}
+    # one flat NA list for every field: only float fields ever carry sentinels, and a
+    # per-column dict makes pandas re-stringify the tokens for each of the 28 columns
+    names, dtypes, na_values, renames = [], {}, tokens, {}
+    for idx, field in enumerate(documented):
+        names.append(field)
+        dtypes[field] = pandas_dtype(raw_dtype(field))
+
+        target = by_index.get(idx, field if col_indices is None else f"col_{idx}")
+        if target != field:
+            renames[field] = target
+
+    return names, dtypes, na_values, renames
+
+
+def _finish(df, product, renames):
+    # convert packed YYYYMMDD ints to datetimes and apply configured names
+    if get_product(product)["interval"] is None:
+        if "date" in df.columns:
+            df["date"] = ymd_to_datetime(df["date"])
+    else:
+        df = add_timestamp(df, product)
+        for field in DATE_FIELDS & set(df.columns) - {"date"}:
+            df[field] = ymd_to_datetime(df[field])
+    return df.rename(columns=renames) if renames else df
+
+
+def read_uscrn(path, product="daily01", col_indices=None, usecols=None, chunksize=None):
+    # pre:  path is a whitespace-delimited USCRN file of the given product
+    # post: returns a DataFrame (or an iterator of DataFrames when chunksize is set)
+    #       with typed columns, NaN for sentinel values and datetime `date`
+    # desc: usecols (documented field names) limits parsing to the listed fields.
+    #       Sub-daily products always keep lst_date/lst_time to build `date`.
+
+    names, dtypes, na_values, renames = build_schema(product, col_indices)
+    dtypes, na_values = dict(dtypes), list(na_values)  # read_csv must not mutate the cached schema
+
+    if usecols is not None:
+        usecols = set(usecols)
+        if get_product(product)["interval"] is not None:
+            usecols |= {"lst_date", "lst_time"}
+        usecols = [n for n in names if n in usecols]
+
+    reader = pd.read_csv(
+        path,
+        sep=r"\s+",
+        comment="#",
+        header=None,
+        names=names,
+        usecols=usecols,
+        dtype=dtypes,
+        na_values=na_values,
+        keep_default_na=False,
+        engine="c",
+        chunksize=chunksize,
+    )
+
+    if chunksize is None:
+        return _finish(reader, product, renames)
+    return (_finish(chunk, product, renames) for chunk in reader)